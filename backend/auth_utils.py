@@ -1,8 +1,6 @@
-from fastapi import Request, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from fastapi import Request, HTTPException, status
 
-from backend.database import get_db
-from backend.models import Usuario
+from backend.services.usuario_cache import usuario_cache, UsuarioSesion
 
 # ======================================
 # 🔐 Dependencia de autenticación basada en sesión
@@ -10,11 +8,13 @@ from backend.models import Usuario
 # Esta función se usa como dependencia en rutas protegidas.
 # Verifica que haya una sesión activa y que el usuario exista en la base.
 # Si no está logueado o no se encuentra en la base, lanza error HTTP.
+# El usuario sale de la caché compartida con backend.core (sin consultar la base).
+
+def get_current_user(request: Request) -> UsuarioSesion:
+    user = getattr(request.state, "user", None)  # ⚡ Ya resuelto en este request
+    if user is not None:
+        return user
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db)
-) -> Usuario:
     username = request.session.get("usuario")  # 🧠 Obtiene usuario desde sesión
 
     if not username:
@@ -23,8 +23,8 @@ def get_current_user(
             detail="Sesión no iniciada"  # 🔒 No hay usuario en sesión
         )
 
-    # 🗃️ Busca el usuario en la base
-    user = db.query(Usuario).filter_by(usuario=username).first()
+    # 🗃️ Busca el usuario (caché en memoria, la base solo en cache miss)
+    user = usuario_cache.obtener(username)
 
     if not user:
         raise HTTPException(
@@ -32,4 +32,5 @@ def get_current_user(
             detail="Usuario no encontrado"
         )
 
-    return user  # ✅ Devuelve el objeto Usuario si todo está bien
\ No newline at end of file
+    request.state.user = user
+    return user  # ✅ Devuelve el snapshot del usuario si todo está bien
\ No newline at end of file
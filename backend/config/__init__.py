@@ -1,5 +1,5 @@
 """Módulo de configuración centralizada"""
 from .settings import settings
-from .database import Base, engine, SessionLocal, get_db
+from .database import Base, engine, SessionLocal, get_db, get_async_db
 
-__all__ = ["settings", "Base", "engine", "SessionLocal", "get_db"]
+__all__ = ["settings", "Base", "engine", "SessionLocal", "get_db", "get_async_db"]
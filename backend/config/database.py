@@ -1,27 +1,206 @@
 """Configuración de la base de datos SQLAlchemy"""
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .settings import settings
 
-# 🔌 Motor de conexión con configuración específica por tipo de BD
-if settings.DATABASE_URL.startswith("postgresql"):
-    # PostgreSQL: Pool de conexiones para multi-usuario
-    engine = create_engine(
-        settings.DATABASE_URL,
-        pool_size=10,  # 🔄 Pool de 10 conexiones
-        max_overflow=20,  # 📈 Hasta 30 conexiones simultáneas
-        pool_pre_ping=True,  # ✅ Verificar conexiones antes de usar
-        pool_recycle=3600,  # 🔄 Reciclar conexiones cada hora
-        echo=settings.DEBUG  # 🐞 Log SQL queries en debug
-    )
-else:
-    # SQLite: Configuración simple para desarrollo
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        echo=settings.DEBUG
+
+# ========================================
+# 📊 MÉTRICAS DEL POOL
+# ========================================
+
+class MetricasPool:
+    """Checkouts, tiempo de espera por una conexión y timeouts del pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def registrar(self, espera: float, timeout: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timeout
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_promedio_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+            }
+
+
+class _PoolMedidoMixin:
+    """
+    Mide cuánto tarda cada checkout del pool
+
+    La espera incluye abrir una conexión nueva cuando el pool crece; si
+    se acerca a DB_POOL_TIMEOUT, el pool es chico para la concurrencia.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        self.metricas.registrar(time.perf_counter() - inicio)
+        return conexion
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: las métricas siguen acumulando
+        nuevo = super().recreate()
+        nuevo.metricas = self.metricas
+        return nuevo
+
+
+class PoolMedido(_PoolMedidoMixin, QueuePool):
+    """QueuePool con métricas de checkout"""
+
+
+class PoolMedidoAsync(_PoolMedidoMixin, AsyncAdaptedQueuePool):
+    """Pool del motor asíncrono (asyncpg / aiosqlite) con métricas de checkout"""
+
+
+# ========================================
+# 🔌 MOTOR
+# ========================================
+
+def _es_sqlite_en_memoria(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _configurar_sqlite(engine: Engine, en_memoria: bool):
+    """
+    PRAGMAs por conexión: WAL deja leer mientras otro escribe (los envíos
+    concurrentes ya no se serializan en el lock de la base) y busy_timeout
+    espera el lock en vez de fallar con "database is locked"
+    """
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not en_memoria:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # Seguro con WAL: fsync en el checkpoint
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_SQLITE_BUSY_TIMEOUT)}")
+        cursor.close()
+
+
+def _opciones_engine(url: str, pool) -> Tuple[Dict[str, Any], bool]:
+    """Argumentos de create_engine según el tipo de base (y si es SQLite en memoria)"""
+    kwargs: Dict[str, Any] = {"echo": settings.DEBUG}  # 🐞 Log SQL queries en debug
+
+    if url.startswith("sqlite"):
+        en_memoria = _es_sqlite_en_memoria(url)
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if not en_memoria:
+            # En memoria cada conexión sería otra base: queda el pool por defecto
+            kwargs.update(poolclass=pool, pool_size=settings.DB_POOL_SIZE,
+                          max_overflow=settings.DB_MAX_OVERFLOW, pool_timeout=settings.DB_POOL_TIMEOUT)
+        return kwargs, en_memoria
+
+    # PostgreSQL: pool de conexiones para multi-usuario
+    kwargs.update(
+        poolclass=pool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
     )
+    return kwargs, False
+
+
+def crear_engine(url: Optional[str] = None, **opciones) -> Engine:
+    """
+    Crea el motor con el pool configurado por entorno (DB_POOL_*)
+
+    Args:
+        url: URL de la base (por defecto settings.DATABASE_URL)
+        **opciones: Argumentos de create_engine que pisan los calculados
+    """
+    url = url or settings.DATABASE_URL
+    kwargs, en_memoria = _opciones_engine(url, PoolMedido)
+    kwargs.update(opciones)
+
+    engine = create_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        _configurar_sqlite(engine, en_memoria)
+    return engine
+
+
+def url_async(url: str) -> str:
+    """Misma base con el driver asíncrono (postgresql -> asyncpg, sqlite -> aiosqlite)"""
+    url_sa = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    backend = url_sa.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(f"No hay driver asíncrono configurado para {backend}")
+    return url_sa.set(drivername=drivers[backend]).render_as_string(hide_password=False)
+
+
+def crear_engine_async(url: Optional[str] = None, **opciones) -> AsyncEngine:
+    """
+    Crea el motor asíncrono (mismo pool, PRAGMAs y métricas que crear_engine)
+
+    Args:
+        url: URL de la base (por defecto settings.DATABASE_URL, sin driver async)
+        **opciones: Argumentos de create_async_engine que pisan los calculados
+    """
+    url = url or settings.DATABASE_URL
+    kwargs, en_memoria = _opciones_engine(url, PoolMedidoAsync)
+    kwargs.update(opciones)
+
+    engine_async = create_async_engine(url_async(url), **kwargs)
+    if url.startswith("sqlite"):
+        _configurar_sqlite(engine_async.sync_engine, en_memoria)
+    return engine_async
+
+
+def estado_db(motor: Optional[Engine] = None) -> Dict[str, Any]:
+    """
+    Ocupación y métricas del pool (para el panel de admin)
+    """
+    motor = motor or engine
+    pool = motor.pool
+    estado: Dict[str, Any] = {"dialecto": motor.dialect.name, "pool": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        estado.update({
+            "tamano": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            # overflow() es negativo mientras el pool no llegó a `tamano`
+            "overflow_en_uso": max(pool.overflow(), 0),
+        })
+    metricas = getattr(pool, "metricas", None)
+    if metricas is not None:
+        estado.update(metricas.resumen())
+    return estado
+
+
+engine = crear_engine()
 
 # ⚙️ Configuración de sesiones
 SessionLocal = sessionmaker(
@@ -41,3 +220,59 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ========================================
+# ⚡ SESIONES PARA ENDPOINTS ASYNC
+# ========================================
+
+# Opt-in (DB_ASYNC): sin el driver asíncrono instalado la app arranca igual
+async_engine: Optional[AsyncEngine] = crear_engine_async() if settings.DB_ASYNC else None
+AsyncSessionLocal = (
+    # Sin expirar al commit: fuera de run_sync no se puede ir a la base
+    async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+    if async_engine is not None else None
+)
+
+
+class SesionEnHilo:
+    """
+    Sesión síncrona con la interfaz de AsyncSession que usan las rutas
+
+    Sin DB_ASYNC, `get_async_db` entrega esto: cada `run_sync` corre en el
+    threadpool, así que el event loop tampoco se bloquea.
+    """
+
+    def __init__(self, sesion):
+        self.sync_session = sesion
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db():
+    """
+    Sesión para endpoints `async def` (FastAPI Depends)
+
+    Los servicios siguen siendo síncronos: las rutas los llaman con
+    `await db.run_sync(Servicio.metodo, ...)`. Con DB_ASYNC corren sobre
+    asyncpg/aiosqlite sin hilos; si no, en el threadpool (ver SesionEnHilo).
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SesionEnHilo(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def cerrar_engine_async():
+    """Cerrar el pool asíncrono (llamar desde el lifespan de FastAPI)"""
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -4,9 +4,13 @@ Configuración de Rate Limiting para VerificarSms
 
 Define límites de tasa para diferentes endpoints y usuarios.
 Usa Redis como backend para tracking distribuido.
+
+Los valores de este archivo son la base: desde el panel de admin se
+pueden cambiar límites y multiplicadores sin reiniciar (ver
+`aplicar_overrides`).
 """
 
-from typing import Dict, Any
+from typing import Dict
 from pydantic import BaseModel
 
 
@@ -44,6 +48,12 @@ RATE_LIMITS: Dict[str, RateLimitConfig] = {
         description="Límite diario para SMS"
     ),
     
+    "sms_lote": RateLimitConfig(
+        limit=10,
+        period=3600,  # 10 lotes por hora (cada lote hasta SMS_LOTE_MAX_DESTINOS)
+        description="Envío de SMS por lotes"
+    ),
+    
     # 🔐 Autenticación - Prevenir brute force
     "login_intentos": RateLimitConfig(
         limit=5,
@@ -88,6 +98,10 @@ ROLE_MULTIPLIERS: Dict[str, float] = {
 # 🎯 WHITELIST Y BLACKLIST
 # ========================================
 
+# Base de las listas: acepta IPs y rangos CIDR (IPv4 e IPv6). Las reglas
+# agregadas desde el panel se guardan en la tabla `ip_reglas`.
+# Se compilan en backend/services/filtro_ip.py.
+
 # IPs que no tienen límite de tasa
 WHITELIST_IPS = [
     "127.0.0.1",
@@ -108,6 +122,13 @@ BLACKLIST_IPS = [
 REDIS_KEY_PREFIX = "ratelimit:"
 REDIS_KEY_EXPIRE = 86400  # 24 horas - limpieza automática
 
+# Hash con los cambios hechos desde el panel (fuera de REDIS_KEY_PREFIX
+# para que no aparezca entre los límites activos)
+REDIS_OVERRIDES_KEY = "rate_limits:overrides"
+
+# Versión de las reglas de IPs (se incrementa al editarlas desde el panel)
+REDIS_IP_VERSION_KEY = "rate_limits:ip_reglas_version"
+
 
 # ========================================
 # 📝 MENSAJES DE ERROR
@@ -121,6 +142,57 @@ ERROR_MESSAGES = {
 }
 
 
+# ========================================
+# 🔄 RECARGA EN CALIENTE
+# ========================================
+
+# Valores de este archivo (para volver a ellos al borrar un cambio)
+RATE_LIMITS_BASE: Dict[str, RateLimitConfig] = dict(RATE_LIMITS)
+ROLE_MULTIPLIERS_BASE: Dict[str, float] = dict(ROLE_MULTIPLIERS)
+
+
+def campo_override_limite(endpoint: str) -> str:
+    """Campo del hash de overrides para el límite de un endpoint"""
+    return f"limite:{endpoint}"
+
+
+def campo_override_rol(role: str) -> str:
+    """Campo del hash de overrides para el multiplicador de un rol"""
+    return f"rol:{role.lower()}"
+
+
+def aplicar_overrides(overrides: Dict[str, str]):
+    """
+    Recalcula RATE_LIMITS y ROLE_MULTIPLIERS: valores base más cambios.
+    
+    Los dicts se actualizan en el lugar (sin vaciarlos), así quien los
+    lee desde otro hilo nunca ve un endpoint faltante.
+    
+    Args:
+        overrides: Campos "limite:<endpoint>" = "<limit>/<period>"
+                   y "rol:<rol>" = "<multiplicador>"; los inválidos se ignoran
+    """
+    limites = dict(RATE_LIMITS_BASE)
+    roles = dict(ROLE_MULTIPLIERS_BASE)
+    
+    for campo, valor in overrides.items():
+        tipo, _, nombre = campo.partition(":")
+        try:
+            if tipo == "limite" and nombre in limites:
+                limit, period = (int(parte) for parte in valor.split("/"))
+                if limit > 0 and period > 0:
+                    limites[nombre] = limites[nombre].model_copy(update={"limit": limit, "period": period})
+            elif tipo == "rol" and float(valor) > 0:
+                roles[nombre] = float(valor)
+        except ValueError:
+            continue
+    
+    RATE_LIMITS.update(limites)
+    ROLE_MULTIPLIERS.update(roles)
+    for role in set(ROLE_MULTIPLIERS) - set(roles):
+        ROLE_MULTIPLIERS.pop(role, None)
+
+
 # ========================================
 # 🔧 FUNCIONES DE UTILIDAD
 # ========================================
@@ -152,42 +224,6 @@ def get_limit_for_endpoint(endpoint: str, role: str = "operador") -> RateLimitCo
     )
 
 
-def get_rate_limit_string(endpoint: str) -> str:
-    """
-    Convierte configuración a formato de slowapi.
-    
-    Args:
-        endpoint: Nombre del endpoint
-    
-    Returns:
-        String en formato "limit/period" (ej: "5/minute")
-    """
-    config = RATE_LIMITS.get(endpoint, RATE_LIMITS["api_general"])
-    
-    # Convertir segundos a unidad legible
-    if config.period == 60:
-        period = "minute"
-    elif config.period == 3600:
-        period = "hour"
-    elif config.period == 86400:
-        period = "day"
-    else:
-        # Para períodos personalizados, usar segundos
-        return f"{config.limit}/{config.period} seconds"
-    
-    return f"{config.limit}/{period}"
-
-
-def is_ip_whitelisted(ip: str) -> bool:
-    """Verifica si una IP está en whitelist"""
-    return ip in WHITELIST_IPS
-
-
-def is_ip_blacklisted(ip: str) -> bool:
-    """Verifica si una IP está en blacklist"""
-    return ip in BLACKLIST_IPS
-
-
 def format_retry_after(seconds: int) -> str:
     """
     Formatea segundos en mensaje legible.
@@ -1,32 +1,48 @@
 """
 Configuración de Redis para sesiones y caché
 """
+import logging
+import time
 import redis
+import redis.asyncio as aioredis
 from redis import Redis
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
+from backend.config.settings import settings
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuración de Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-# Cliente Redis singleton
+# Opciones comunes a todos los clientes (sesiones, rate limiting, cachés)
+REDIS_OPCIONES = {
+    "decode_responses": True,
+    "max_connections": settings.REDIS_MAX_CONNECTIONS,
+    "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+    "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+    "socket_keepalive": True,
+    "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+}
+
+# Cliente Redis singleton (síncrono: rutas `def`, scripts, workers en hilos)
 _redis_client: Optional[Redis] = None
 
+# Cliente Redis asíncrono (handlers `async def`); se crea en el lifespan
+_redis_async: Optional[aioredis.Redis] = None
+_metricas: Dict[str, Any] = {"errores": 0, "ultimo_error": None}
+
 def get_redis_client() -> Redis:
     """
     Obtener cliente Redis (singleton pattern)
     """
     global _redis_client
     if _redis_client is None:
-        _redis_client = redis.from_url(
-            REDIS_URL,
-            decode_responses=True,
-            socket_connect_timeout=5,
-            socket_keepalive=True,
-            health_check_interval=30
+        _redis_client = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(REDIS_URL, **REDIS_OPCIONES)
         )
     return _redis_client
 
@@ -37,11 +53,122 @@ def close_redis_client():
     global _redis_client
     if _redis_client is not None:
         _redis_client.close()
+        _redis_client.connection_pool.disconnect()
         _redis_client = None
 
+async def iniciar_redis_async() -> aioredis.Redis:
+    """
+    Crear el pool asíncrono compartido (llamar desde el lifespan de FastAPI)
+
+    Si Redis no responde se deja el cliente creado igual: las conexiones
+    se abren a demanda y los usuarios (sesiones, limiter) tienen su propio
+    manejo de errores.
+    """
+    global _redis_async
+    if _redis_async is None:
+        _redis_async = aioredis.Redis(
+            connection_pool=aioredis.ConnectionPool.from_url(REDIS_URL, **REDIS_OPCIONES)
+        )
+        try:
+            await _redis_async.ping()
+            logger.info("✅ Pool Redis asíncrono listo")
+        except Exception as e:
+            registrar_error_redis(e)
+            logger.warning(f"⚠️ Redis no responde al iniciar: {e}")
+    return _redis_async
+
+def get_redis_async() -> Optional[aioredis.Redis]:
+    """
+    Cliente asíncrono compartido (None fuera del lifespan, ej: scripts)
+    """
+    return _redis_async
+
+async def cerrar_redis_async():
+    """
+    Cerrar el pool asíncrono
+    """
+    global _redis_async
+    if _redis_async is not None:
+        await _redis_async.aclose()
+        await _redis_async.connection_pool.disconnect()
+        _redis_async = None
+
+def registrar_error_redis(error: Exception):
+    """
+    Contar un error de Redis para las métricas del pool
+    """
+    _metricas["errores"] += 1
+    _metricas["ultimo_error"] = f"{type(error).__name__}: {error}"
+
+async def estado_redis() -> Dict[str, Any]:
+    """
+    Salud y métricas del pool asíncrono (para el panel de admin)
+    """
+    cliente = get_redis_async()
+    if cliente is None:
+        return {"conectado": False, "mensaje": "Pool asíncrono no iniciado", **_metricas}
+
+    pool = cliente.connection_pool
+    estado = {
+        "max_conexiones": pool.max_connections,
+        "conexiones_en_uso": len(pool._in_use_connections),
+        "conexiones_libres": len(pool._available_connections),
+        **_metricas,
+    }
+    try:
+        inicio = time.perf_counter()
+        await cliente.ping()
+        estado["conectado"] = True
+        estado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    except Exception as e:
+        registrar_error_redis(e)
+        estado["conectado"] = False
+        estado["error"] = str(e)
+    return estado
+
+def escanear_claves(
+    cliente: Redis,
+    patron: str,
+    cursor: int = 0,
+    limite: int = 100
+) -> Tuple[List[str], int]:
+    """
+    Una página de claves con SCAN (no bloquea Redis como KEYS)
+
+    SCAN puede devolver algunas claves de más o repetidas entre páginas;
+    `limite` es aproximado.
+
+    Returns:
+        (claves, siguiente_cursor); el cursor 0 indica que no hay más
+    """
+    claves: List[str] = []
+    while True:
+        cursor, lote = cliente.scan(cursor=cursor, match=patron, count=max(limite, 100))
+        claves.extend(lote)
+        if cursor == 0 or len(claves) >= limite:
+            return claves, cursor
+
+async def aescanear_claves(
+    cliente: aioredis.Redis,
+    patron: str,
+    cursor: int = 0,
+    limite: int = 100
+) -> Tuple[List[str], int]:
+    """
+    Como escanear_claves, con el cliente asíncrono
+    """
+    claves: List[str] = []
+    while True:
+        cursor, lote = await cliente.scan(cursor=cursor, match=patron, count=max(limite, 100))
+        claves.extend(lote)
+        if cursor == 0 or len(claves) >= limite:
+            return claves, cursor
+
 # Configuración de sesiones
 SESSION_EXPIRE_SECONDS = 28800  # 8 horas
 SESSION_KEY_PREFIX = "session:"
+USER_SESSIONS_KEY_PREFIX = "user_sessions:"  # Set con los session_id de cada usuario
+SESSION_TOUCH_SECONDS = 60  # Renovar TTL / last_activity como máximo una vez por minuto
 
 # Configuración de caché
 CACHE_EXPIRE_SECONDS = 3600  # 1 hora
@@ -13,19 +13,59 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 horas
-    
+    BCRYPT_ROUNDS: int = 12  # Costo de bcrypt (cada +1 duplica el tiempo); los hashes con otro costo se rehacen al loguear
+    BCRYPT_WORKERS: int = 2  # Hashes bcrypt en paralelo (del orden de los núcleos)
+    BCRYPT_MAX_COLA: int = 50  # Logins esperando un hilo de bcrypt antes de responder 503
+
     # 🗄️ Base de datos
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10  # Conexiones que el pool mantiene abiertas
+    DB_MAX_OVERFLOW: int = 20  # Conexiones extra en picos (máximo = size + overflow)
+    DB_POOL_TIMEOUT: float = 30.0  # Segundos esperando una conexión libre antes de fallar
+    DB_POOL_RECYCLE: int = 3600  # Reabrir conexiones con más de N segundos (-1 = nunca)
+    DB_POOL_PRE_PING: bool = True  # Verificar la conexión antes de usarla (no aplica a SQLite)
+    DB_SQLITE_BUSY_TIMEOUT: int = 5000  # Milisegundos que SQLite espera un lock antes de fallar
+    DB_ASYNC: bool = False  # Endpoints async sobre asyncpg/aiosqlite (si no, sesión síncrona en el threadpool)
     
     # 📱 SMS API
     SMS_API_URL: str = "http://servicio.smsmasivos.com.ar/enviar_sms.asp?api=1"
     SMS_API_KEY: Optional[str] = None
     SMS_MODO_SIMULADO: bool = False
-    
+    SMS_SALDO_URL: str = "https://servicio.smsmasivos.com.ar/obtener_saldo.asp"
+
+    # 🌐 Cliente HTTP asíncrono hacia el proveedor SMS
+    SMS_HTTP_TIMEOUT: float = 10.0  # Timeout de envío (segundos)
+    SMS_SALDO_TIMEOUT: float = 5.0  # Timeout de consulta de saldo (segundos)
+    SMS_HTTP_MAX_CONNECTIONS: int = 100  # Conexiones máximas del pool
+    SMS_HTTP_MAX_KEEPALIVE: int = 20  # Conexiones keep-alive reutilizables
+
+    # 💰 Caché de saldo del proveedor
+    SALDO_CACHE_TTL: int = 30  # Segundos que se considera vigente el saldo
+    SALDO_REFRESCO_INTERVALO: int = 20  # Refresco en segundo plano (0 = deshabilitado)
+
+    # 📬 Cola persistente de SMS salientes
+    SMS_COLA_WORKERS: int = 4  # Workers de envío por proceso (0 = deshabilitado)
+    SMS_COLA_MAX_INTENTOS: int = 5  # Intentos antes de pasar a dead-letter
+    SMS_COLA_BACKOFF_BASE: float = 2.0  # Segundos de espera tras el primer fallo
+    SMS_COLA_BACKOFF_MAX: float = 300.0  # Tope de espera entre reintentos
+    SMS_COLA_POLL_INTERVALO: float = 1.0  # Segundos entre sondeos con la cola vacía
+    SMS_COLA_LEASE_SEGUNDOS: int = 120  # Tiempo tras el cual un envío tomado se libera (mínimo 3x timeouts de envío + saldo)
+
+    # 📦 Envío por lotes (campañas / re-verificaciones)
+    SMS_LOTE_TAMANO: int = 100  # Destinatarios por llamada al proveedor (parámetro TOS)
+    SMS_LOTE_CONCURRENCIA: int = 10  # Llamadas simultáneas al proveedor por lote
+    SMS_LOTE_MAX_DESTINOS: int = 1000  # Destinos máximos por request
+
+    # 📵 Idempotencia de /send-sms (reintentos y doble clic no pagan otro SMS)
+    IDEMPOTENCIA_TTL: int = 86400  # Segundos que se recuerda la respuesta de un envío
+    IDEMPOTENCIA_VENTANA: int = 120  # Sin Idempotency-Key: mismo destino dentro de esta franja = mismo envío
+    IDEMPOTENCIA_RESERVA_TTL: int = 60  # Tope de un envío en curso (si el proceso muere, la clave se libera)
+
     # 🏢 Información de la empresa
     EMPRESA_NOMBRE: str = "Los Quilmes S.A."
     
-    # 📊 Códigos de sucursales
+    # 📊 Sucursales iniciales (solo para backend/scripts/migrar_sucursales.py;
+    # los nombres vigentes salen de la tabla sucursales)
     SUCURSALES: dict = {
         "389": "Los Quilmes - Casa Central",
         "561": "Los Quilmes - Sucursal Centro",
@@ -59,6 +99,13 @@ class Settings(BaseSettings):
     # 🔢 Paginación
     DEFAULT_PAGE_SIZE: int = 10
     MAX_PAGE_SIZE: int = 100
+    CONTEO_CACHE_TTL: int = 30  # Segundos que se reutiliza el total de un filtro del panel
+
+    # 🔐 Caché del usuario autenticado (0 = deshabilitada)
+    USUARIO_CACHE_TTL: int = 60  # Segundos que se reutiliza el usuario sin consultar la base
+
+    # 🏢 Caché de sucursales (cambios desde otro worker se ven a más tardar en este tiempo)
+    SUCURSAL_CACHE_TTL: int = 300
     
     # 📧 Configuración de Email
     MAIL_USERNAME: Optional[str] = None
@@ -77,6 +124,24 @@ class Settings(BaseSettings):
     
     # 🔴 Redis (para caché y rate limiting)
     REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50  # Conexiones máximas del pool compartido
+    REDIS_CONNECT_TIMEOUT: float = 2.0  # Segundos para conectar
+    REDIS_SOCKET_TIMEOUT: float = 2.0  # Segundos por comando
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # PING antes de reusar una conexión ociosa
+
+    # 🚦 Rate limiting
+    # Proxies (IPs o rangos CIDR) cuyo X-Forwarded-For se respeta. Con el proxy
+    # en otro contenedor agregar su red, ej: ["127.0.0.1", "::1", "172.16.0.0/12"];
+    # si no, todos los clientes comparten la IP del proxy y sus límites.
+    TRUSTED_PROXIES: list = ["127.0.0.1", "::1"]
+    RATE_LIMITS_RECARGA: int = 10  # Segundos entre lecturas de los límites y reglas de IPs cambiados desde el panel
+
+    # 🗝️ Sesiones
+    SESSION_BACKEND: str = "dos_niveles"  # redis | memoria | dos_niveles (caché local delante de Redis)
+    SESSION_CACHE_LOCAL_TTL: int = 15  # Segundos que una sesión leída de Redis se sirve desde memoria
+    SESSION_CACHE_LOCAL_MAX: int = 10000  # Sesiones en la caché local (LRU)
+    SESSION_BREAKER_FALLOS: int = 3  # Fallos seguidos de Redis para abrir el circuito
+    SESSION_BREAKER_ESPERA: int = 30  # Segundos en memoria antes de volver a probar Redis
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,11 @@
 """Módulo core con funcionalidades centrales"""
-from .security import hash_password, verify_password, get_current_user
+from .security import (
+    hash_password, verify_password, ahash_password, averify_password, necesita_rehash,
+    get_current_user, get_current_user_optional
+)
+from .hash_pool import pool_hash, PoolHashSaturado
 
-__all__ = ["hash_password", "verify_password", "get_current_user"]
+__all__ = [
+    "hash_password", "verify_password", "ahash_password", "averify_password", "necesita_rehash",
+    "get_current_user", "get_current_user_optional", "pool_hash", "PoolHashSaturado"
+]
@@ -0,0 +1,144 @@
+"""
+Pool acotado de hilos para bcrypt
+=================================
+
+bcrypt es CPU puro (~250 ms con costo 12) y libera el GIL mientras
+calcula. Si cada login lo corre en el threadpool genérico de Starlette,
+una ráfaga de logins ocupa sus 40 hilos, pelea por la CPU con el resto
+de la app y deja sin hilos a las rutas síncronas.
+
+Este pool limita cuántos hashes corren a la vez (BCRYPT_WORKERS, del
+orden de los núcleos) y cuántos pueden esperar (BCRYPT_MAX_COLA): pasado
+ese límite el login se rechaza de inmediato en vez de encolar sin fin.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from backend.config.settings import settings
+
+
+class PoolHashSaturado(Exception):
+    """Hay BCRYPT_MAX_COLA hashes esperando: reintentar más tarde"""
+
+
+class PoolHash:
+    """
+    ThreadPoolExecutor dedicado con límite de cola y métricas
+
+    - `ejecutar` (async): rechaza con PoolHashSaturado si la cola está llena
+    - `ejecutar_sync`: para rutas síncronas y scripts; espera su turno
+    """
+
+    PREFIJO_HILOS = "bcrypt"
+
+    def __init__(self, workers: int, max_cola: int):
+        self.workers = max(1, workers)
+        self.max_cola = max(0, max_cola)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self._pendientes = 0  # Encolados + en curso
+        self._en_curso = 0
+        self._max_en_cola = 0
+        self._completados = 0
+        self._rechazados = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._duracion_total = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Perezoso: los scripts que no hashean no levantan hilos
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=self.PREFIJO_HILOS
+                    )
+        return self._executor
+
+    def _reservar(self, rechazar: bool):
+        with self._lock:
+            if rechazar and self._pendientes >= self.workers + self.max_cola:
+                self._rechazados += 1
+                raise PoolHashSaturado("Demasiados hashes en espera")
+            self._pendientes += 1
+            self._max_en_cola = max(self._max_en_cola, self._pendientes - self._en_curso)
+
+    def _liberar_si_cancelada(self, futuro: Future):
+        # Cancelada antes de arrancar: la tarea nunca va a descontarse sola
+        if futuro.cancelled():
+            with self._lock:
+                self._pendientes -= 1
+
+    def _tarea(self, fn: Callable, args: tuple) -> Callable[[], Any]:
+        encolada = time.perf_counter()
+
+        def correr():
+            inicio = time.perf_counter()
+            with self._lock:
+                self._en_curso += 1
+                espera = inicio - encolada
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._en_curso -= 1
+                    self._pendientes -= 1
+                    self._completados += 1
+                    self._duracion_total += time.perf_counter() - inicio
+
+        return correr
+
+    def _enviar(self, fn: Callable, args: tuple, rechazar: bool) -> Future:
+        self._reservar(rechazar)
+        try:
+            futuro = self._pool().submit(self._tarea(fn, args))
+        except Exception:
+            with self._lock:
+                self._pendientes -= 1
+            raise
+        futuro.add_done_callback(self._liberar_si_cancelada)
+        return futuro
+
+    async def ejecutar(self, fn: Callable, *args) -> Any:
+        """Corre fn(*args) en el pool sin bloquear el event loop"""
+        return await asyncio.wrap_future(self._enviar(fn, args, rechazar=True))
+
+    def ejecutar_sync(self, fn: Callable, *args) -> Any:
+        """Corre fn(*args) en el pool y espera el resultado en este hilo"""
+        if threading.current_thread().name.startswith(self.PREFIJO_HILOS):
+            return fn(*args)  # Ya estamos en el pool: esperar a otro hilo sería un deadlock
+        return self._enviar(fn, args, rechazar=False).result()
+
+    def estado(self) -> Dict[str, Any]:
+        """Profundidad de la cola y tiempos (para el panel de admin)"""
+        with self._lock:
+            completados = self._completados
+            return {
+                "workers": self.workers,
+                "max_cola": self.max_cola,
+                "en_curso": self._en_curso,
+                "en_cola": self._pendientes - self._en_curso,
+                "max_en_cola": self._max_en_cola,
+                "completados": completados,
+                "rechazados": self._rechazados,
+                "espera_promedio_ms": round(self._espera_total / completados * 1000, 3) if completados else 0.0,
+                "espera_max_ms": round(self._espera_max * 1000, 3),
+                "duracion_promedio_ms": round(self._duracion_total / completados * 1000, 3) if completados else 0.0,
+            }
+
+    def cerrar(self):
+        """Apagar los hilos (llamar desde el lifespan de FastAPI)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 🌍 Instancia global
+pool_hash = PoolHash(settings.BCRYPT_WORKERS, settings.BCRYPT_MAX_COLA)
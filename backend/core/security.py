@@ -1,15 +1,43 @@
 """Utilidades de seguridad y autenticación"""
 import hashlib
+import hmac
 import bcrypt
 from fastapi import Request, HTTPException, status
 from sqlalchemy.orm import Session
 from backend.config.database import get_db
+from backend.config.settings import settings
+from .hash_pool import pool_hash
+
+
+# ========================================
+# 🔑 CONTRASEÑAS (bcrypt en el pool acotado)
+# ========================================
+
+def _es_bcrypt(hashed_password: str) -> bool:
+    # Detectar si es bcrypt (empieza con $2b$ o $2a$)
+    return hashed_password.startswith('$2b$') or hashed_password.startswith('$2a$')
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def _verificar_sha256(plain_password: str, hashed_password: str) -> bool:
+    # Legacy SHA-256 (sin sal; se reemplaza por bcrypt en el próximo login)
+    sha256_hash = hashlib.sha256(plain_password.encode()).hexdigest()
+    return hmac.compare_digest(sha256_hash, hashed_password)
 
 
 def hash_password(password: str) -> str:
-    """Hashea una contraseña usando bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Hashea una contraseña usando bcrypt (costo BCRYPT_ROUNDS)"""
+    return pool_hash.ejecutar_sync(_hashpw, password, settings.BCRYPT_ROUNDS)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -17,33 +45,65 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Verifica si una contraseña coincide con su hash.
     Soporta tanto bcrypt (nuevo) como SHA-256 (legacy)
     """
-    # Detectar si es bcrypt (empieza con $2b$ o $2a$)
-    if hashed_password.startswith('$2b$') or hashed_password.startswith('$2a$'):
-        try:
-            return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-        except:
-            return False
-    else:
-        # Legacy SHA-256
-        sha256_hash = hashlib.sha256(plain_password.encode()).hexdigest()
-        return sha256_hash == hashed_password
+    if _es_bcrypt(hashed_password):
+        return pool_hash.ejecutar_sync(_checkpw, plain_password, hashed_password)
+    return _verificar_sha256(plain_password, hashed_password)
+
+
+async def ahash_password(password: str) -> str:
+    """
+    Como hash_password, para endpoints async
+
+    Raises:
+        PoolHashSaturado: si la cola del pool de bcrypt está llena
+    """
+    return await pool_hash.ejecutar(_hashpw, password, settings.BCRYPT_ROUNDS)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Como verify_password, para endpoints async
+
+    Raises:
+        PoolHashSaturado: si la cola del pool de bcrypt está llena
+    """
+    if _es_bcrypt(hashed_password):
+        return await pool_hash.ejecutar(_checkpw, plain_password, hashed_password)
+    return _verificar_sha256(plain_password, hashed_password)
+
+
+def necesita_rehash(hashed_password: str) -> bool:
+    """True si el hash es SHA-256 legacy o bcrypt con un costo distinto de BCRYPT_ROUNDS"""
+    if not _es_bcrypt(hashed_password):
+        return True
+    try:
+        return int(hashed_password.split('$')[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 
 async def get_current_user(request: Request):
     """
     Dependencia para obtener el usuario actual de la sesión.
     Lee desde Redis para sesiones persistentes.
+
+    Devuelve un snapshot inmutable (id, usuario, rol, email) cacheado por
+    proceso y por request: en régimen normal no consulta la base.
     """
-    from backend.models import Usuario
-    from backend.config.database import SessionLocal
     from backend.services.session_service import session_store
+    from backend.services.usuario_cache import usuario_cache
+    
+    # Ya resuelto en este mismo request
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
     
     # Intentar obtener session_id de Redis primero
     session_id = request.session.get("session_id")
     
     if session_id:
         # Leer sesión desde Redis
-        session_data = session_store.get_session(session_id)
+        session_data = await session_store.aget_session(session_id)
         if session_data:
             usuario_sesion = session_data.get("usuario")
         else:
@@ -62,12 +122,8 @@ async def get_current_user(request: Request):
             detail="No autenticado"
         )
     
-    # Obtener sesión DB temporal
-    db = SessionLocal()
-    try:
-        user = db.query(Usuario).filter(Usuario.usuario == usuario_sesion).first()
-    finally:
-        db.close()
+    # 🧠 Caché de usuarios (en cache miss consulta la base en el threadpool)
+    user = await usuario_cache.aobtener(usuario_sesion)
     
     if not user:
         raise HTTPException(
@@ -75,4 +131,18 @@ async def get_current_user(request: Request):
             detail="Usuario no encontrado"
         )
     
+    request.state.user = user
     return user
+
+
+async def get_current_user_optional(request: Request):
+    """
+    Como get_current_user, pero devuelve None si no hay usuario logueado.
+    Lo usa el rate limiting para identificar al usuario sin exigir login.
+    """
+    if "session" not in request.scope:
+        return getattr(request.state, "user", None)
+    try:
+        return await get_current_user(request)
+    except HTTPException:
+        return None
@@ -1,7 +1,8 @@
 """Inicialización de la base de datos"""
 from backend.config import engine, Base
-from backend.models import Usuario, Verificacion, PasswordResetToken, Sucursal
-from backend.database import SessionLocal
+from backend.models import Usuario, Verificacion, PasswordResetToken, Sucursal, SmsCola, VerificacionDiaria, IpRegla
+from backend.config.database import SessionLocal
+from backend.migrations import aplicar_migraciones
 import hashlib
 import sys
 import io
@@ -14,8 +15,24 @@ if sys.platform == "win32":
 def init_db():
     """Crea todas las tablas en la base de datos"""
     Base.metadata.create_all(bind=engine)
+    # 🔧 Cambios sobre tablas existentes (índices, columnas nuevas, ...)
+    aplicar_migraciones(engine)
     print("✅ Base de datos inicializada correctamente")
-    print("📊 Tablas creadas: usuarios, verificaciones, password_reset_tokens, sucursales")
+    print("📊 Tablas creadas: usuarios, verificaciones, password_reset_tokens, sucursales, sms_cola, verificaciones_diarias, ip_reglas")
+    inicializar_estadisticas()
+
+
+def inicializar_estadisticas():
+    """Genera el rollup diario la primera vez, si ya hay verificaciones cargadas"""
+    from backend.services.estadisticas_service import EstadisticasService
+
+    db = SessionLocal()
+    try:
+        if db.query(VerificacionDiaria).first() is None and db.query(Verificacion.id).first() is not None:
+            filas = EstadisticasService.reconstruir(db)
+            print(f"📊 Estadísticas diarias generadas: {filas} filas")
+    finally:
+        db.close()
 
 
 def create_default_admin():
@@ -1,35 +1,56 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, HTMLResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from starlette.middleware.sessions import SessionMiddleware
 
 # 🆕 Importar configuración centralizada
 from backend.config import settings, get_db
-from backend.models import Usuario, Verificacion
-from backend.core import get_current_user
+from backend.models import Usuario
+from backend.core import get_current_user, pool_hash
 from backend.middleware import LoggingMiddleware
-from backend.middleware.rate_limiting import (
-    limiter,
-    rate_limit_exceeded_handler,
-    check_ip_restrictions
-)
-from slowapi.errors import RateLimitExceeded
+from backend.middleware.rate_limiting import RestriccionIPMiddleware
+from backend.config.database import cerrar_engine_async
+from backend.config.redis_config import iniciar_redis_async, cerrar_redis_async
+from backend.services.http_client import close_http_client
+from backend.services.saldo_service import saldo_cache
+from backend.services.sucursal_cache import sucursal_cache
+from backend.services.sms_cola_service import sms_cola_workers
+
+
+# --- Ciclo de vida de la aplicación ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 🔴 Pool Redis asíncrono compartido (sesiones, limiter, cachés)
+    await iniciar_redis_async()
+    # 🏢 Sucursales en memoria (el envío de SMS no las consulta)
+    await run_in_threadpool(sucursal_cache.cargar)
+    # 💰 Refresco del saldo del proveedor en segundo plano
+    saldo_cache.iniciar_refresco()
+    # 📬 Workers que drenan la cola persistente de SMS
+    sms_cola_workers.iniciar()
+    yield
+    await sms_cola_workers.detener()
+    await saldo_cache.detener_refresco()
+    # 🔌 Cerrar pool HTTP hacia el proveedor SMS
+    await close_http_client()
+    await cerrar_redis_async()
+    await cerrar_engine_async()
+    pool_hash.cerrar()
+
 
 # --- Inicializar app FastAPI ---
 app = FastAPI(
     title="VerificarSms API",
     description="Sistema de verificación SMS para Los Quilmes S.A.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
-# --- Rate Limiting ---
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
-
 # --- Middlewares ---
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 app.add_middleware(
@@ -43,7 +64,7 @@ if settings.DEBUG:
     app.add_middleware(LoggingMiddleware)
 
 # 🚦 Middleware de rate limiting (whitelist/blacklist)
-app.middleware("http")(check_ip_restrictions)
+app.add_middleware(RestriccionIPMiddleware)
 
 # --- Archivos estáticos y plantillas ---
 app.mount("/static", StaticFiles(directory=str(settings.STATIC_DIR)), name="static")
@@ -123,13 +144,13 @@ def mostrar_login(request: Request):
     })
 
 @app.get("/logout")
-def logout(request: Request):
+async def logout(request: Request):
     from backend.services.session_service import session_store
     
     # Eliminar sesión de Redis si existe
     session_id = request.session.get("session_id")
     if session_id:
-        session_store.delete_session(session_id)
+        await session_store.adelete_session(session_id)
     
     # Limpiar cookies
     request.session.clear()
@@ -153,53 +174,31 @@ def debug_routes():
 # ============================
 @app.get("/home")
 def home(request: Request, user = Depends(get_current_user), db: Session = Depends(get_db)):
-    from sqlalchemy import func
     from datetime import datetime, timedelta
+    from backend.services import SMSService
+    from backend.services.estadisticas_service import EstadisticasService, ESTADOS_EXITOSOS
     
-    # Contar por estado
-    enviados = db.query(Verificacion).filter(
-        or_(Verificacion.estado == "enviado", Verificacion.estado == "test")
-    ).count()
-    fallidos = db.query(Verificacion).filter(Verificacion.estado == "fallido").count()
+    # 📊 Conteos desde el rollup diario (no escanea verificaciones)
+    por_estado = EstadisticasService.por_estado(db)
+    enviados = sum(por_estado.get(e, 0) for e in ESTADOS_EXITOSOS)
+    fallidos = por_estado.get("fallido", 0)
     
     # SMS por sucursal (top 5) - solo exitosos
-    sms_por_sucursal = db.query(
-        Verificacion.merchant_code,
-        func.count(Verificacion.id).label('total')
-    ).filter(
-        or_(Verificacion.estado == "enviado", Verificacion.estado == "test")
-    ).group_by(
-        Verificacion.merchant_code
-    ).order_by(
-        func.count(Verificacion.id).desc()
-    ).limit(5).all()
+    sms_por_sucursal = EstadisticasService.top_sucursales(db, limite=5, estados=ESTADOS_EXITOSOS)
     
-    # Últimos 7 días
+    # Últimos 7 días (una sola consulta agrupada, días sin SMS en 0)
     hoy = datetime.now()
     hace_7_dias = hoy - timedelta(days=6)  # 6 días atrás + hoy = 7 días
-    sms_ultimos_7_dias = []
-    
-    for i in range(7):
-        fecha = hace_7_dias + timedelta(days=i)
-        inicio_dia = datetime(fecha.year, fecha.month, fecha.day)
-        fin_dia = inicio_dia + timedelta(days=1)
-        
-        count = db.query(Verificacion).filter(
-            Verificacion.fecha >= inicio_dia,
-            Verificacion.fecha < fin_dia,
-            or_(Verificacion.estado == "enviado", Verificacion.estado == "test")
-        ).count()
-        
-        sms_ultimos_7_dias.append({
-            "fecha": fecha.strftime("%d/%m"),
-            "cantidad": count
-        })
+    sms_ultimos_7_dias = [
+        {"fecha": b["inicio"].strftime("%d/%m"), "cantidad": b["total"]}
+        for b in SMSService.histograma(db, "dia", hace_7_dias, hoy, estados=list(ESTADOS_EXITOSOS))
+    ]
 
     return render_template_protegido("home.html", request, {
         "user": user,
         "enviados": enviados,
         "no_enviados": fallidos,
-        "sms_por_sucursal": [{"sucursal": s.merchant_code, "total": s.total} for s in sms_por_sucursal],
+        "sms_por_sucursal": [{"sucursal": codigo, "total": total} for codigo, total in sms_por_sucursal],
         "ultimos_7_dias": sms_ultimos_7_dias,
         "total_exitosos": enviados,
         "total_fallidos": fallidos
@@ -0,0 +1,308 @@
+"""
+Motor de rate limiting con ventana deslizante
+=============================================
+
+Evalúa todas las ventanas de un endpoint (minuto, hora, día) con el
+multiplicador del rol en una sola llamada a Redis: un script Lua atómico
+que recorta y consulta el log de requests de cada ventana.
+
+Cada ventana es un log (ZSET, score = momento del request en ms): pasan
+como máximo `limit` requests en cualquier intervalo de `period` segundos,
+sin la ráfaga doble de la ventana fija en el borde ni el goteo extra de
+GCRA (que tras una ráfaga completa seguía liberando un lugar cada
+`period / limit`). La ráfaga inicial sigue permitida; después hay que
+esperar a que venza el request más viejo de la ventana.
+
+El log guarda hasta `limit` entradas por ventana y expira a los `period`
+segundos del último request.
+
+Sin Redis (o si Redis falla) usa el mismo algoritmo en memoria, por proceso.
+"""
+
+import logging
+import math
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Iterable, List, Optional, Sequence, Tuple
+
+from backend.config.rate_limits import (
+    REDIS_KEY_PREFIX,
+    REDIS_OVERRIDES_KEY,
+    RateLimitConfig,
+    aplicar_overrides,
+    get_limit_for_endpoint,
+)
+from backend.config.redis_config import get_redis_async, registrar_error_redis
+from backend.config.settings import settings
+from backend.services.session_service import ERRORES_REDIS, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================
+# 📜 SCRIPT LUA
+# ========================================
+
+# KEYS[i]: log (ZSET) de la ventana i
+# ARGV[1]: ahora (ms); ARGV[2]: miembro único de este request
+# ARGV[2i+1] y ARGV[2i+2]: período (ms) y límite de la ventana i
+# Devuelve {permitido, ventana, espera_ms, restantes}: `ventana` es la que
+# corta (la de mayor espera) o, si pasa, la que tiene menos restantes.
+# Solo registra el request si pasan todas las ventanas.
+VENTANA_LUA = """
+local ahora = tonumber(ARGV[1])
+local ventana, espera, restantes = 1, 0, -1
+for i = 1, #KEYS do
+    local periodo = tonumber(ARGV[2 * i + 1])
+    local limite = tonumber(ARGV[2 * i + 2])
+    local recorte = redis.pcall('ZREMRANGEBYSCORE', KEYS[i], '-inf', ahora - periodo)
+    if type(recorte) == 'table' and recorte.err then
+        -- Clave de otro tipo (ej: TAT de la versión GCRA): se descarta
+        redis.call('DEL', KEYS[i])
+    end
+    local usados = redis.call('ZCARD', KEYS[i])
+    if usados >= limite then
+        -- Pasa recién cuando vencen (usados - limite + 1) requests
+        local vence = redis.call('ZRANGE', KEYS[i], usados - limite, usados - limite, 'WITHSCORES')
+        local exceso = tonumber(vence[2]) + periodo - ahora
+        if exceso > espera then
+            ventana, espera = i, exceso
+        end
+    elseif espera == 0 then
+        local libres = limite - usados - 1
+        if restantes < 0 or libres < restantes then
+            ventana, restantes = i, libres
+        end
+    end
+end
+if espera > 0 then
+    return {0, ventana, math.ceil(espera), 0}
+end
+for i = 1, #KEYS do
+    redis.call('ZADD', KEYS[i], ahora, ARGV[2])
+    redis.call('PEXPIRE', KEYS[i], ARGV[2 * i + 1])
+end
+return {1, ventana, 0, restantes}
+"""
+
+
+@dataclass(frozen=True)
+class ResultadoLimite:
+    """Resultado de evaluar las ventanas de un endpoint"""
+    permitido: bool
+    limit_key: str
+    limite: int  # Límite (ya ajustado por rol) de la ventana informada
+    periodo: int
+    restantes: int
+    retry_after: int  # Segundos hasta poder reintentar (0 si se permitió)
+    reset: int  # Segundos hasta que la ventana informada queda vacía
+
+
+def ventana_deslizante(
+    logs: Sequence[Deque[float]],
+    ventanas: Sequence[Tuple[int, int]],
+    ahora: float
+) -> Tuple[bool, int, float, int]:
+    """
+    Misma lógica que VENTANA_LUA (respaldo en memoria)
+
+    Recorta los logs y, si pasan todas las ventanas, registra el request.
+
+    Args:
+        logs: Momentos (ms, en orden) de los requests de cada ventana
+        ventanas: (período en ms, límite) por ventana
+        ahora: Tiempo actual en ms
+
+    Returns:
+        Tupla (permitido, índice de ventana, espera en ms, restantes)
+    """
+    ventana, espera, restantes = 0, 0.0, -1
+    for i, (log, (periodo, limite)) in enumerate(zip(logs, ventanas)):
+        while log and log[0] <= ahora - periodo:
+            log.popleft()
+        usados = len(log)
+        if usados >= limite:
+            exceso = log[usados - limite] + periodo - ahora
+            if exceso > espera:
+                ventana, espera = i, exceso
+        elif espera == 0:
+            libres = limite - usados - 1
+            if restantes < 0 or libres < restantes:
+                ventana, restantes = i, libres
+
+    if espera > 0:
+        return False, ventana, espera, 0
+    for log in logs:
+        log.append(ahora)
+    return True, ventana, 0, restantes
+
+
+class Limitador:
+    """
+    Rate limiter de varias ventanas por request
+
+    - Con Redis: un EVALSHA por request (el script se registra una vez
+      por cliente y redis-py lo recarga solo si Redis lo pierde).
+    - Sin Redis: la misma ventana en memoria, acotada a `max_entradas` claves. Si
+      Redis deja de responder el circuit breaker evita esperar el timeout
+      en cada request.
+    - Los límites cambiados desde el panel se releen de Redis cada
+      RATE_LIMITS_RECARGA segundos (un HGETALL, no uno por request).
+    - `enabled = False` deja pasar todo (tests y benchmarks).
+    """
+
+    def __init__(self, max_entradas: int = 10000):
+        self.enabled = True
+        self.max_entradas = max_entradas
+        self._memoria: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._breaker = CircuitBreaker(
+            settings.SESSION_BREAKER_FALLOS, settings.SESSION_BREAKER_ESPERA, nombre="rate limits"
+        )
+        self._script = None
+        self._script_cliente = None
+        self._config_vence = 0.0
+
+    def invalidar_config(self):
+        """Fuerza a releer los límites de Redis en el próximo request"""
+        self._config_vence = 0.0
+
+    async def _recargar_config(self, cliente):
+        """Aplica los límites cambiados desde el panel si pasó el intervalo"""
+        if time.monotonic() < self._config_vence:
+            return
+        aplicar_overrides(await cliente.hgetall(REDIS_OVERRIDES_KEY))
+        self._config_vence = time.monotonic() + settings.RATE_LIMITS_RECARGA
+
+    @staticmethod
+    def clave(limit_key: str, identificador: str) -> str:
+        """Clave Redis del log de una ventana"""
+        return f"{REDIS_KEY_PREFIX}{limit_key}:{identificador}"
+
+    @staticmethod
+    def ventanas(limit_keys: Sequence[str], rol: str = "operador") -> List[RateLimitConfig]:
+        """Límites de cada ventana con el multiplicador del rol aplicado"""
+        configs = []
+        for limit_key in limit_keys:
+            config = get_limit_for_endpoint(limit_key, rol)
+            # Un multiplicador chico no puede dejar el límite en 0
+            configs.append(config.model_copy(update={"limit": max(config.limit, 1)}))
+        return configs
+
+    @staticmethod
+    def uso(log: Iterable[float], periodo: int, ahora: Optional[float] = None) -> int:
+        """
+        Requests dentro de la ventana según su log en memoria
+
+        Args:
+            log: Momentos (ms) de los requests registrados
+            periodo: Período en segundos
+            ahora: Tiempo actual en ms (por defecto, el reloj)
+        """
+        ahora = time.time() * 1000 if ahora is None else ahora
+        return sum(1 for momento in log if momento > ahora - periodo * 1000)
+
+    async def evaluar(
+        self,
+        identificador: str,
+        limit_keys: Sequence[str],
+        rol: str = "operador",
+        ahora: Optional[float] = None
+    ) -> ResultadoLimite:
+        """
+        Consumir un request en todas las ventanas de `limit_keys`
+
+        El request se cuenta solo si pasa todas las ventanas.
+
+        Args:
+            identificador: Usuario o IP (ver get_identifier)
+            limit_keys: Claves de RATE_LIMITS (ej: minuto, hora y día)
+            rol: Rol del usuario (aplica ROLE_MULTIPLIERS)
+            ahora: Tiempo actual en ms (por defecto, el reloj)
+
+        Returns:
+            ResultadoLimite
+        """
+        ahora = time.time() * 1000 if ahora is None else ahora
+        claves = [self.clave(limit_key, identificador) for limit_key in limit_keys]
+
+        cliente = get_redis_async()
+        if cliente is not None and self._breaker.disponible():
+            try:
+                await self._recargar_config(cliente)
+                configs = self.ventanas(limit_keys, rol)
+                args = [ahora, f"{ahora}:{secrets.token_hex(6)}"]
+                for config in configs:
+                    args += [config.period * 1000, config.limit]
+                if self._script_cliente is not cliente:
+                    self._script = cliente.register_script(VENTANA_LUA)
+                    self._script_cliente = cliente
+                permitido, ventana, espera, restantes = await self._script(keys=claves, args=args)
+                self._breaker.exito()
+                return self._resultado(limit_keys, configs, bool(permitido), ventana - 1, espera, restantes)
+            except ERRORES_REDIS as e:
+                registrar_error_redis(e)
+                self._breaker.fallo()
+            except Exception as e:
+                registrar_error_redis(e)
+                logger.error(f"❌ Error en el script de rate limiting: {e}")
+
+        return self.evaluar_memoria(claves, limit_keys, self.ventanas(limit_keys, rol), ahora)
+
+    def evaluar_memoria(
+        self,
+        claves: Sequence[str],
+        limit_keys: Sequence[str],
+        configs: Sequence[RateLimitConfig],
+        ahora: float
+    ) -> ResultadoLimite:
+        """Respaldo en memoria de `evaluar` (por proceso)"""
+        with self._lock:
+            logs = []
+            for clave in claves:
+                log = self._memoria.get(clave)
+                if log is None:
+                    log = self._memoria[clave] = deque()
+                self._memoria.move_to_end(clave)
+                logs.append(log)
+            permitido, ventana, espera, restantes = ventana_deslizante(
+                logs, [(config.period * 1000, config.limit) for config in configs], ahora
+            )
+            # Un log vencido se recorta en la próxima evaluación: no hace falta expirar
+            while len(self._memoria) > self.max_entradas:
+                self._memoria.popitem(last=False)
+
+        return self._resultado(limit_keys, configs, permitido, ventana, espera, restantes)
+
+    def reset_memoria(self):
+        """Vacía los contadores en memoria"""
+        with self._lock:
+            self._memoria.clear()
+
+    @staticmethod
+    def _resultado(
+        limit_keys: Sequence[str],
+        configs: Sequence[RateLimitConfig],
+        permitido: bool,
+        ventana: int,
+        espera_ms: float,
+        restantes: int
+    ) -> ResultadoLimite:
+        config = configs[ventana]
+        return ResultadoLimite(
+            permitido=permitido,
+            limit_key=limit_keys[ventana],
+            limite=config.limit,
+            periodo=config.period,
+            restantes=max(int(restantes), 0),
+            retry_after=math.ceil(espera_ms / 1000) if not permitido else 0,
+            # El request más nuevo de la ventana vence a lo sumo en un período
+            reset=config.period,
+        )
+
+
+# Instancia global
+limitador = Limitador()
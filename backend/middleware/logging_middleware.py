@@ -1,47 +1,79 @@
 """Middleware para logging de requests"""
 import time
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
+# Prefijos que no se loguean ni se filtran (archivos estáticos)
+RUTAS_EXCLUIDAS = ("/static",)
+
+
+def excluida(scope: Scope, excluir: Iterable[str]) -> bool:
+    """True si el request no es HTTP o su path empieza con alguno de los prefijos"""
+    return scope["type"] != "http" or scope["path"].startswith(tuple(excluir))
+
+
+class LoggingMiddleware:
+    """
+    Middleware ASGI para registrar las peticiones HTTP
+
+    A diferencia de BaseHTTPMiddleware no crea tareas ni re-transmite el
+    body: solo envuelve `send` para leer el status y agregar X-Process-Time.
+    Los datos van también en `extra` (method, path, status, duracion_ms)
+    para los formatters estructurados. Con INFO deshabilitado no se arman
+    los logs, pero X-Process-Time se agrega igual.
+    """
+
+    def __init__(self, app: ASGIApp, excluir: Iterable[str] = RUTAS_EXCLUIDAS):
+        self.app = app
+        self.excluir = tuple(excluir)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if excluida(scope, self.excluir):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        status_code = 500
+        loguear = logger.isEnabledFor(logging.INFO)
+
+        if loguear:
+            logger.info("🔵 %s %s", method, path)
+
+        async def send_con_tiempo(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time = time.perf_counter() - start_time
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", str(process_time).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware para registrar todas las peticiones HTTP"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Registrar inicio de la petición
-        start_time = time.time()
-        
-        # Información básica de la petición
-        logger.info(f"🔵 {request.method} {request.url.path}")
-        
         try:
-            # Procesar la petición
-            response = await call_next(request)
-            
-            # Calcular tiempo de procesamiento
-            process_time = time.time() - start_time
-            
-            # Registrar respuesta
-            logger.info(
-                f"✅ {request.method} {request.url.path} - "
-                f"Status: {response.status_code} - "
-                f"Time: {process_time:.3f}s"
-            )
-            
-            # Agregar header con tiempo de procesamiento
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
+            await self.app(scope, receive, send_con_tiempo)
         except Exception as e:
             # Capturar y registrar cualquier excepción
-            process_time = time.time() - start_time
+            process_time = time.perf_counter() - start_time
             logger.error(
-                f"❌ {request.method} {request.url.path} - "
-                f"Error: {type(e).__name__}: {str(e)} - "
-                f"Time: {process_time:.3f}s",
-                exc_info=True
+                "❌ %s %s - Error: %s: %s - Time: %.3fs",
+                method, path, type(e).__name__, e, process_time,
+                exc_info=True,
+                extra={"method": method, "path": path, "status": 500,
+                       "duracion_ms": round(process_time * 1000, 2)}
             )
             raise
+
+        if not loguear:
+            return
+        process_time = time.perf_counter() - start_time
+        logger.info(
+            "✅ %s %s - Status: %s - Time: %.3fs",
+            method, path, status_code, process_time,
+            extra={"method": method, "path": path, "status": status_code,
+                   "duracion_ms": round(process_time * 1000, 2)}
+        )
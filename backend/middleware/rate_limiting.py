@@ -4,193 +4,248 @@ Middleware de Rate Limiting para VerificarSms
 
 Implementa rate limiting usando Redis como backend.
 Protege endpoints críticos de abuso y spam.
+
+Los límites se aplican con la dependencia `limitar(...)`: todas las
+ventanas del endpoint se evalúan juntas con una ventana deslizante
+(ver limitador.py).
 """
 
-from fastapi import Request, HTTPException, status
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from typing import Optional
-import redis
+from fastapi import Depends, Request, Response, HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import ipaddress
 import logging
+import time
 
 from backend.config import settings
 from backend.config.rate_limits import (
-    is_ip_whitelisted,
-    is_ip_blacklisted,
+    aplicar_overrides,
     format_retry_after,
+    get_limit_for_endpoint,
     ERROR_MESSAGES,
     REDIS_KEY_PREFIX,
+    REDIS_OVERRIDES_KEY,
 )
+from backend.core import get_current_user_optional
+from backend.config.redis_config import aescanear_claves, get_redis_async
+from backend.middleware.logging_middleware import RUTAS_EXCLUIDAS, excluida
+from backend.middleware.limitador import Limitador, ResultadoLimite, limitador
+from backend.services.filtro_ip import filtro_ip
 
 logger = logging.getLogger(__name__)
 
 
 # ========================================
-# 🔧 CONFIGURACIÓN DE REDIS
+# 🚦 FUNCIONES DE KEY
 # ========================================
 
-def get_redis_connection() -> Optional[redis.Redis]:
-    """
-    Obtiene conexión a Redis para rate limiting.
-    
-    Returns:
-        Cliente Redis o None si no está configurado
-    """
-    try:
-        if not settings.REDIS_URL:
-            logger.warning("⚠️  Redis no configurado - rate limiting deshabilitado")
-            return None
-        
-        redis_client = redis.from_url(
-            settings.REDIS_URL,
-            decode_responses=True,
-            socket_connect_timeout=2,
-            socket_timeout=2
-        )
-        
-        # Verificar conexión
-        redis_client.ping()
-        logger.info("✅ Redis conectado para rate limiting")
-        return redis_client
-        
-    except Exception as e:
-        logger.error(f"❌ Error conectando a Redis: {e}")
-        return None
+def get_remote_address(request: Request) -> Optional[str]:
+    """IP de la conexión directa (None si es un socket unix)"""
+    return request.client.host if request.client else None
 
 
-# ========================================
-# 🚦 FUNCIONES DE KEY
-# ========================================
-
-def get_identifier(request: Request) -> str:
+def get_identifier(request: Request, user = None) -> str:
     """
     Obtiene identificador único para rate limiting.
     Usa usuario si está autenticado, sino IP.
     
     Args:
         request: Request de FastAPI
+        user: Usuario ya resuelto (por defecto, request.state.user)
     
     Returns:
         String único para identificar al cliente
     """
     # Si hay usuario autenticado, usar su ID
-    if hasattr(request.state, "user") and request.state.user:
-        user = request.state.user
+    user = user or getattr(request.state, "user", None)
+    if user:
         return f"user:{user.usuario}"
     
     # Sino, usar IP
-    ip = get_remote_address(request)
+    ip = get_real_ip(request)
     return f"ip:{ip}"
 
 
+@lru_cache(maxsize=8)
+def _redes_confiables(proxies: Tuple[str, ...]) -> Tuple:
+    redes = []
+    for proxy in proxies:
+        try:
+            redes.append(ipaddress.ip_network(proxy, strict=False))
+        except ValueError:
+            pass  # Nombres (ej: "testclient") se comparan tal cual
+    return tuple(redes)
+
+
+def es_proxy_confiable(ip: str) -> bool:
+    """IP (o rango CIDR, ej: la red de Docker) listada en TRUSTED_PROXIES"""
+    if ip in settings.TRUSTED_PROXIES:
+        return True
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in red for red in _redes_confiables(tuple(settings.TRUSTED_PROXIES)))
+
+
 def get_real_ip(request: Request) -> str:
     """
     Obtiene la IP real del cliente considerando proxies.
     
+    Los headers de proxy solo se respetan si la conexión viene de un proxy
+    de confianza (TRUSTED_PROXIES): si no, cualquiera podría falsificarlos
+    para saltear la whitelist o repartir sus intentos entre IPs inventadas.
+    Con el proxy en otro contenedor hay que agregar su IP o la red de
+    Docker (ej: 172.16.0.0/12): si no, todos los clientes comparten la IP
+    del proxy y sus límites.
+    
     Args:
         request: Request de FastAPI
     
     Returns:
         IP del cliente
     """
+    ip = get_remote_address(request)
+    # Por un socket unix solo se conectan procesos locales (el proxy)
+    if ip is not None and not es_proxy_confiable(ip):
+        return ip
+    
     # Verificar headers de proxy
     forwarded = request.headers.get("X-Forwarded-For")
     if forwarded:
-        # Tomar la primera IP (cliente original)
-        return forwarded.split(",")[0].strip()
+        # De derecha a izquierda: la primera IP que no es un proxy propio
+        # es el cliente (lo de más a la izquierda lo escribe el cliente)
+        saltos = [salto.strip() for salto in forwarded.split(",") if salto.strip()]
+        for salto in reversed(saltos):
+            if not es_proxy_confiable(salto):
+                return salto
+        return saltos[0] if saltos else ip
     
     real_ip = request.headers.get("X-Real-IP")
     if real_ip:
-        return real_ip
+        return real_ip.strip()
     
     # Fallback a IP de conexión directa
-    return get_remote_address(request)
+    return ip or "desconocida"
 
 
 # ========================================
 # 🚨 MIDDLEWARE DE BLACKLIST/WHITELIST
 # ========================================
 
-async def check_ip_restrictions(request: Request, call_next):
+class RestriccionIPMiddleware:
     """
-    Middleware para verificar IP blacklist/whitelist.
-    
-    Args:
-        request: Request de FastAPI
-        call_next: Siguiente middleware
+    Middleware ASGI para verificar IP blacklist/whitelist.
     
-    Raises:
-        HTTPException 403 si IP está bloqueada
+    Corre antes que todo lo demás, así que es ASGI puro (sin las tareas ni
+    el re-envío del body de BaseHTTPMiddleware) y deja pasar los estáticos
+    sin mirar la IP.
     
-    Returns:
-        Response del siguiente middleware
+    Responde 403 si la IP está bloqueada (un HTTPException acá no pasa por
+    los handlers de FastAPI y terminaba en 500); si no, deja el flag
+    `whitelisted` en request.state para el rate limiting.
     """
-    ip = get_real_ip(request)
     
-    # Verificar blacklist
-    if is_ip_blacklisted(ip):
-        logger.warning(f"🚫 IP bloqueada intentó acceder: {ip}")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=ERROR_MESSAGES["ip_blocked"]
-        )
+    def __init__(self, app: ASGIApp, excluir: Iterable[str] = RUTAS_EXCLUIDAS):
+        self.app = app
+        self.excluir = tuple(excluir)
     
-    # Si está en whitelist, agregar flag
-    if is_ip_whitelisted(ip):
-        request.state.whitelisted = True
-        logger.debug(f"✅ IP en whitelist: {ip}")
-    
-    return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if excluida(scope, self.excluir):
+            await self.app(scope, receive, send)
+            return
+        
+        await filtro_ip.recargar_si_cambio()
+        ip = get_real_ip(Request(scope))
+        permitida, bloqueada = filtro_ip.consultar(ip)
+        
+        # Verificar blacklist
+        if bloqueada:
+            logger.warning("🚫 IP bloqueada intentó acceder: %s", ip)
+            response = JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"detail": ERROR_MESSAGES["ip_blocked"]}
+            )
+            await response(scope, receive, send)
+            return
+        
+        # Flag para el rate limiting (True = whitelist)
+        scope.setdefault("state", {})["whitelisted"] = permitida
+        
+        await self.app(scope, receive, send)
 
 
 # ========================================
 # 🎯 LIMITER PRINCIPAL
 # ========================================
 
-# Inicializar limiter con Redis si está disponible
-redis_client = get_redis_connection()
-
-if redis_client:
-    limiter = Limiter(
-        key_func=get_identifier,
-        storage_uri=settings.REDIS_URL,
-        strategy="fixed-window",  # Estrategia de ventana fija
-        headers_enabled=True,  # Incluir headers de rate limit
-    )
-    logger.info("✅ Rate limiting habilitado con Redis")
-else:
-    # Fallback a memoria (solo para desarrollo)
-    limiter = Limiter(
-        key_func=get_identifier,
-        strategy="fixed-window",
-        headers_enabled=True,
-    )
-    logger.warning("⚠️  Rate limiting usando memoria (no distribuido)")
+def limitar(*limit_keys: str):
+    """
+    Dependencia que aplica uno o más límites de RATE_LIMITS a un endpoint.
+    
+    Todas las ventanas se evalúan en una sola llamada a Redis y el request
+    solo se cuenta si pasa todas. Con usuario logueado el límite es por
+    usuario (con el multiplicador de su rol), así las sucursales detrás de
+    un mismo NAT no comparten cupo; sin login es por IP. Las IPs de la
+    whitelist no tienen límite.
+    
+    Args:
+        limit_keys: Claves de RATE_LIMITS (ej: "sms_enviar", "sms_enviar_por_hora")
+    
+    Returns:
+        Dependencia de FastAPI
+    
+    Raises:
+        HTTPException 429 si se excede alguna ventana
+    """
+    async def dependencia(
+        request: Request,
+        response: Response,
+        user = Depends(get_current_user_optional)
+    ):
+        if not limitador.enabled:
+            return
+        
+        whitelisted = getattr(request.state, "whitelisted", None)
+        if whitelisted is None:  # Sin el middleware de IPs (ej: tests)
+            whitelisted = filtro_ip.permitida(get_real_ip(request))
+        if whitelisted:
+            return
+        
+        resultado = await limitador.evaluar(
+            get_identifier(request, user),
+            limit_keys,
+            rol=getattr(user, "rol", None) or "operador"
+        )
+        
+        if not resultado.permitido:
+            raise limite_excedido(request, resultado)
+        
+        response.headers["X-RateLimit-Limit"] = str(resultado.limite)
+        response.headers["X-RateLimit-Remaining"] = str(resultado.restantes)
+        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + resultado.reset)
+    
+    return dependencia
 
 
 # ========================================
 # 📝 HANDLER DE ERRORES
 # ========================================
 
-def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+def limite_excedido(request: Request, resultado: ResultadoLimite) -> HTTPException:
     """
-    Handler personalizado para errores de rate limit.
+    Arma el error 429 con mensaje personalizado.
     
     Args:
         request: Request de FastAPI
-        exc: Excepción de rate limit
+        resultado: Ventana que cortó el request
     
     Returns:
         HTTPException con mensaje personalizado
     """
-    # Calcular tiempo de retry con manejo de error
-    try:
-        retry_after = int(exc.detail.split("Retry after ")[1].split(" seconds")[0])
-    except (IndexError, ValueError):
-        # Si no se puede parsear, usar 60 segundos por defecto
-        retry_after = 60
-    
+    retry_after = max(resultado.retry_after, 1)
     retry_formatted = format_retry_after(retry_after)
     
     # Determinar tipo de error según endpoint
@@ -198,8 +253,8 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     
     if "/send-sms" in path or "/sms" in path:
         message = ERROR_MESSAGES["rate_limit_exceeded_sms"].format(
-            limit=exc.detail.split(" ")[0],
-            period=exc.detail.split(" per ")[1].split(" ")[0],
+            limit=resultado.limite,
+            period=resultado.periodo,
             retry_after=retry_formatted
         )
     elif "/login" in path:
@@ -214,10 +269,10 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     # Log del evento
     identifier = get_identifier(request)
     logger.warning(
-        f"🚦 Rate limit excedido - {identifier} - {path} - Retry: {retry_formatted}"
+        f"🚦 Rate limit excedido - {identifier} - {path} - {resultado.limit_key} - Retry: {retry_formatted}"
     )
     
-    raise HTTPException(
+    return HTTPException(
         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
         detail={
             "ok": False,
@@ -225,7 +280,11 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
             "retry_after": retry_after,
             "retry_after_formatted": retry_formatted,
         },
-        headers={"Retry-After": str(retry_after)}
+        headers={
+            "Retry-After": str(retry_after),
+            "X-RateLimit-Limit": str(resultado.limite),
+            "X-RateLimit-Remaining": "0",
+        }
     )
 
 
@@ -233,7 +292,37 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
 # 🔧 FUNCIONES DE UTILIDAD
 # ========================================
 
-def get_rate_limit_status(identifier: str, limit_key: str) -> dict:
+async def usos_de_claves(cliente, keys: List[str]) -> List[int]:
+    """
+    Requests dentro de la ventana de cada clave de rate limit.
+    
+    Cada clave es el log (ZSET) de una ventana: se cuentan con ZCOUNT los
+    requests del último período (el base, el rol no lo cambia), todas las
+    claves en un solo pipeline.
+    
+    Args:
+        cliente: Cliente Redis async
+        keys: Claves completas (ratelimit:{limit_key}:{identifier})
+    
+    Returns:
+        Requests dentro de la ventana, por clave (0 si no se reconoce)
+    """
+    if not keys:
+        return []
+    
+    ahora = time.time() * 1000
+    pipe = cliente.pipeline(transaction=False)
+    for key in keys:
+        try:
+            periodo = get_limit_for_endpoint(key[len(REDIS_KEY_PREFIX):].split(":", 1)[0]).period
+        except ValueError:
+            periodo = 0
+        pipe.zcount(key, f"({ahora - periodo * 1000}", "+inf")
+    usos = await pipe.execute(raise_on_error=False)
+    return [uso if isinstance(uso, int) else 0 for uso in usos]
+
+
+async def get_rate_limit_status(identifier: str, limit_key: str) -> dict:
     """
     Obtiene estado actual de rate limit para un identificador.
     
@@ -244,22 +333,23 @@ def get_rate_limit_status(identifier: str, limit_key: str) -> dict:
     Returns:
         Dict con estado del rate limit
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         return {
             "enabled": False,
             "message": "Rate limiting no disponible"
         }
     
     try:
-        key = f"{REDIS_KEY_PREFIX}{limit_key}:{identifier}"
-        current = redis_client.get(key)
-        ttl = redis_client.ttl(key)
+        key = Limitador.clave(limit_key, identifier)
+        (uso,) = await usos_de_claves(cliente, [key])
+        ttl = await cliente.ttl(key)
         
         return {
             "enabled": True,
             "identifier": identifier,
             "limit_key": limit_key,
-            "current_usage": int(current) if current else 0,
+            "current_usage": uso,
             "ttl": ttl if ttl > 0 else 0,
             "reset_in": format_retry_after(ttl) if ttl > 0 else "N/A"
         }
@@ -271,7 +361,7 @@ def get_rate_limit_status(identifier: str, limit_key: str) -> dict:
         }
 
 
-def reset_rate_limit(identifier: str, limit_key: str) -> bool:
+async def reset_rate_limit(identifier: str, limit_key: str) -> bool:
     """
     Resetea el contador de rate limit para un identificador.
     
@@ -282,12 +372,13 @@ def reset_rate_limit(identifier: str, limit_key: str) -> bool:
     Returns:
         True si se reseteo exitosamente
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         return False
     
     try:
-        key = f"{REDIS_KEY_PREFIX}{limit_key}:{identifier}"
-        redis_client.delete(key)
+        key = Limitador.clave(limit_key, identifier)
+        await cliente.delete(key)
         logger.info(f"✅ Rate limit reseteado: {key}")
         return True
     except Exception as e:
@@ -295,65 +386,108 @@ def reset_rate_limit(identifier: str, limit_key: str) -> bool:
         return False
 
 
-def get_all_rate_limits() -> list:
+async def get_all_rate_limits(cursor: int = 0, limite: int = 100) -> Tuple[list, int]:
     """
-    Obtiene todos los rate limits activos.
+    Obtiene una página de rate limits activos.
+    
+    Las claves se recorren con SCAN (no bloquea Redis); el uso y el
+    TTL de la página se leen en dos pipelines (ZCOUNT y TTL).
+    
+    Args:
+        cursor: Cursor de SCAN (0 = primera página)
+        limite: Cantidad aproximada de claves por página
     
     Returns:
-        Lista de dicts con información de rate limits activos
+        Tupla (lista de rate limits activos, siguiente cursor; 0 = fin)
     """
-    if not redis_client:
-        return []
+    cliente = get_redis_async()
+    if cliente is None:
+        return [], 0
     
     try:
         pattern = f"{REDIS_KEY_PREFIX}*"
-        keys = redis_client.keys(pattern)
+        keys, next_cursor = await aescanear_claves(cliente, pattern, cursor, limite)
+        if not keys:
+            return [], next_cursor
         
-        limits = []
+        usos = await usos_de_claves(cliente, keys)
+        pipe = cliente.pipeline(transaction=False)
         for key in keys:
-            value = redis_client.get(key)
-            ttl = redis_client.ttl(key)
-            
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+        
+        limits = []
+        for key, uso, ttl in zip(keys, usos, ttls):
             limits.append({
                 "key": key.replace(REDIS_KEY_PREFIX, ""),
-                "count": int(value) if value else 0,
+                "count": uso,
                 "ttl": ttl,
                 "reset_in": format_retry_after(ttl) if ttl > 0 else "Expirado"
             })
         
-        return limits
+        return limits, next_cursor
     except Exception as e:
         logger.error(f"Error obteniendo rate limits: {e}")
-        return []
+        return [], 0
 
 
 # ========================================
-# 🎨 DECORADORES PERSONALIZADOS
+# 🔄 LÍMITES EDITABLES DESDE EL PANEL
 # ========================================
 
-def require_rate_limit(limit_string: str, exempt_when: callable = None):
+# Cambios guardados en este proceso cuando no hay Redis
+_overrides_locales: Dict[str, str] = {}
+
+
+async def recargar_overrides() -> Dict[str, str]:
     """
-    Decorador personalizado para aplicar rate limiting.
+    Lee de Redis los límites cambiados desde el panel y los aplica.
+    
+    Returns:
+        Cambios vigentes (campo -> valor)
+    """
+    overrides = _overrides_locales
+    cliente = get_redis_async()
+    if cliente is not None:
+        try:
+            overrides = await cliente.hgetall(REDIS_OVERRIDES_KEY)
+        except Exception as e:
+            logger.error(f"Error leyendo límites del panel: {e}")
+    
+    aplicar_overrides(overrides)
+    return overrides
+
+
+async def guardar_override(campo: str, valor: Optional[str]) -> bool:
+    """
+    Guarda (o borra, con valor None) un cambio de límite y lo aplica.
+    
+    En este proceso el cambio rige de inmediato; los demás workers lo
+    toman en RATE_LIMITS_RECARGA segundos.
     
     Args:
-        limit_string: String de límite (ej: "5/minute")
-        exempt_when: Función que determina si se debe eximir del límite
+        campo: Campo del hash (ver campo_override_limite / campo_override_rol)
+        valor: "<limit>/<period>" o multiplicador; None vuelve al valor base
     
     Returns:
-        Decorador
+        True si se guardó
     """
-    def decorator(func):
-        async def wrapper(request: Request, *args, **kwargs):
-            # Verificar si está exento
-            if exempt_when and exempt_when(request):
-                return await func(request, *args, **kwargs)
-            
-            # Verificar whitelist
-            if hasattr(request.state, "whitelisted") and request.state.whitelisted:
-                return await func(request, *args, **kwargs)
-            
-            # Aplicar rate limit usando slowapi
-            return await limiter.limit(limit_string)(func)(request, *args, **kwargs)
-        
-        return wrapper
-    return decorator
+    cliente = get_redis_async()
+    if cliente is not None:
+        try:
+            if valor is None:
+                await cliente.hdel(REDIS_OVERRIDES_KEY, campo)
+            else:
+                await cliente.hset(REDIS_OVERRIDES_KEY, campo, valor)
+        except Exception as e:
+            logger.error(f"Error guardando límite del panel: {e}")
+            return False
+    elif valor is None:
+        _overrides_locales.pop(campo, None)
+    else:
+        _overrides_locales[campo] = valor
+    
+    await recargar_overrides()
+    limitador.invalidar_config()
+    logger.info(f"🔄 Límite actualizado desde el panel: {campo} = {valor or 'base'}")
+    return True
@@ -0,0 +1,72 @@
+"""
+Migraciones versionadas del esquema
+===================================
+
+Cada módulo `mNNNN_descripcion.py` de este paquete define:
+
+- DESCRIPCION: texto corto de la migración
+- upgrade(engine): aplica el cambio (debe ser idempotente)
+
+Las versiones aplicadas se registran en la tabla `schema_migrations`.
+Se ejecutan desde `init_db()` o manualmente con `python -m backend.migrations`.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+from typing import List
+from sqlalchemy import Table, MetaData, Column, String, DateTime, select, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+# Tabla de control fuera de Base: no depende de create_all()
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(50), primary_key=True),
+    Column("descripcion", String, nullable=True),
+    Column("aplicada_en", DateTime, default=datetime.now),
+)
+
+
+def listar_migraciones() -> List[str]:
+    """Nombres de los módulos de migración, en orden de versión"""
+    return sorted(
+        nombre for _, nombre, es_paquete in pkgutil.iter_modules(__path__)
+        if not es_paquete and nombre.startswith("m") and nombre[1:5].isdigit()
+    )
+
+
+def aplicar_migraciones(engine: Engine) -> List[str]:
+    """
+    Aplica las migraciones pendientes
+
+    Returns:
+        Versiones aplicadas en esta ejecución
+    """
+    schema_migrations.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        aplicadas = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    nuevas = []
+    for version in listar_migraciones():
+        if version in aplicadas:
+            continue
+
+        modulo = importlib.import_module(f"{__name__}.{version}")
+        print(f"🔧 Aplicando migración {version}: {modulo.DESCRIPCION}")
+        modulo.upgrade(engine)
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(schema_migrations).values(
+                    version=version,
+                    descripcion=modulo.DESCRIPCION,
+                    aplicada_en=datetime.now()
+                ))
+        except IntegrityError:
+            # Otro proceso la registró en paralelo (las migraciones son idempotentes)
+            pass
+        nuevas.append(version)
+
+    return nuevas
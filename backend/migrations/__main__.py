@@ -0,0 +1,10 @@
+"""Aplicar migraciones pendientes: python -m backend.migrations"""
+from backend.config.database import engine
+from backend.migrations import aplicar_migraciones
+
+if __name__ == "__main__":
+    nuevas = aplicar_migraciones(engine)
+    if nuevas:
+        print(f"✅ {len(nuevas)} migraciones aplicadas")
+    else:
+        print("ℹ️  El esquema ya está actualizado")
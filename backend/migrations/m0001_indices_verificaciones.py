@@ -0,0 +1,37 @@
+"""
+Índices de `verificaciones` para los filtros del panel de SMS
+
+El panel filtra por usuario, sucursal, estado y rango de fechas, y siempre
+ordena por fecha descendente. Cada índice compuesto termina en `fecha` para
+que el motor resuelva filtro + orden + LIMIT recorriendo el índice, sin
+ordenar la tabla. El índice simple sobre `merchant_code` queda cubierto por
+(merchant_code, fecha) y se elimina.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+DESCRIPCION = "Índices compuestos de verificaciones por fecha"
+
+INDICES = {
+    "ix_verificaciones_fecha": "fecha",
+    "ix_verificaciones_merchant_fecha": "merchant_code, fecha",
+    "ix_verificaciones_usuario_fecha": "usuario_id, fecha",
+    "ix_verificaciones_estado_fecha": "estado, fecha",
+}
+
+
+def upgrade(engine: Engine):
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY no bloquea escrituras, pero no puede correr en una transacción
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for nombre, columnas in INDICES.items():
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON verificaciones ({columnas})"))
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_verificaciones_merchant_code"))
+        return
+
+    with engine.begin() as conn:
+        for nombre, columnas in INDICES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON verificaciones ({columnas})"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_verificaciones_merchant_code"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE verificaciones"))
@@ -3,5 +3,8 @@ from .usuario import Usuario
 from .verificacion import Verificacion
 from .password_reset import PasswordResetToken
 from .sucursal import Sucursal
+from .sms_cola import SmsCola
+from .verificacion_diaria import VerificacionDiaria
+from .ip_regla import IpRegla
 
-__all__ = ["Usuario", "Verificacion", "PasswordResetToken", "Sucursal"]
+__all__ = ["Usuario", "Verificacion", "PasswordResetToken", "Sucursal", "SmsCola", "VerificacionDiaria", "IpRegla"]
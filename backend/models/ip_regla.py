@@ -0,0 +1,19 @@
+"""Modelo de las reglas de IPs (whitelist/blacklist) editables desde el panel"""
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from datetime import datetime
+from backend.config.database import Base
+
+
+class IpRegla(Base):
+    """IP o rango CIDR permitido (sin rate limit) o bloqueado"""
+    __tablename__ = "ip_reglas"
+    __table_args__ = (UniqueConstraint("red", "tipo", name="uq_ip_reglas_red_tipo"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    red = Column(String(64), nullable=False)            # Ej: "10.0.0.0/8", "2001:db8::/32", "1.2.3.4/32"
+    tipo = Column(String(10), nullable=False)           # permitir, bloquear
+    descripcion = Column(String(200), nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<IpRegla(id={self.id}, red='{self.red}', tipo='{self.tipo}')>"
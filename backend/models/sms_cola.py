@@ -0,0 +1,32 @@
+"""Modelo de la cola persistente de SMS salientes"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from backend.config.database import Base
+
+
+class SmsCola(Base):
+    """SMS pendiente de envío, procesado por los workers de la cola"""
+    __tablename__ = "sms_cola"
+
+    id = Column(Integer, primary_key=True, index=True)
+    verificacion_id = Column(
+        Integer,
+        ForeignKey("verificaciones.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    phone_number = Column(String, nullable=False)       # Número de celular
+    texto = Column(String, nullable=False)              # Mensaje ya armado
+    estado = Column(String(20), default="pendiente", index=True)  # pendiente, procesando, dead
+    intentos = Column(Integer, default=0)               # Intentos realizados
+    proximo_intento = Column(DateTime, default=datetime.now, index=True)  # Backoff
+    bloqueado_hasta = Column(DateTime, nullable=True)   # Lease del worker que lo tomó
+    ultimo_error = Column(String, nullable=True)        # Último error del proveedor
+    fecha_creacion = Column(DateTime, default=datetime.now)
+
+    # Relación con la verificación que se está enviando
+    verificacion = relationship("Verificacion")
+
+    def __repr__(self):
+        return f"<SmsCola(id={self.id}, verificacion_id={self.verificacion_id}, estado='{self.estado}', intentos={self.intentos})>"
@@ -1,5 +1,5 @@
 """Modelo de Verificación SMS"""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.config.database import Base
@@ -8,15 +8,22 @@ from backend.config.database import Base
 class Verificacion(Base):
     """Registro de SMS de verificación enviado"""
     __tablename__ = "verificaciones"
+    # Índices para los filtros del panel (ver backend/migrations/m0001_indices_verificaciones.py)
+    __table_args__ = (
+        Index("ix_verificaciones_fecha", "fecha"),
+        Index("ix_verificaciones_merchant_fecha", "merchant_code", "fecha"),
+        Index("ix_verificaciones_usuario_fecha", "usuario_id", "fecha"),
+        Index("ix_verificaciones_estado_fecha", "estado", "fecha"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     person_id = Column(String, index=True)              # DNI del cliente
     phone_number = Column(String, nullable=False)       # Número de celular
-    merchant_code = Column(String, index=True)          # Código de sucursal
+    merchant_code = Column(String)                      # Código de sucursal
     merchant_name = Column(String, nullable=True)       # Nombre de sucursal
     verification_code = Column(String, index=True)      # Código de verificación
     fecha = Column(DateTime, default=datetime.now)      # Fecha de envío
-    estado = Column(String(20), default="enviado")      # Estado: enviado, fallido
+    estado = Column(String(20), default="enviado")      # Estado: enviado, fallido, test, encolado, reintentando
     error_mensaje = Column(String, nullable=True)       # Mensaje de error si falló
 
     # Relación con usuario
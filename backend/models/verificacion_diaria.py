@@ -0,0 +1,22 @@
+"""Modelo de estadísticas diarias de verificaciones (rollup)"""
+from sqlalchemy import Column, Integer, String, Date
+from backend.config.database import Base
+
+
+class VerificacionDiaria(Base):
+    """
+    Cantidad de verificaciones por día, sucursal, usuario y estado
+
+    Se mantiene de forma incremental al registrar verificaciones y se puede
+    reconstruir con `python -m backend.scripts.recalcular_estadisticas`.
+    """
+    __tablename__ = "verificaciones_diarias"
+
+    fecha = Column(Date, primary_key=True)                       # Día (fecha local)
+    merchant_code = Column(String, primary_key=True, default="")  # Código de sucursal
+    usuario_id = Column(Integer, primary_key=True)               # Usuario que envió
+    estado = Column(String(20), primary_key=True)                # enviado, fallido, test, ...
+    total = Column(Integer, nullable=False, default=0)           # Cantidad de verificaciones
+
+    def __repr__(self):
+        return f"<VerificacionDiaria(fecha={self.fecha}, sucursal='{self.merchant_code}', usuario={self.usuario_id}, estado='{self.estado}', total={self.total})>"
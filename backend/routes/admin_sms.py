@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Literal
 
 # 🆕 Usar configuración y servicios centralizados
-from backend.config import get_db
+from backend.config import get_async_db, get_db, settings
+from backend.config.database import async_engine, estado_db
 from backend.models import Usuario, Verificacion
-from backend.core import get_current_user
+from backend.core import get_current_user, pool_hash
 from backend.services import SMSService, UserService
+from backend.services.sms_cola_service import SMSColaService, sms_cola_workers
+from backend.services.idempotencia_service import idempotencia_sms
+from backend.services.exportacion_service import ExportacionService, FORMATOS as FORMATOS_EXPORTACION
 
 admin_router = APIRouter()
 
@@ -23,56 +29,85 @@ def listar_usuarios(
     return [{"id": u.id, "nombre": u.usuario} for u in usuarios]
 
 
+def _serializar_sms(v: Verificacion, usuarios_dict: dict) -> dict:
+    return {
+        "id": v.id,
+        "dni": v.person_id,
+        "celular": v.phone_number,
+        "sucursal": v.merchant_code,
+        "codigo": v.verification_code,
+        "usuario_nombre": usuarios_dict.get(v.usuario_id, "desconocido"),
+        "fecha": v.fecha.isoformat(),
+        "estado": v.estado if v.estado else "enviado"
+    }
+
+
 # 📊 Lista de SMS enviados con filtros + paginación
+# - paginacion=cursor: keyset sobre (fecha, id), con next_cursor / prev_cursor
+# - paginacion=offset: skip/limit (compatibilidad)
 @admin_router.get("/api/admin/sms")
-def obtener_sms(
+async def obtener_sms(
     usuario_id: int | None = None,
     sucursal: str | None = None,
     fecha_inicio: str | None = None,
     fecha_fin: str | None = None,
     estado: str | None = None,
     skip: int = 0,
-    limit: int = 5,
-    db: Session = Depends(get_db),
+    limit: int = Query(5, ge=1, le=settings.MAX_PAGE_SIZE),
+    paginacion: Literal["offset", "cursor"] = "offset",
+    cursor: str | None = None,
+    incluir_total: bool = True,
+    db = Depends(get_async_db),
     user = Depends(get_current_user)
 ):
     if user.rol.lower() not in ["admin", "operador"]:
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
     # Convertir fechas string a datetime si existen
-    fecha_inicio_dt = datetime.fromisoformat(fecha_inicio) if fecha_inicio else None
-    fecha_fin_dt = datetime.fromisoformat(fecha_fin) if fecha_fin else None
+    filtros = {
+        "usuario_id": usuario_id,
+        "sucursal": sucursal,
+        "fecha_inicio": datetime.fromisoformat(fecha_inicio) if fecha_inicio else None,
+        "fecha_fin": datetime.fromisoformat(fecha_fin) if fecha_fin else None,
+        "estado": estado
+    }
     
-    # 🆕 Usar servicio para obtener verificaciones
-    verifs, total = SMSService.get_verificaciones(
-        db=db,
-        usuario_id=usuario_id,
-        sucursal=sucursal,
-        fecha_inicio=fecha_inicio_dt,
-        fecha_fin=fecha_fin_dt,
-        estado=estado,
-        skip=skip,
-        limit=limit
-    )
+    # Consultas y serialización en un solo viaje por la sesión async
+    def listar(db: Session) -> dict:
+        respuesta = {}
+        if paginacion == "cursor" or cursor:
+            try:
+                verifs, next_cursor, prev_cursor = SMSService.get_verificaciones_cursor(
+                    db=db,
+                    cursor=cursor,
+                    limit=limit,
+                    **filtros
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+            respuesta["next_cursor"] = next_cursor
+            respuesta["prev_cursor"] = prev_cursor
+            # El total es opcional (caché con TTL corto)
+            if incluir_total:
+                respuesta["total"] = SMSService.contar_verificaciones(db, **filtros)
+        else:
+            # 🆕 Usar servicio para obtener verificaciones
+            verifs, total = SMSService.get_verificaciones(
+                db=db,
+                skip=skip,
+                limit=limit,
+                **filtros
+            )
+            respuesta["total"] = total
 
-    # 💡 Obtener nombres de usuarios de una sola vez
-    usuarios_dict = {u.id: u.usuario for u in UserService.get_all_users(db, limit=1000)}
+        # 💡 Solo los nombres de los usuarios de esta página (caché LRU, sin leer toda la tabla)
+        usuarios_dict = UserService.get_nombres(db, (v.usuario_id for v in verifs))
 
-    resultado = []
-    for v in verifs:
-        nombre_usuario = usuarios_dict.get(v.usuario_id, "desconocido")
-
-        resultado.append({
-            "dni": v.person_id,
-            "celular": v.phone_number,
-            "sucursal": v.merchant_code,
-            "codigo": v.verification_code,
-            "usuario_nombre": nombre_usuario,
-            "fecha": v.fecha.isoformat(),
-            "estado": v.estado if v.estado else "enviado"
-        })
+        respuesta["sms"] = [_serializar_sms(v, usuarios_dict) for v in verifs]
+        return respuesta
 
-    return {"sms": resultado, "total": total}
+    return await db.run_sync(listar)
 
 
 # 🔢 Obtener el total de registros con filtros activos
@@ -93,23 +128,54 @@ def contar_sms(
     fecha_inicio_dt = datetime.fromisoformat(fecha_inicio) if fecha_inicio else None
     fecha_fin_dt = datetime.fromisoformat(fecha_fin) if fecha_fin else None
     
-    # 🆕 Usar servicio
-    _, total = SMSService.get_verificaciones(
-        db=db,
+    # 🆕 Usar servicio (caché con TTL corto)
+    total = SMSService.contar_verificaciones(
+        db,
         usuario_id=usuario_id,
         sucursal=sucursal,
         fecha_inicio=fecha_inicio_dt,
         fecha_fin=fecha_fin_dt,
-        estado=estado,
-        skip=0,
-        limit=1
+        estado=estado
     )
     
     return {"total": total}
 
 
+# 📤 Exportar registros filtrados en streaming (CSV / NDJSON, sin límite de filas)
+@admin_router.get("/api/admin/sms/exportar")
+def exportar_sms(
+    usuario_id: int | None = None,
+    sucursal: str | None = None,
+    fecha_inicio: str | None = None,
+    fecha_fin: str | None = None,
+    estado: str | None = None,
+    formato: Literal["csv", "ndjson"] = "csv",
+    user = Depends(get_current_user)
+):
+    if user.rol.lower() not in ["admin", "operador"]:
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    # La exportación abre su propia sesión: la del request se cierra antes del streaming
+    contenido = ExportacionService.exportar(
+        formato,
+        usuario_id=usuario_id,
+        sucursal=sucursal,
+        fecha_inicio=datetime.fromisoformat(fecha_inicio) if fecha_inicio else None,
+        fecha_fin=datetime.fromisoformat(fecha_fin) if fecha_fin else None,
+        estado=estado
+    )
+
+    nombre = f"sms_admin_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
+
+
 # 📤 Exportar todos los registros filtrados sin paginación
-@admin_router.get("/api/admin/sms/todos")
+# ⚠️ Obsoleto: limitado a 10.000 filas en memoria, usar /api/admin/sms/exportar
+@admin_router.get("/api/admin/sms/todos", deprecated=True)
 def obtener_todos_sms(
     usuario_id: int | None = None,
     sucursal: str | None = None,
@@ -138,7 +204,7 @@ def obtener_todos_sms(
         limit=10000
     )
     
-    usuarios_dict = {u.id: u.usuario for u in UserService.get_all_users(db, limit=1000)}
+    usuarios_dict = UserService.get_nombres(db, (v.usuario_id for v in verifs))
 
     resultado = []
     for v in verifs:
@@ -149,8 +215,82 @@ def obtener_todos_sms(
             "codigo": v.verification_code,
             "usuario_nombre": usuarios_dict.get(v.usuario_id, "desconocido"),
             "fecha": v.fecha.strftime("%Y-%m-%d"),
-            "estado": "enviado"
+            "estado": v.estado if v.estado else "enviado"
         })
 
     return resultado
 
+
+# 📬 Estado de la cola de SMS salientes
+@admin_router.get("/api/admin/sms/cola")
+def estado_cola_sms(
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    dead_letters = SMSColaService.get_dead_letters(db)
+
+    return {
+        "workers": sms_cola_workers.cantidad,
+        "por_estado": SMSColaService.resumen(db),
+        "dead_letters": [
+            {
+                "id": d.id,
+                "verificacion_id": d.verificacion_id,
+                "celular": d.phone_number,
+                "intentos": d.intentos,
+                "ultimo_error": d.ultimo_error,
+                "fecha": d.fecha_creacion.isoformat()
+            }
+            for d in dead_letters
+        ]
+    }
+
+
+# 🗄️ Ocupación y métricas del pool de conexiones a la base
+@admin_router.get("/api/admin/db/pool")
+def estado_pool_db(user = Depends(get_current_user)):
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    estado = estado_db()
+    if async_engine is not None:
+        estado["async"] = estado_db(async_engine.sync_engine)
+    return estado
+
+
+# 📵 Envíos deduplicados por clave de idempotencia
+@admin_router.get("/api/admin/sms/idempotencia")
+def estado_idempotencia(user = Depends(get_current_user)):
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    return idempotencia_sms.estado()
+
+
+# 🔑 Cola del pool de bcrypt (logins y cambios de contraseña)
+@admin_router.get("/api/admin/auth/hash")
+def estado_pool_hash(user = Depends(get_current_user)):
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    return {**pool_hash.estado(), "rounds": settings.BCRYPT_ROUNDS}
+
+
+# 🔁 Reintentar manualmente un SMS en dead-letter
+@admin_router.post("/api/admin/sms/cola/{job_id}/reintentar")
+def reintentar_sms_cola(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    if not SMSColaService.reintentar(db, job_id):
+        raise HTTPException(status_code=404, detail="SMS no encontrado en dead-letter")
+
+    sms_cola_workers.despertar()
+    return {"ok": True, "mensaje": "SMS devuelto a la cola"}
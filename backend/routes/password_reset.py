@@ -6,10 +6,12 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import secrets
+from typing import Optional, Tuple
 
-from backend.config import get_db, settings
+from backend.config import get_async_db, get_db, settings
 from backend.models import Usuario, PasswordResetToken
 from backend.services import EmailService, AuthService
+from backend.services.session_service import session_store
 
 router = APIRouter()
 templates = Jinja2Templates(directory=str(settings.TEMPLATES_DIR))
@@ -24,21 +26,18 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
-# 📧 Solicitar recuperación de contraseña
-@router.post("/api/forgot-password")
-async def forgot_password(data: ForgotPasswordRequest, db: Session = Depends(get_db)):
+def _crear_token_reset(db: Session, email: str) -> Optional[Tuple[str, str]]:
     """
-    Genera token de recuperación y envía email al usuario
+    Genera y guarda el token de recuperación
+    
+    Returns:
+        Tupla (usuario, token) o None si no hay usuario con ese email
     """
     # Buscar usuario por email
-    user = db.query(Usuario).filter(Usuario.email == data.email).first()
+    user = db.query(Usuario).filter(Usuario.email == email).first()
     
     if not user:
-        # Por seguridad, siempre responder OK aunque no exista el usuario
-        return {
-            "ok": True,
-            "mensaje": "Si el email existe en el sistema, recibirás un correo con instrucciones"
-        }
+        return None
     
     # Generar token único
     token = secrets.token_urlsafe(32)
@@ -55,11 +54,31 @@ async def forgot_password(data: ForgotPasswordRequest, db: Session = Depends(get
     db.add(reset_token)
     db.commit()
     
+    return user.usuario, token
+
+
+# 📧 Solicitar recuperación de contraseña
+@router.post("/api/forgot-password")
+async def forgot_password(data: ForgotPasswordRequest, db = Depends(get_async_db)):
+    """
+    Genera token de recuperación y envía email al usuario
+    """
+    resultado = await db.run_sync(_crear_token_reset, data.email)
+    
+    if not resultado:
+        # Por seguridad, siempre responder OK aunque no exista el usuario
+        return {
+            "ok": True,
+            "mensaje": "Si el email existe en el sistema, recibirás un correo con instrucciones"
+        }
+    
+    usuario, token = resultado
+    
     # Enviar email
     try:
         await EmailService.send_password_reset_email(
             email=data.email,
-            username=user.usuario,
+            username=usuario,
             reset_token=token
         )
         
@@ -109,6 +128,9 @@ def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
     reset_token.usado = 1
     db.commit()
     
+    # 🔒 Cerrar las sesiones abiertas con la contraseña anterior
+    session_store.revoke_user_sessions(user.id)
+    
     return {
         "ok": True,
         "mensaje": "Contraseña restablecida correctamente. Ya podés iniciar sesión."
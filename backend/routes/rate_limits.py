@@ -6,19 +6,33 @@ Endpoints administrativos para monitorear y gestionar rate limits.
 Solo accesible para usuarios con rol admin.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
 
+from backend.config import get_db
 from backend.core import get_current_user
-from backend.models import Usuario
+from backend.models import IpRegla, Usuario
 from backend.middleware.rate_limiting import (
     get_rate_limit_status,
     reset_rate_limit,
     get_all_rate_limits,
-    redis_client,
+    guardar_override,
+    recargar_overrides,
+    usos_de_claves,
 )
-from backend.config.rate_limits import RATE_LIMITS, ROLE_MULTIPLIERS
+from backend.config.rate_limits import (
+    BLACKLIST_IPS,
+    RATE_LIMITS,
+    RATE_LIMITS_BASE,
+    ROLE_MULTIPLIERS,
+    WHITELIST_IPS,
+    campo_override_limite,
+    campo_override_rol,
+)
+from backend.services.filtro_ip import filtro_ip, parsear_red
+from backend.config.redis_config import aescanear_claves, estado_redis, get_redis_async
 
 router = APIRouter(prefix="/admin/rate-limits", tags=["Admin - Rate Limiting"])
 
@@ -50,6 +64,24 @@ class ResetRequest(BaseModel):
     limit_key: str
 
 
+class LimitUpdate(BaseModel):
+    """Nuevo límite para un endpoint"""
+    limit: int = Field(..., ge=1)
+    period: int = Field(..., ge=1, le=86400 * 7)
+
+
+class MultiplierUpdate(BaseModel):
+    """Nuevo multiplicador para un rol"""
+    multiplier: float = Field(..., gt=0, le=100)
+
+
+class IpReglaCreate(BaseModel):
+    """Nueva IP o rango CIDR para la whitelist o la blacklist"""
+    red: str = Field(..., max_length=64)  # Ej: "200.1.2.3", "10.0.0.0/8", "2001:db8::/32"
+    tipo: Literal["permitir", "bloquear"]
+    descripcion: Optional[str] = Field(None, max_length=200)
+
+
 # ========================================
 # 🔐 VERIFICACIÓN DE ADMIN
 # ========================================
@@ -69,13 +101,14 @@ def require_admin(user: Usuario = Depends(get_current_user)):
 # ========================================
 
 @router.get("/config", response_model=List[RateLimitInfo])
-def get_rate_limits_config(admin: Usuario = Depends(require_admin)):
+async def get_rate_limits_config(admin: Usuario = Depends(require_admin)):
     """
     Obtiene la configuración de todos los rate limits.
     
     Returns:
-        Lista de rate limits configurados
+        Lista de rate limits configurados (con los cambios del panel)
     """
+    await recargar_overrides()
     return [
         RateLimitInfo(
             endpoint=key,
@@ -87,31 +120,98 @@ def get_rate_limits_config(admin: Usuario = Depends(require_admin)):
     ]
 
 
+@router.put("/config/{endpoint}")
+async def update_rate_limit(
+    endpoint: str,
+    cambio: LimitUpdate,
+    admin: Usuario = Depends(require_admin)
+):
+    """
+    Cambia el límite de un endpoint sin reiniciar.
+    
+    Args:
+        endpoint: Clave del límite (ej: "sms_enviar")
+        cambio: Nuevo límite y período
+    
+    Returns:
+        Límite vigente
+    """
+    if endpoint not in RATE_LIMITS_BASE:
+        raise HTTPException(status_code=404, detail=f"Límite no configurado: {endpoint}")
+    
+    if not await guardar_override(campo_override_limite(endpoint), f"{cambio.limit}/{cambio.period}"):
+        raise HTTPException(status_code=500, detail="Error al guardar el límite")
+    
+    config = RATE_LIMITS[endpoint]
+    return {
+        "ok": True,
+        "mensaje": f"Límite actualizado: {endpoint}",
+        "limit": config.limit,
+        "period": config.period
+    }
+
+
+@router.delete("/config/{endpoint}")
+async def restore_rate_limit(endpoint: str, admin: Usuario = Depends(require_admin)):
+    """
+    Vuelve el límite de un endpoint al valor base.
+    
+    Args:
+        endpoint: Clave del límite
+    
+    Returns:
+        Límite vigente
+    """
+    if endpoint not in RATE_LIMITS_BASE:
+        raise HTTPException(status_code=404, detail=f"Límite no configurado: {endpoint}")
+    
+    if not await guardar_override(campo_override_limite(endpoint), None):
+        raise HTTPException(status_code=500, detail="Error al restaurar el límite")
+    
+    config = RATE_LIMITS[endpoint]
+    return {
+        "ok": True,
+        "mensaje": f"Límite restaurado: {endpoint}",
+        "limit": config.limit,
+        "period": config.period
+    }
+
+
 @router.get("/active")
-def get_active_limits(admin: Usuario = Depends(require_admin)):
+async def get_active_limits(
+    cursor: int = Query(0, ge=0),
+    limite: int = Query(100, ge=1, le=1000),
+    admin: Usuario = Depends(require_admin)
+):
     """
-    Obtiene todos los rate limits activos en Redis.
+    Obtiene los rate limits activos en Redis, de a páginas.
+    
+    Args:
+        cursor: `next_cursor` de la página anterior (0 = primera)
+        limite: Cantidad aproximada de límites por página
     
     Returns:
-        Lista de rate limits activos con sus contadores
+        Página de rate limits activos con sus contadores
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         raise HTTPException(
             status_code=503,
             detail="Redis no disponible. Rate limiting deshabilitado."
         )
     
-    limits = get_all_rate_limits()
+    limits, next_cursor = await get_all_rate_limits(cursor, limite)
     
     return {
         "ok": True,
         "total": len(limits),
-        "limits": limits
+        "limits": limits,
+        "next_cursor": next_cursor
     }
 
 
 @router.get("/status/{identifier}/{limit_key}")
-def get_limit_status(
+async def get_limit_status(
     identifier: str,
     limit_key: str,
     admin: Usuario = Depends(require_admin)
@@ -126,13 +226,14 @@ def get_limit_status(
     Returns:
         Estado actual del rate limit
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         raise HTTPException(
             status_code=503,
             detail="Redis no disponible"
         )
     
-    status = get_rate_limit_status(identifier, limit_key)
+    status = await get_rate_limit_status(identifier, limit_key)
     
     return {
         "ok": True,
@@ -141,7 +242,7 @@ def get_limit_status(
 
 
 @router.post("/reset")
-def reset_limit(
+async def reset_limit(
     reset_req: ResetRequest,
     admin: Usuario = Depends(require_admin)
 ):
@@ -154,13 +255,14 @@ def reset_limit(
     Returns:
         Confirmación del reseteo
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         raise HTTPException(
             status_code=503,
             detail="Redis no disponible"
         )
     
-    success = reset_rate_limit(reset_req.identifier, reset_req.limit_key)
+    success = await reset_rate_limit(reset_req.identifier, reset_req.limit_key)
     
     if success:
         return {
@@ -175,7 +277,7 @@ def reset_limit(
 
 
 @router.delete("/clear-all")
-def clear_all_limits(admin: Usuario = Depends(require_admin)):
+async def clear_all_limits(admin: Usuario = Depends(require_admin)):
     """
     Elimina todos los rate limits activos (CUIDADO).
     Útil para testing o emergencias.
@@ -183,7 +285,8 @@ def clear_all_limits(admin: Usuario = Depends(require_admin)):
     Returns:
         Número de límites eliminados
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         raise HTTPException(
             status_code=503,
             detail="Redis no disponible"
@@ -192,13 +295,17 @@ def clear_all_limits(admin: Usuario = Depends(require_admin)):
     try:
         from backend.config.rate_limits import REDIS_KEY_PREFIX
         
+        # SCAN + UNLINK por lotes: no bloquea Redis con muchas claves
         pattern = f"{REDIS_KEY_PREFIX}*"
-        keys = redis_client.keys(pattern)
-        
-        if keys:
-            deleted = redis_client.delete(*keys)
-        else:
-            deleted = 0
+        deleted = 0
+        lote = []
+        async for key in cliente.scan_iter(match=pattern, count=500):
+            lote.append(key)
+            if len(lote) == 500:
+                deleted += await cliente.unlink(*lote)
+                lote = []
+        if lote:
+            deleted += await cliente.unlink(*lote)
         
         return {
             "ok": True,
@@ -213,13 +320,14 @@ def clear_all_limits(admin: Usuario = Depends(require_admin)):
 
 
 @router.get("/roles")
-def get_role_multipliers(admin: Usuario = Depends(require_admin)):
+async def get_role_multipliers(admin: Usuario = Depends(require_admin)):
     """
     Obtiene los multiplicadores de rate limit por rol.
     
     Returns:
         Multiplicadores configurados
     """
+    await recargar_overrides()
     return {
         "ok": True,
         "multipliers": ROLE_MULTIPLIERS,
@@ -227,15 +335,148 @@ def get_role_multipliers(admin: Usuario = Depends(require_admin)):
     }
 
 
+@router.put("/roles/{rol}")
+async def update_role_multiplier(
+    rol: str,
+    cambio: MultiplierUpdate,
+    admin: Usuario = Depends(require_admin)
+):
+    """
+    Cambia el multiplicador de un rol sin reiniciar.
+    
+    Args:
+        rol: Rol del usuario (ej: "operador")
+        cambio: Nuevo multiplicador
+    
+    Returns:
+        Multiplicadores vigentes
+    """
+    if not await guardar_override(campo_override_rol(rol), str(cambio.multiplier)):
+        raise HTTPException(status_code=500, detail="Error al guardar el multiplicador")
+    
+    return {
+        "ok": True,
+        "mensaje": f"Multiplicador actualizado: {rol.lower()}",
+        "multipliers": ROLE_MULTIPLIERS
+    }
+
+
+@router.delete("/roles/{rol}")
+async def restore_role_multiplier(rol: str, admin: Usuario = Depends(require_admin)):
+    """
+    Vuelve el multiplicador de un rol al valor base (o lo quita si no tenía).
+    
+    Args:
+        rol: Rol del usuario
+    
+    Returns:
+        Multiplicadores vigentes
+    """
+    if not await guardar_override(campo_override_rol(rol), None):
+        raise HTTPException(status_code=500, detail="Error al restaurar el multiplicador")
+    
+    return {
+        "ok": True,
+        "mensaje": f"Multiplicador restaurado: {rol.lower()}",
+        "multipliers": ROLE_MULTIPLIERS
+    }
+
+
+@router.get("/ips")
+def get_ip_rules(db: Session = Depends(get_db), admin: Usuario = Depends(require_admin)):
+    """
+    Lista la whitelist y la blacklist.
+    
+    Returns:
+        Reglas del panel, listas base de rate_limits.py y tamaño compilado
+    """
+    reglas = db.query(IpRegla).order_by(IpRegla.id).all()
+    return {
+        "ok": True,
+        "reglas": [
+            {"id": r.id, "red": r.red, "tipo": r.tipo, "descripcion": r.descripcion}
+            for r in reglas
+        ],
+        "base": {"permitir": WHITELIST_IPS, "bloquear": BLACKLIST_IPS},
+        "compilado": filtro_ip.estado()
+    }
+
+
+@router.post("/ips", status_code=201)
+def add_ip_rule(
+    regla: IpReglaCreate,
+    db: Session = Depends(get_db),
+    admin: Usuario = Depends(require_admin)
+):
+    """
+    Agrega una IP o rango CIDR (IPv4 o IPv6) a la whitelist o la blacklist.
+    Rige en todos los workers sin reiniciar.
+    
+    Args:
+        regla: Red, tipo y descripción
+    
+    Returns:
+        Regla creada (con la red normalizada)
+    """
+    try:
+        red = str(parsear_red(regla.red))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"IP o rango CIDR inválido: {regla.red}")
+    
+    if db.query(IpRegla).filter(IpRegla.red == red, IpRegla.tipo == regla.tipo).first():
+        raise HTTPException(status_code=409, detail=f"La regla ya existe: {red}")
+    
+    nueva = IpRegla(red=red, tipo=regla.tipo, descripcion=regla.descripcion)
+    db.add(nueva)
+    db.commit()
+    db.refresh(nueva)
+    filtro_ip.publicar_cambio(db)
+    
+    return {
+        "ok": True,
+        "regla": {"id": nueva.id, "red": nueva.red, "tipo": nueva.tipo, "descripcion": nueva.descripcion}
+    }
+
+
+@router.delete("/ips/{regla_id}")
+def delete_ip_rule(
+    regla_id: int,
+    db: Session = Depends(get_db),
+    admin: Usuario = Depends(require_admin)
+):
+    """
+    Elimina una regla de IP del panel.
+    
+    Args:
+        regla_id: ID de la regla
+    
+    Returns:
+        Confirmación
+    """
+    regla = db.query(IpRegla).filter(IpRegla.id == regla_id).first()
+    if not regla:
+        raise HTTPException(status_code=404, detail="Regla no encontrada")
+    
+    descripcion = f"{regla.red} ({regla.tipo})"
+    db.delete(regla)
+    db.commit()
+    filtro_ip.publicar_cambio(db)
+    
+    return {
+        "ok": True,
+        "mensaje": f"Regla eliminada: {descripcion}"
+    }
+
+
 @router.get("/redis-status")
-def get_redis_status(admin: Usuario = Depends(require_admin)):
+async def get_redis_status(admin: Usuario = Depends(require_admin)):
     """
     Verifica el estado de conexión con Redis.
     
     Returns:
-        Estado de Redis
+        Estado de Redis y métricas del pool compartido
     """
-    if not redis_client:
+    if get_redis_async() is None:
         return {
             "ok": False,
             "connected": False,
@@ -243,8 +484,12 @@ def get_redis_status(admin: Usuario = Depends(require_admin)):
         }
     
     try:
-        redis_client.ping()
-        info = redis_client.info()
+        pool = await estado_redis()
+        cliente = get_redis_async()
+        if not pool.get("conectado") or cliente is None:
+            return {"ok": False, "connected": False, "pool": pool}
+        
+        info = await cliente.info()
         
         return {
             "ok": True,
@@ -253,6 +498,7 @@ def get_redis_status(admin: Usuario = Depends(require_admin)):
             "uptime_days": info.get("uptime_in_days"),
             "connected_clients": info.get("connected_clients"),
             "used_memory_human": info.get("used_memory_human"),
+            "pool": pool,
         }
     except Exception as e:
         return {
@@ -263,14 +509,15 @@ def get_redis_status(admin: Usuario = Depends(require_admin)):
 
 
 @router.get("/stats")
-def get_rate_limit_stats(admin: Usuario = Depends(require_admin)):
+async def get_rate_limit_stats(admin: Usuario = Depends(require_admin)):
     """
     Obtiene estadísticas generales de rate limiting.
     
     Returns:
         Estadísticas agregadas
     """
-    if not redis_client:
+    cliente = get_redis_async()
+    if cliente is None:
         raise HTTPException(
             status_code=503,
             detail="Redis no disponible"
@@ -279,17 +526,19 @@ def get_rate_limit_stats(admin: Usuario = Depends(require_admin)):
     try:
         from backend.config.rate_limits import REDIS_KEY_PREFIX
         
-        # Obtener todas las keys
+        # Recorrer las keys con SCAN y contar los requests de a lotes (ZCOUNT)
         pattern = f"{REDIS_KEY_PREFIX}*"
-        keys = redis_client.keys(pattern)
-        
-        # Agrupar por tipo de límite
         stats = {}
-        for key in keys:
-            # Extraer tipo de límite
-            parts = key.replace(REDIS_KEY_PREFIX, "").split(":")
-            if len(parts) >= 1:
-                limit_type = parts[0]
+        total = 0
+        cursor = 0
+        while True:
+            keys, cursor = await aescanear_claves(cliente, pattern, cursor, 500)
+            total += len(keys)
+            
+            # Agrupar por tipo de límite
+            for key, uso in zip(keys, await usos_de_claves(cliente, keys)):
+                # Extraer tipo de límite
+                limit_type = key.replace(REDIS_KEY_PREFIX, "").split(":")[0]
                 
                 if limit_type not in stats:
                     stats[limit_type] = {
@@ -298,13 +547,14 @@ def get_rate_limit_stats(admin: Usuario = Depends(require_admin)):
                     }
                 
                 stats[limit_type]["count"] += 1
-                value = redis_client.get(key)
-                if value:
-                    stats[limit_type]["total_requests"] += int(value)
+                stats[limit_type]["total_requests"] += uso
+            
+            if cursor == 0:
+                break
         
         return {
             "ok": True,
-            "total_active_limits": len(keys),
+            "total_active_limits": total,
             "by_type": stats
         }
     except Exception as e:
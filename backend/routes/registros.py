@@ -4,19 +4,29 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, File, UploadFile
 from fastapi.responses import HTMLResponse, JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, or_
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv, set_key
 
-from backend.database import get_db
-from backend.models import Usuario, Verificacion
+from backend.config.database import get_async_db
 from backend.auth_utils import get_current_user
+from backend.services import SMSService
+from backend.services.sms_service import BUCKETS_HISTOGRAMA
+from backend.services.saldo_service import saldo_cache
+from backend.services.estadisticas_service import EstadisticasService, ESTADOS_EXITOSOS
 
 load_dotenv()
 
 router = APIRouter()
 
+# Rango máximo consultable por granularidad del histograma
+MAX_RANGO_HISTOGRAMA = {
+    "hora": timedelta(days=31),
+    "dia": timedelta(days=366),
+    "semana": timedelta(days=366 * 3),
+    "mes": timedelta(days=366 * 10)
+}
+
 # ============================================================
 # 📱 VISTA: Uso de SMS
 # ============================================================
@@ -41,9 +51,31 @@ async def vista_uso_sms(
     )
 
 
+def _uso_sms(db: Session) -> dict:
+    """Conteos de uso desde el rollup diario (no escanea verificaciones)"""
+    hoy = datetime.now().date()
+    # Últimos 7 días (una sola consulta agrupada, días sin SMS en 0)
+    hace_7_dias = datetime.now() - timedelta(days=7)
+    
+    return {
+        # Total de SMS enviados
+        "total_enviados": EstadisticasService.total(db),
+        # SMS del mes actual
+        "sms_mes_actual": EstadisticasService.total(db, desde=hoy.replace(day=1)),
+        # SMS de hoy
+        "sms_hoy": EstadisticasService.total(db, desde=hoy),
+        # SMS por sucursal (top 5)
+        "sms_por_sucursal": EstadisticasService.top_sucursales(db, limite=5),
+        "ultimos_7_dias": [
+            {"fecha": b["inicio"].strftime("%d/%m"), "cantidad": b["total"]}
+            for b in SMSService.histograma(db, "dia", hace_7_dias, hace_7_dias + timedelta(days=6))
+        ],
+    }
+
+
 @router.get("/api/registros/uso")
 async def obtener_uso_sms(
-    db: Session = Depends(get_db),
+    db = Depends(get_async_db),
     user = Depends(get_current_user)
 ):
     """Obtener estadísticas de uso de SMS"""
@@ -51,71 +83,14 @@ async def obtener_uso_sms(
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
     try:
-        # Total de SMS enviados
-        total_enviados = db.query(Verificacion).count()
-        
-        # SMS del mes actual
-        hoy = datetime.now()
-        primer_dia_mes = datetime(hoy.year, hoy.month, 1)
-        sms_mes_actual = db.query(Verificacion).filter(
-            Verificacion.fecha >= primer_dia_mes
-        ).count()
-        
-        # SMS de hoy
-        inicio_hoy = datetime(hoy.year, hoy.month, hoy.day)
-        sms_hoy = db.query(Verificacion).filter(
-            Verificacion.fecha >= inicio_hoy
-        ).count()
+        # 📊 Conteos por la sesión async (no bloquean el event loop)
+        uso = await db.run_sync(_uso_sms)
+        total_enviados = uso["total_enviados"]
         
-        # SMS por sucursal (top 5)
-        sms_por_sucursal = db.query(
-            Verificacion.merchant_code,
-            func.count(Verificacion.id).label('total')
-        ).group_by(
-            Verificacion.merchant_code
-        ).order_by(
-            func.count(Verificacion.id).desc()
-        ).limit(5).all()
-        
-        # Últimos 7 días
-        hace_7_dias = hoy - timedelta(days=7)
-        sms_ultimos_7_dias = []
-        for i in range(7):
-            fecha = hace_7_dias + timedelta(days=i)
-            inicio_dia = datetime(fecha.year, fecha.month, fecha.day)
-            fin_dia = inicio_dia + timedelta(days=1)
-            
-            count = db.query(Verificacion).filter(
-                Verificacion.fecha >= inicio_dia,
-                Verificacion.fecha < fin_dia
-            ).count()
-            
-            sms_ultimos_7_dias.append({
-                "fecha": fecha.strftime("%d/%m"),
-                "cantidad": count
-            })
-        
-        # Obtener saldo real de SMS Masivos (SIEMPRE consultar API real aquí)
+        # Obtener saldo de SMS Masivos (caché con TTL corto, single-flight)
         sms_disponibles_real = 0
         try:
-            import requests
-            from backend.config.settings import settings
-            
-            url = "https://servicio.smsmasivos.com.ar/obtener_saldo.asp"
-            params = {"apikey": settings.SMS_API_KEY}
-            response_saldo = requests.get(url, params=params, timeout=10)
-            
-            if response_saldo.status_code == 200:
-                texto_respuesta = response_saldo.text.strip()
-                try:
-                    sms_disponibles_real = int(texto_respuesta)
-                except ValueError:
-                    # Si no es un número, es un mensaje de error
-                    print(f"⚠️ Respuesta de API saldo: {texto_respuesta}")
-                    sms_disponibles_real = 0
-            else:
-                print(f"⚠️ Error HTTP {response_saldo.status_code} al consultar saldo")
-                sms_disponibles_real = 0
+            sms_disponibles_real = await saldo_cache.obtener() or 0
         except Exception as e:
             print(f"⚠️ Error al consultar saldo: {e}")
             sms_disponibles_real = 0
@@ -124,13 +99,13 @@ async def obtener_uso_sms(
             "ok": True,
             "datos": {
                 "total_enviados": total_enviados,
-                "sms_mes_actual": sms_mes_actual,
-                "sms_hoy": sms_hoy,
+                "sms_mes_actual": uso["sms_mes_actual"],
+                "sms_hoy": uso["sms_hoy"],
                 "sms_por_sucursal": [
-                    {"sucursal": s.merchant_code, "total": s.total}
-                    for s in sms_por_sucursal
+                    {"sucursal": codigo, "total": total}
+                    for codigo, total in uso["sms_por_sucursal"]
                 ],
-                "ultimos_7_dias": sms_ultimos_7_dias,
+                "ultimos_7_dias": uso["ultimos_7_dias"],
                 # Datos reales del plan consultados de SMS Masivos
                 "plan_contratado": {
                     "nombre": "Plan Prepago SMS Masivos",
@@ -169,9 +144,48 @@ async def vista_metricas(
     )
 
 
+def _metricas(db: Session) -> dict:
+    """Métricas del panel desde el rollup diario y el histograma por hora"""
+    # SMS por usuario operador
+    sms_por_usuario = EstadisticasService.por_usuario(db)
+    
+    # Tasa de éxito/fallo (desde el rollup diario)
+    por_estado = EstadisticasService.por_estado(db)
+    total_sms = sum(por_estado.values())
+    
+    # Contar por estado real
+    exitosos = sum(por_estado.get(e, 0) for e in ESTADOS_EXITOSOS)
+    fallidos = por_estado.get("fallido", 0)
+    
+    tasa_exito = (exitosos / total_sms * 100) if total_sms > 0 else 0
+    tasa_fallo = (fallidos / total_sms * 100) if total_sms > 0 else 0
+    
+    # SMS por hora del día (últimas 24 horas, horas sin SMS en 0)
+    ahora = datetime.now()
+    sms_por_hora = SMSService.histograma(db, "hora", ahora - timedelta(hours=23), ahora)
+    
+    return {
+        "sms_por_usuario": [
+            {"usuario": usuario, "total": total}
+            for usuario, total in sms_por_usuario
+        ],
+        "tasa_exito_fallo": {
+            "exitosos": exitosos,
+            "fallidos": fallidos,
+            "tasa_exito": round(tasa_exito, 2),
+            "tasa_fallo": round(tasa_fallo, 2),
+            "total": total_sms
+        },
+        "sms_por_hora": [
+            {"hora": b["inicio"].strftime("%H:00"), "total": b["total"]}
+            for b in sms_por_hora
+        ]
+    }
+
+
 @router.get("/api/registros/metricas")
 async def obtener_metricas(
-    db: Session = Depends(get_db),
+    db = Depends(get_async_db),
     user = Depends(get_current_user)
 ):
     """Obtener métricas del sistema"""
@@ -179,71 +193,56 @@ async def obtener_metricas(
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
     try:
-        # SMS por usuario operador
-        sms_por_usuario = db.query(
-            Usuario.usuario,
-            func.count(Verificacion.id).label('total')
-        ).join(
-            Verificacion, Usuario.id == Verificacion.usuario_id
-        ).group_by(
-            Usuario.usuario
-        ).order_by(
-            func.count(Verificacion.id).desc()
-        ).all()
-        
-        # Tasa de éxito/fallo
-        total_sms = db.query(Verificacion).count()
-        
-        # Contar por estado real
-        exitosos = db.query(Verificacion).filter(
-            or_(Verificacion.estado == "enviado", Verificacion.estado == "test")
-        ).count()
-        
-        fallidos = db.query(Verificacion).filter(
-            Verificacion.estado == "fallido"
-        ).count()
-        
-        tasa_exito = (exitosos / total_sms * 100) if total_sms > 0 else 0
-        tasa_fallo = (fallidos / total_sms * 100) if total_sms > 0 else 0
-        
-        # SMS por hora del día (últimas 24 horas)
-        ahora = datetime.now()
-        hace_24h = ahora - timedelta(hours=24)
-        
-        # Usar extract() para PostgreSQL (compatible con SQLite también)
-        sms_por_hora = db.query(
-            func.extract('hour', Verificacion.fecha).label('hora'),
-            func.count(Verificacion.id).label('total')
-        ).filter(
-            Verificacion.fecha >= hace_24h
-        ).group_by(
-            func.extract('hour', Verificacion.fecha)
-        ).all()
-        
-        return {
-            "ok": True,
-            "datos": {
-                "sms_por_usuario": [
-                    {"usuario": s.usuario, "total": s.total}
-                    for s in sms_por_usuario
-                ],
-                "tasa_exito_fallo": {
-                    "exitosos": exitosos,
-                    "fallidos": fallidos,
-                    "tasa_exito": round(tasa_exito, 2),
-                    "tasa_fallo": round(tasa_fallo, 2),
-                    "total": total_sms
-                },
-                "sms_por_hora": [
-                    {"hora": f"{int(s.hora):02d}:00", "total": s.total}
-                    for s in sms_por_hora
-                ]
-            }
-        }
+        return {"ok": True, "datos": await db.run_sync(_metricas)}
     except Exception as e:
         return {"ok": False, "mensaje": f"Error al obtener métricas: {str(e)}"}
 
 
+@router.get("/api/registros/histograma")
+async def obtener_histograma(
+    bucket: str = "dia",
+    desde: str | None = None,
+    hasta: str | None = None,
+    sucursal: str | None = None,
+    usuario_id: int | None = None,
+    estado: str | None = None,
+    db = Depends(get_async_db),
+    user = Depends(get_current_user)
+):
+    """Cantidad de SMS por hora, día, semana o mes (intervalos vacíos en 0)"""
+    if user.rol.lower() != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    
+    if bucket not in BUCKETS_HISTOGRAMA:
+        raise HTTPException(status_code=400, detail=f"Bucket inválido. Opciones: {', '.join(BUCKETS_HISTOGRAMA)}")
+    
+    try:
+        hasta_dt = datetime.fromisoformat(hasta) if hasta else datetime.now()
+        desde_dt = datetime.fromisoformat(desde) if desde else hasta_dt - timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido (usar ISO 8601)")
+    
+    # Evitar respuestas gigantes (ej: un año por hora)
+    if (hasta_dt - desde_dt) > MAX_RANGO_HISTOGRAMA[bucket]:
+        raise HTTPException(status_code=400, detail="Rango demasiado amplio para el bucket solicitado")
+    
+    histograma = await db.run_sync(
+        SMSService.histograma,
+        bucket,
+        desde_dt,
+        hasta_dt,
+        sucursal=sucursal,
+        usuario_id=usuario_id,
+        estados=[estado] if estado else None
+    )
+    
+    return {
+        "ok": True,
+        "bucket": bucket,
+        "datos": [{"inicio": b["inicio"].isoformat(), "total": b["total"]} for b in histograma]
+    }
+
+
 # ============================================================
 # ⚙️ VISTA: Configuración
 # ============================================================
@@ -338,6 +337,9 @@ async def actualizar_api_key(
         from backend.config.settings import settings
         settings.SMS_API_KEY = nueva_api_key
         
+        # 💰 El saldo en caché corresponde a la API Key anterior
+        saldo_cache.invalidar()
+        
         # 📝 Actualizar archivo .env (ahora está montado como volumen)
         env_path = "/app/.env"
         if os.path.exists(env_path):
@@ -1,7 +1,7 @@
 """
 Rutas para administración de sesiones activas
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from backend.models import Usuario
 from backend.core import get_current_user
 from backend.services.session_service import session_store
@@ -9,19 +9,27 @@ from backend.services.session_service import session_store
 router = APIRouter(prefix="/api/sesiones", tags=["Sesiones"])
 
 @router.get("/activas")
-def get_sesiones_activas(current_user: Usuario = Depends(get_current_user)):
+def get_sesiones_activas(
+    cursor: int = Query(0, ge=0),
+    limite: int = Query(100, ge=1, le=1000),
+    current_user: Usuario = Depends(get_current_user)
+):
     """
-    Obtener todas las sesiones activas (solo admin)
+    Obtener las sesiones activas de a páginas (solo admin)
+    
+    Pasar `next_cursor` como `cursor` para la página siguiente; 0 = fin.
+    `total` cuenta todas las sesiones activas, no solo las de la página.
     """
     if current_user.rol.lower() != "admin":
         raise HTTPException(status_code=403, detail="Acceso denegado")
     
-    sesiones = session_store.get_all_sessions()
+    sesiones, next_cursor = session_store.listar_sesiones(cursor, limite)
     
     return {
         "ok": True,
-        "total": len(sesiones),
-        "sesiones": sesiones
+        "total": session_store.contar_sesiones(),
+        "sesiones": sesiones,
+        "next_cursor": next_cursor
     }
 
 @router.delete("/cerrar/{session_id}")
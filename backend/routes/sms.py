@@ -1,14 +1,17 @@
-from fastapi import APIRouter, HTTPException, Request, Depends, Response
-from pydantic import BaseModel, constr
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, constr
+from typing import List
 
 # 🆕 Usar configuración y servicios centralizados
-from backend.config import get_db, settings
+from backend.config import get_async_db, settings
 from backend.models import Usuario
 from backend.core import get_current_user
 from backend.services import SMSService
-from backend.middleware.rate_limiting import limiter
-from backend.config.rate_limits import get_rate_limit_string
+from backend.services.saldo_service import saldo_cache
+from backend.services.sms_cola_service import SMSColaService, sms_cola_workers
+from backend.services.idempotencia_service import huella, idempotencia_sms
+from backend.middleware.rate_limiting import limitar
 
 router = APIRouter()
 
@@ -19,52 +22,102 @@ class SmsRequest(BaseModel):
     merchantCode: constr(min_length=3, max_length=3)
     merchantName: str | None = None  # 🏪 Nombre de sucursal
     verificationCode: str | None = None
+    encolar: bool = False  # 📬 Responder apenas se encola (envío por la cola de workers)
+
+
+# 📦 Datos de un envío por lotes
+class SmsLoteItem(BaseModel):
+    personId: constr(min_length=7, max_length=15)
+    phoneNumber: constr(min_length=10, max_length=15)
+    merchantCode: constr(min_length=3, max_length=3)
+
+
+class SmsLoteRequest(BaseModel):
+    destinos: List[SmsLoteItem] = Field(..., min_length=1, max_length=settings.SMS_LOTE_MAX_DESTINOS)
+    mensaje: str | None = None  # 📣 Texto común (campaña); sin texto cada destino recibe su código
 
 
 # 📲 Enviar y registrar SMS en la base
-@router.post("/send-sms", response_model=None)
-@limiter.limit(get_rate_limit_string("sms_enviar"))  # 🚦 5 SMS por minuto
-@limiter.limit(get_rate_limit_string("sms_enviar_por_hora"))  # 🚦 30 SMS por hora
-@limiter.limit(get_rate_limit_string("sms_enviar_por_dia"))  # 🚦 200 SMS por día
-def handle_sms(
-    request: Request,
-    response: Response,  # Required by slowapi
+# 🚦 Minuto, hora y día en una sola llamada a Redis (por usuario y rol)
+@router.post(
+    "/send-sms",
+    response_model=None,
+    dependencies=[Depends(limitar("sms_enviar", "sms_enviar_por_hora", "sms_enviar_por_dia"))]
+)
+async def handle_sms(
+    response: Response,
     data: SmsRequest,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
+    db = Depends(get_async_db),
+    user = Depends(get_current_user),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255)
 ):
+    # 📵 Un reintento o doble clic devuelve la respuesta del primer envío
+    clave = idempotencia_sms.clave(
+        user.id, idempotency_key, data.personId, data.phoneNumber, data.merchantCode, data.verificationCode
+    )
+    huella_pedido = huella(
+        data.personId, data.phoneNumber, data.merchantCode, data.verificationCode, data.encolar
+    )
+    previo = await idempotencia_sms.reservar(clave, huella_pedido)
+
+    if previo is not None:
+        if previo.huella != huella_pedido:
+            raise HTTPException(
+                status_code=422,
+                detail="La Idempotency-Key ya se usó para otro envío"
+            )
+        if previo.estado != "completo":
+            raise HTTPException(
+                status_code=409,
+                detail="Este SMS ya se está enviando",
+                headers={"Retry-After": "1"}
+            )
+        return JSONResponse(
+            content=previo.cuerpo,
+            status_code=previo.status_code,
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        cuerpo = await _enviar_sms(response, data, db, user)
+    except BaseException:
+        # 402, proveedor caído, error de base o request cancelado: se puede reintentar
+        await idempotencia_sms.liberar(clave)
+        raise
+
+    await idempotencia_sms.guardar(clave, huella_pedido, response.status_code or 200, cuerpo)
+    return cuerpo
+
+
+async def _enviar_sms(response: Response, data: SmsRequest, db, user) -> dict:
+    # ⚡ Endpoint asíncrono: las llamadas HTTP al proveedor usan el cliente
+    # httpx compartido y las escrituras en DB van por db.run_sync (asyncpg/
+    # aiosqlite con DB_ASYNC, si no el threadpool): nada bloquea el event loop.
+
     # Generar código PRIMERO (antes de validar saldo)
     code = data.verificationCode or SMSService.generar_codigo()
     
     # 🔍 Validar saldo antes de enviar (solo si no está en modo simulado)
     if not settings.SMS_MODO_SIMULADO:
         try:
-            import requests as req
-            url = "https://servicio.smsmasivos.com.ar/obtener_saldo.asp"
-            params = {"apikey": settings.SMS_API_KEY}
-            response_saldo = req.get(url, params=params, timeout=5)
-            
-            if response_saldo.status_code == 200:
-                try:
-                    saldo = int(response_saldo.text.strip())
-                    if saldo <= 0:
-                        # Registrar como fallido CON EL CÓDIGO GENERADO
-                        SMSService.registrar_verificacion(
-                            db=db,
-                            person_id=data.personId,
-                            phone_number=data.phoneNumber,
-                            merchant_code=data.merchantCode,
-                            verification_code=code,
-                            usuario_id=user.id,
-                            estado="fallido",
-                            error_mensaje="Saldo insuficiente"
-                        )
-                        raise HTTPException(
-                            status_code=402,
-                            detail="❌ MENSAJE NO ENVIADO - Saldo insuficiente. Contacte con su proveedor para recargar."
-                        )
-                except ValueError:
-                    pass  # Si no es un número, continuar con el envío
+            # 💰 Saldo desde caché (refrescada en segundo plano)
+            saldo = await saldo_cache.obtener()
+            if saldo is not None and saldo <= 0:
+                # Registrar como fallido CON EL CÓDIGO GENERADO
+                await db.run_sync(
+                    SMSService.registrar_verificacion,
+                    person_id=data.personId,
+                    phone_number=data.phoneNumber,
+                    merchant_code=data.merchantCode,
+                    verification_code=code,
+                    usuario_id=user.id,
+                    estado="fallido",
+                    error_mensaje="Saldo insuficiente"
+                )
+                raise HTTPException(
+                    status_code=402,
+                    detail="❌ MENSAJE NO ENVIADO - Saldo insuficiente. Contacte con su proveedor para recargar."
+                )
         except HTTPException:
             raise  # Re-lanzar la excepción 402
         except Exception as e:
@@ -72,13 +125,39 @@ def handle_sms(
             print(f"⚠️ No se pudo validar saldo: {e}")
     
     # Obtener nombre de sucursal desde los datos o desde la configuración
-    merchant_name = data.merchantName or SMSService.get_nombre_sucursal(data.merchantCode)
+    merchant_name = data.merchantName or await SMSService.aget_nombre_sucursal(data.merchantCode)
     
     # Construir mensaje con el formato correcto
-    texto = f"{data.merchantCode} - {merchant_name} - DNI: {data.personId} - Su Codigo es: {code}"
+    texto = SMSService.construir_mensaje(data.merchantCode, data.personId, code, merchant_name)
     
-    # Enviar SMS usando el servicio
-    resultado = SMSService.enviar_sms(data.phoneNumber, texto)
+    # 📬 Modo cola: registrar, encolar y responder sin esperar al proveedor
+    if data.encolar:
+        verif = await db.run_sync(
+            SMSColaService.encolar,
+            person_id=data.personId,
+            phone_number=data.phoneNumber,
+            merchant_code=data.merchantCode,
+            verification_code=code,
+            usuario_id=user.id,
+            texto=texto
+        )
+        sms_cola_workers.despertar()
+
+        response.status_code = 202
+        return {
+            "message": "SMS encolado para envío",
+            "verificationCode": code,
+            "personId": data.personId,
+            "merchantCode": data.merchantCode,
+            "smsBody": SMSService.normalizar_texto(texto),
+            "modoSimulado": settings.SMS_MODO_SIMULADO,
+            "esTest": settings.SMS_MODO_SIMULADO,
+            "estado": "encolado",
+            "verificacionId": verif.id
+        }
+
+    # Enviar SMS usando el servicio (no bloquea el event loop)
+    resultado = await SMSService.enviar_sms_async(data.phoneNumber, texto)
     
     # ✅ Registrar SIEMPRE en base de datos (exitoso o fallido)
     # 🟡 Si está en modo simulado, usar estado "test"
@@ -91,8 +170,12 @@ def handle_sms(
         estado = "enviado" if resultado["ok"] else "fallido"
         error_msg = None if resultado["ok"] else resultado.get("mensaje", "Error desconocido")
     
-    verif = SMSService.registrar_verificacion(
-        db=db,
+    # 📉 Descontar localmente el SMS enviado del saldo en caché
+    if resultado["ok"] and not settings.SMS_MODO_SIMULADO:
+        saldo_cache.decrementar()
+    
+    verif = await db.run_sync(
+        SMSService.registrar_verificacion,
         person_id=data.personId,
         phone_number=data.phoneNumber,
         merchant_code=data.merchantCode,
@@ -129,6 +212,98 @@ def handle_sms(
     }
 
 
+# 📦 Enviar SMS por lotes (campañas y re-verificaciones)
+@router.post(
+    "/send-sms/batch",
+    response_model=None,
+    dependencies=[Depends(limitar("sms_lote"))]  # 🚦 10 lotes por hora
+)
+async def handle_sms_lote(
+    data: SmsLoteRequest,
+    db = Depends(get_async_db),
+    user = Depends(get_current_user)
+):
+    """
+    Envía cientos de SMS con pocas llamadas al proveedor.
+    Con `mensaje` todos los destinos reciben el mismo texto y se agrupan en el
+    parámetro TOS; sin él cada destino recibe su propio código de verificación.
+    Todas las verificaciones se registran con un único INSERT.
+    """
+    if user.rol.lower() not in ["admin", "operador"]:
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    cantidad = len(data.destinos)
+
+    # 🔍 Validar que el saldo alcance para todo el lote
+    if not settings.SMS_MODO_SIMULADO:
+        try:
+            saldo = await saldo_cache.obtener()
+        except Exception as e:
+            saldo = None
+            print(f"⚠️ No se pudo validar saldo: {e}")
+        if saldo is not None and saldo < cantidad:
+            raise HTTPException(
+                status_code=402,
+                detail=f"❌ LOTE NO ENVIADO - Saldo insuficiente ({saldo} SMS disponibles, {cantidad} requeridos)."
+            )
+
+    codigos = [None if data.mensaje else SMSService.generar_codigo() for _ in data.destinos]
+    nombres = {}
+    if not data.mensaje:
+        for merchant_code in {d.merchantCode for d in data.destinos}:
+            nombres[merchant_code] = await SMSService.aget_nombre_sucursal(merchant_code)
+    destinos = [
+        (d.phoneNumber, data.mensaje or SMSService.construir_mensaje(
+            d.merchantCode, d.personId, codigo, nombres[d.merchantCode]
+        ))
+        for d, codigo in zip(data.destinos, codigos)
+    ]
+
+    resultados = await SMSService.enviar_lote(destinos)
+
+    filas = []
+    for d, codigo, resultado in zip(data.destinos, codigos, resultados):
+        if settings.SMS_MODO_SIMULADO:
+            estado = "test"
+        else:
+            estado = "enviado" if resultado["ok"] else "fallido"
+        filas.append({
+            "person_id": d.personId,
+            "phone_number": d.phoneNumber,
+            "merchant_code": d.merchantCode,
+            "verification_code": codigo,
+            "usuario_id": user.id,
+            "estado": estado,
+            "error_mensaje": None if resultado["ok"] else str(resultado.get("mensaje", "Error desconocido"))
+        })
+
+    await db.run_sync(SMSService.registrar_verificaciones_lote, filas)
+
+    enviados = sum(1 for r in resultados if r["ok"])
+    if enviados and not settings.SMS_MODO_SIMULADO:
+        saldo_cache.decrementar(enviados)
+
+    print(f"📦 Lote registrado: {cantidad} destinos, {enviados} enviados")
+
+    return {
+        "message": f"Lote procesado: {enviados} de {cantidad} SMS enviados",
+        "total": cantidad,
+        "enviados": enviados,
+        "fallidos": cantidad - enviados,
+        "modoSimulado": settings.SMS_MODO_SIMULADO,
+        "resultados": [
+            {
+                "personId": fila["person_id"],
+                "phoneNumber": fila["phone_number"],
+                "verificationCode": fila["verification_code"],
+                "estado": fila["estado"],
+                "error": fila["error_mensaje"]
+            }
+            for fila in filas
+        ]
+    }
+
+
 # 📅 Consultar vencimiento del paquete prepago
 @router.get("/obtener-vencimiento")
 def obtener_vencimiento_paquete(user = Depends(get_current_user)):
@@ -169,10 +344,11 @@ def obtener_vencimiento_paquete(user = Depends(get_current_user)):
 
 # 📊 Consultar saldo de SMS disponibles
 @router.get("/obtener-saldo")
-def obtener_saldo_sms(user = Depends(get_current_user)):
+async def obtener_saldo_sms(user = Depends(get_current_user)):
     """
     Consulta el saldo de SMS disponibles en la cuenta de SMS Masivos.
     Disponible para todos los usuarios autenticados.
+    Se sirve desde la caché de saldo (TTL corto + refresco en segundo plano).
     """
     if settings.SMS_MODO_SIMULADO:
         return {
@@ -183,36 +359,26 @@ def obtener_saldo_sms(user = Depends(get_current_user)):
         }
     
     try:
-        import requests
-        url = "https://servicio.smsmasivos.com.ar/obtener_saldo.asp"
-        params = {"apikey": settings.SMS_API_KEY}
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        # La respuesta debería ser un número
-        saldo_texto = response.text.strip()
-        
-        # Intentar convertir a número
-        try:
-            saldo = int(saldo_texto)
-            return {
-                "ok": True,
-                "saldo": saldo,
-                "mensaje": f"Saldo: {saldo} SMS disponibles",
-                "simulado": False,
-                "alerta": saldo < 10  # Alerta si quedan menos de 10 SMS
-            }
-        except ValueError:
-            # Si no es un número, puede ser un mensaje de error
-            return {
-                "ok": False,
-                "mensaje": f"Respuesta inesperada: {saldo_texto}",
-                "saldo": 0,
-                "simulado": False
-            }
-    
+        saldo = await saldo_cache.obtener()
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al consultar saldo: {str(e)}"
         )
+    
+    if saldo is None:
+        # La respuesta del proveedor no fue un número (mensaje de error)
+        return {
+            "ok": False,
+            "mensaje": "Respuesta inesperada del proveedor al consultar saldo",
+            "saldo": 0,
+            "simulado": False
+        }
+    
+    return {
+        "ok": True,
+        "saldo": saldo,
+        "mensaje": f"Saldo: {saldo} SMS disponibles",
+        "simulado": False,
+        "alerta": saldo < 10  # Alerta si quedan menos de 10 SMS
+    }
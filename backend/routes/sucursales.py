@@ -2,13 +2,14 @@
 🏢 Rutas para Gestión de Sucursales
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from backend.config.database import get_db
 from backend.auth_utils import get_current_user
 from backend.services.sucursal_service import SucursalService
+from backend.services.sucursal_cache import sucursal_cache
 
 router = APIRouter()
 
@@ -50,14 +51,29 @@ async def vista_sucursales(
 # ============================================================
 # 📊 API: Sucursales
 # ============================================================
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    """True si el ETag del cliente (If-None-Match) es el vigente"""
+    etiquetas = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+
 @router.get("/api/sucursales")
 def obtener_sucursales(
-    db: Session = Depends(get_db),
+    request: Request,
     user=Depends(get_current_user)
 ):
-    """Obtener todas las sucursales"""
-    sucursales = SucursalService.get_all(db)
-    return [{"codigo": s.codigo, "nombre": s.nombre} for s in sucursales]
+    """
+    Obtener todas las sucursales (desde la caché)
+    
+    verificarSms.js la pide en cada carga de página: con ETag el navegador
+    revalida y recibe un 304 vacío mientras no cambie nada.
+    """
+    cuerpo, etag = sucursal_cache.listado()
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if _etag_coincide(request.headers.get("If-None-Match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
 
 
 @router.post("/api/sucursales")
@@ -76,6 +92,7 @@ def crear_sucursal(
     
     try:
         sucursal = SucursalService.create(db, data.codigo, data.nombre)
+        sucursal_cache.invalidar()
         return {
             "ok": True,
             "mensaje": "Sucursal creada correctamente",
@@ -99,6 +116,7 @@ def editar_sucursal(
     sucursal = SucursalService.update(db, codigo, data.nombre)
     if not sucursal:
         raise HTTPException(status_code=404, detail="Sucursal no encontrada")
+    sucursal_cache.invalidar()
     
     return {
         "ok": True,
@@ -128,6 +146,7 @@ def eliminar_sucursal(
         )
     
     if SucursalService.delete(db, codigo):
+        sucursal_cache.invalidar()
         return {"ok": True, "mensaje": "Sucursal eliminada correctamente"}
     else:
         raise HTTPException(status_code=404, detail="Sucursal no encontrada")
@@ -1,16 +1,17 @@
 # 📦 Importaciones necesarias
-from fastapi import APIRouter, HTTPException, Request, Depends, Response
+from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 # 🆕 Usar configuración y servicios centralizados
-from backend.config import get_db
+from backend.config import get_async_db, get_db
 from backend.models import Usuario
 from backend.services import AuthService, UserService
 from backend.services.session_service import session_store
+from backend.services.usuario_cache import usuario_cache
 from backend.core.security import verify_password
-from backend.middleware.rate_limiting import limiter
-from backend.config.rate_limits import get_rate_limit_string
+from backend.core.hash_pool import PoolHashSaturado
+from backend.middleware.rate_limiting import limitar
 
 # 🚪 Inicializar el router
 router = APIRouter()
@@ -59,6 +60,9 @@ def crear_usuario(data: UsuarioCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(nuevo)
 
+    # 🧠 SQLite puede reutilizar el id de un usuario eliminado
+    UserService.invalidar_nombres(nuevo.id)
+
     return {
         "ok": True,
         "usuario": nuevo.usuario,
@@ -68,13 +72,11 @@ def crear_usuario(data: UsuarioCreate, db: Session = Depends(get_db)):
     }
 
 # 🔓 Iniciar sesión: validar credenciales y guardar sesión en Redis
-@router.post("/login")
-@limiter.limit(get_rate_limit_string("login_intentos"))  # 🚦 5 intentos cada 5 minutos
+@router.post("/login", dependencies=[Depends(limitar("login_intentos"))])  # 🚦 5 intentos cada 5 minutos
 async def login(
     request: Request,
-    response: Response,  # Required by slowapi
     data: LoginRequest,
-    db: Session = Depends(get_db)
+    db = Depends(get_async_db)
 ):
     import logging
     import traceback
@@ -83,8 +85,17 @@ async def login(
     try:
         logger.info(f"Intento de login para usuario: {data.usuario}")
         
-        # Autenticar usando el servicio
-        user = AuthService.authenticate_user(db, data.usuario, data.password)
+        # Autenticar: la consulta va por la sesión async y bcrypt (CPU) al
+        # pool acotado de hashing, así ninguno de los dos frena el event loop
+        try:
+            user = await AuthService.aauthenticate_user(db, data.usuario, data.password)
+        except PoolHashSaturado:
+            logger.warning("Pool de bcrypt saturado, login rechazado")
+            raise HTTPException(
+                status_code=503,
+                detail="Demasiados inicios de sesión simultáneos, reintentá en unos segundos",
+                headers={"Retry-After": "1"}
+            )
 
         if not user:
             logger.warning(f"Credenciales inválidas para: {data.usuario}")
@@ -93,7 +104,7 @@ async def login(
         logger.info(f"Usuario autenticado: {user.usuario}")
         
         # Crear sesión en Redis
-        session_id = session_store.create_session({
+        session_id = await session_store.acreate_session({
             "usuario": user.usuario,
             "rol": user.rol,
             "id": user.id,
@@ -132,12 +143,14 @@ def editar_usuario(nombre: str, data: UsuarioUpdate, request: Request, db: Sessi
     # 🔍 Detectar si está editando su propio usuario
     usuario_sesion = request.session.get("usuario")
     editando_propio_usuario = usuario_sesion and usuario_sesion.lower() == nombre.lower()
+    cerrar_sesiones = False  # Renombre, cambio de rol o de contraseña
 
     # Actualizar nombre si cambió
     if data.nuevo_usuario != nombre:
         if UserService.get_user_by_username(db, data.nuevo_usuario):
             raise HTTPException(status_code=400, detail="El nuevo nombre ya está en uso")
         usuario.usuario = data.nuevo_usuario
+        cerrar_sesiones = True
 
         # 🔄 Actualizar sesión si está editando su propio usuario
         if editando_propio_usuario:
@@ -147,10 +160,12 @@ def editar_usuario(nombre: str, data: UsuarioUpdate, request: Request, db: Sessi
     if data.password:
         if not verify_password(data.password, usuario.hash_password):
             AuthService.change_password(db, usuario.id, data.password)
+            cerrar_sesiones = True
 
     # Actualizar rol
     if data.rol and data.rol != usuario.rol:
         usuario.rol = data.rol
+        cerrar_sesiones = True
         
         # 🔄 Actualizar rol en sesión si está editando su propio usuario
         if editando_propio_usuario:
@@ -166,6 +181,16 @@ def editar_usuario(nombre: str, data: UsuarioUpdate, request: Request, db: Sessi
             usuario.email = data.email
 
     db.commit()
+    UserService.invalidar_nombres(usuario.id)
+    usuario_cache.invalidar(nombre)
+    usuario_cache.invalidar(usuario.usuario)
+
+    # 🔒 Cerrar las sesiones abiertas del usuario (menos la propia si se edita a sí mismo)
+    if cerrar_sesiones:
+        sesion_actual = request.session.get("session_id") if editando_propio_usuario else None
+        session_store.revoke_user_sessions(usuario.id, excepto=sesion_actual)
+        if sesion_actual:
+            session_store.update_session(sesion_actual, {"usuario": usuario.usuario, "rol": usuario.rol})
 
     return {
         "ok": True,
@@ -192,7 +217,11 @@ def eliminar_usuario(nombre: str, request: Request, db: Session = Depends(get_db
         )
 
     # 🗑️ Eliminar usando el servicio (cascade automático)
-    UserService.delete_user(db, usuario.id)
+    usuario_id = usuario.id
+    UserService.delete_user(db, usuario_id)
+    UserService.invalidar_nombres(usuario_id)
+    usuario_cache.invalidar(nombre)
+    session_store.revoke_user_sessions(usuario_id)
 
     return {"ok": True, "mensaje": f"Usuario '{nombre}' eliminado correctamente"}
 
@@ -0,0 +1,36 @@
+"""
+Script para reconstruir la tabla de estadísticas diarias (verificaciones_diarias)
+desde la tabla de verificaciones.
+
+Uso:
+    python backend/scripts/recalcular_estadisticas.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.config.database import SessionLocal
+from backend.init_db import init_db
+from backend.services.estadisticas_service import EstadisticasService
+
+
+def main():
+    init_db()  # Asegura que exista la tabla
+    db = SessionLocal()
+    try:
+        print("📊 Recalculando estadísticas diarias...")
+        inicio = time.perf_counter()
+        filas = EstadisticasService.reconstruir(db)
+        print(f"✅ {filas} filas generadas en {time.perf_counter() - inicio:.2f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al recalcular estadísticas: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
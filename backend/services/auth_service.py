@@ -1,9 +1,15 @@
 """Servicio de autenticación"""
+import logging
 from sqlalchemy.orm import Session
 from backend.models import Usuario
-from backend.core.security import hash_password, verify_password
+from backend.core.hash_pool import PoolHashSaturado
+from backend.core.security import (
+    hash_password, verify_password, ahash_password, averify_password, necesita_rehash
+)
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 
 class AuthService:
     """Servicio para manejar autenticación de usuarios"""
@@ -30,6 +36,49 @@ class AuthService:
             return None
             
         return user
+
+    @staticmethod
+    async def aauthenticate_user(db, username: str, password: str) -> Optional[Usuario]:
+        """
+        Autentica desde un endpoint async (sesión de get_async_db)
+
+        La consulta va por `db.run_sync` y bcrypt al pool acotado de
+        hashing. Si la contraseña es correcta pero el hash es SHA-256
+        legacy o tiene otro costo que BCRYPT_ROUNDS, se rehace y se guarda
+        (si el pool está saturado se deja para el próximo login).
+
+        Raises:
+            PoolHashSaturado: si la cola del pool de bcrypt está llena al verificar
+        """
+        user = await db.run_sync(AuthService._buscar_usuario, username)
+
+        if not user:
+            return None
+
+        if not await averify_password(password, user.hash_password):
+            return None
+
+        if necesita_rehash(user.hash_password):
+            try:
+                nuevo_hash = await ahash_password(password)
+            except PoolHashSaturado:
+                # La contraseña ya es correcta: el rehash es opcional
+                logger.warning(f"⚠️ Pool de bcrypt saturado, rehash de '{username}' pospuesto")
+            else:
+                await db.run_sync(AuthService._guardar_hash, user, nuevo_hash)
+
+        return user
+
+    @staticmethod
+    def _buscar_usuario(db: Session, username: str) -> Optional[Usuario]:
+        return db.query(Usuario).filter(Usuario.usuario == username).first()
+
+    @staticmethod
+    def _guardar_hash(db: Session, user: Usuario, hashed_password: str):
+        user.hash_password = hashed_password
+        db.commit()
+        # Recargar acá: fuera de run_sync un atributo expirado no se puede leer
+        db.refresh(user)
     
     @staticmethod
     def create_user(db: Session, username: str, password: str, rol: str) -> Usuario:
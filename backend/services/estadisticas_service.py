@@ -0,0 +1,208 @@
+"""Servicio de estadísticas pre-agregadas de verificaciones"""
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert, select, delete
+from sqlalchemy.orm import Session
+from backend.models import Verificacion, VerificacionDiaria, Usuario
+
+
+# Estados que cuentan como SMS entregado al proveedor
+ESTADOS_EXITOSOS = ("enviado", "test")
+
+
+class EstadisticasService:
+    """
+    Mantiene y consulta la tabla `verificaciones_diarias`
+
+    Los dashboards leen de esta tabla (una fila por día/sucursal/usuario/estado)
+    en lugar de escanear `verificaciones`, así su latencia no crece con el
+    histórico. Las escrituras participan de la transacción del llamador.
+    """
+
+    @staticmethod
+    def _upsert(db: Session, filas: List[Dict]):
+        """Suma `total` a cada fila (clave fecha, sucursal, usuario, estado)"""
+        if not filas:
+            return
+
+        dialecto = db.get_bind().dialect.name
+        if dialecto in ("postgresql", "sqlite"):
+            if dialecto == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+            else:
+                from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+
+            stmt = insert_dialecto(VerificacionDiaria)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["fecha", "merchant_code", "usuario_id", "estado"],
+                set_={"total": VerificacionDiaria.total + stmt.excluded.total}
+            )
+            db.execute(stmt, filas)
+            return
+
+        # Otros motores: leer y actualizar fila por fila
+        for fila in filas:
+            clave = (fila["fecha"], fila["merchant_code"], fila["usuario_id"], fila["estado"])
+            existente = db.get(VerificacionDiaria, clave)
+            if existente:
+                existente.total += fila["total"]
+            else:
+                db.add(VerificacionDiaria(**fila))
+        db.flush()
+
+    @staticmethod
+    def _clave(fecha: datetime, merchant_code: Optional[str], usuario_id: int, estado: Optional[str]) -> Tuple:
+        return (fecha.date(), merchant_code or "", usuario_id, estado or "enviado")
+
+    @staticmethod
+    def registrar(
+        db: Session,
+        fecha: datetime,
+        merchant_code: Optional[str],
+        usuario_id: int,
+        estado: Optional[str],
+        cantidad: int = 1
+    ):
+        """Suma (o resta, con cantidad negativa) verificaciones al rollup"""
+        EstadisticasService.registrar_lote(db, [{
+            "fecha": fecha,
+            "merchant_code": merchant_code,
+            "usuario_id": usuario_id,
+            "estado": estado,
+            "cantidad": cantidad
+        }])
+
+    @staticmethod
+    def registrar_lote(db: Session, filas: Iterable[Dict]):
+        """
+        Agrega muchas verificaciones al rollup con un único upsert
+
+        Args:
+            filas: Dicts con fecha (datetime), merchant_code, usuario_id,
+                   estado y opcionalmente cantidad (default 1)
+        """
+        conteo = Counter()
+        for fila in filas:
+            clave = EstadisticasService._clave(
+                fila["fecha"], fila["merchant_code"], fila["usuario_id"], fila["estado"]
+            )
+            conteo[clave] += fila.get("cantidad", 1)
+
+        EstadisticasService._upsert(db, [
+            {"fecha": f, "merchant_code": m, "usuario_id": u, "estado": e, "total": total}
+            for (f, m, u, e), total in conteo.items()
+            if total != 0
+        ])
+
+    @staticmethod
+    def cambiar_estado(db: Session, verificacion: Verificacion, estado_nuevo: str):
+        """Actualiza el estado de una verificación y mueve su conteo en el rollup"""
+        estado_anterior = verificacion.estado
+        verificacion.estado = estado_nuevo
+        if estado_anterior == estado_nuevo:
+            return
+
+        base = {
+            "fecha": verificacion.fecha,
+            "merchant_code": verificacion.merchant_code,
+            "usuario_id": verificacion.usuario_id
+        }
+        EstadisticasService.registrar_lote(db, [
+            {**base, "estado": estado_anterior, "cantidad": -1},
+            {**base, "estado": estado_nuevo, "cantidad": 1}
+        ])
+
+    @staticmethod
+    def eliminar_usuario(db: Session, usuario_id: int):
+        """
+        Quita del rollup las verificaciones de un usuario que se elimina
+
+        El cascade de Usuario.verificaciones borra todas sus filas, así que
+        sus filas del rollup se borran enteras (en la transacción del llamador).
+        """
+        db.execute(delete(VerificacionDiaria).where(VerificacionDiaria.usuario_id == usuario_id))
+
+    @staticmethod
+    def reconstruir(db: Session) -> int:
+        """
+        Recalcula todo el rollup desde `verificaciones` (backfill)
+
+        Returns:
+            Cantidad de filas generadas en `verificaciones_diarias`
+        """
+        dia = func.date(Verificacion.fecha)
+        sucursal = func.coalesce(Verificacion.merchant_code, "")
+        estado = func.coalesce(Verificacion.estado, "enviado")
+
+        db.execute(delete(VerificacionDiaria))
+        db.execute(
+            insert(VerificacionDiaria).from_select(
+                ["fecha", "merchant_code", "usuario_id", "estado", "total"],
+                select(dia, sucursal, Verificacion.usuario_id, estado, func.count(Verificacion.id))
+                .group_by(dia, sucursal, Verificacion.usuario_id, estado)
+            )
+        )
+        db.commit()
+
+        return db.query(VerificacionDiaria).count()
+
+    # ========================================
+    # 📊 CONSULTAS PARA DASHBOARDS
+    # ========================================
+
+    @staticmethod
+    def _filtrar(
+        query,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        estados: Optional[Sequence[str]] = None,
+        usuario_id: Optional[int] = None,
+        sucursal: Optional[str] = None
+    ):
+        if desde:
+            query = query.filter(VerificacionDiaria.fecha >= desde)
+        if hasta:
+            query = query.filter(VerificacionDiaria.fecha <= hasta)
+        if estados:
+            query = query.filter(VerificacionDiaria.estado.in_(estados))
+        if usuario_id:
+            query = query.filter(VerificacionDiaria.usuario_id == usuario_id)
+        if sucursal:
+            query = query.filter(VerificacionDiaria.merchant_code == sucursal)
+        return query
+
+    @staticmethod
+    def total(db: Session, **filtros) -> int:
+        """Total de verificaciones (filtros: desde, hasta, estados, usuario_id, sucursal)"""
+        query = db.query(func.coalesce(func.sum(VerificacionDiaria.total), 0))
+        return int(EstadisticasService._filtrar(query, **filtros).scalar())
+
+    @staticmethod
+    def por_estado(db: Session, **filtros) -> Dict[str, int]:
+        """Totales agrupados por estado"""
+        query = db.query(VerificacionDiaria.estado, func.sum(VerificacionDiaria.total))
+        filas = EstadisticasService._filtrar(query, **filtros).group_by(VerificacionDiaria.estado).all()
+        return {estado: int(total) for estado, total in filas}
+
+    @staticmethod
+    def top_sucursales(db: Session, limite: int = 5, **filtros) -> List[Tuple[str, int]]:
+        """Sucursales con más verificaciones"""
+        total = func.sum(VerificacionDiaria.total)
+        query = db.query(VerificacionDiaria.merchant_code, total)
+        filas = EstadisticasService._filtrar(query, **filtros).group_by(
+            VerificacionDiaria.merchant_code
+        ).order_by(total.desc()).limit(limite).all()
+        return [(codigo, int(cantidad)) for codigo, cantidad in filas]
+
+    @staticmethod
+    def por_usuario(db: Session, **filtros) -> List[Tuple[str, int]]:
+        """Verificaciones por nombre de usuario, de mayor a menor"""
+        total = func.sum(VerificacionDiaria.total)
+        query = db.query(Usuario.usuario, total).join(
+            VerificacionDiaria, Usuario.id == VerificacionDiaria.usuario_id
+        )
+        filas = EstadisticasService._filtrar(query, **filtros).group_by(
+            Usuario.usuario
+        ).order_by(total.desc()).all()
+        return [(usuario, int(cantidad)) for usuario, cantidad in filas]
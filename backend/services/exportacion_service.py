@@ -0,0 +1,109 @@
+"""Servicio de exportación de verificaciones en streaming"""
+import csv
+import io
+import json
+from typing import Dict, Iterator, Optional
+from sqlalchemy.orm import Session
+from backend.config.database import SessionLocal
+from backend.models import Verificacion, Usuario
+from backend.services.sms_service import SMSService
+
+
+# Filas leídas por viaje al servidor (cursor del lado del servidor)
+FILAS_POR_LOTE = 1000
+
+# Columnas de la exportación (encabezado CSV / claves NDJSON)
+COLUMNAS = ["dni", "celular", "sucursal", "codigo", "usuario_nombre", "fecha", "estado"]
+ENCABEZADOS_CSV = ["DNI", "Celular", "Sucursal", "Código", "Usuario", "Fecha", "Estado"]
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportacionService:
+    """
+    Exporta verificaciones sin cargarlas en memoria
+
+    Las filas se leen con `yield_per` (cursor del lado del servidor en
+    PostgreSQL) y se codifican de a lotes, así el consumo de memoria es
+    constante sin importar cuántas verificaciones se exporten.
+    """
+
+    @staticmethod
+    def _filas(db: Session, **filtros) -> Iterator[Dict]:
+        query = SMSService.query_verificaciones(db, **filtros).outerjoin(
+            Usuario, Usuario.id == Verificacion.usuario_id
+        ).with_entities(
+            Verificacion.person_id,
+            Verificacion.phone_number,
+            Verificacion.merchant_code,
+            Verificacion.verification_code,
+            Usuario.usuario,
+            Verificacion.fecha,
+            Verificacion.estado
+        ).order_by(
+            Verificacion.fecha.desc(), Verificacion.id.desc()
+        ).execution_options(stream_results=True).yield_per(FILAS_POR_LOTE)
+
+        for fila in query:
+            yield {
+                "dni": fila.person_id,
+                "celular": fila.phone_number,
+                "sucursal": fila.merchant_code,
+                "codigo": fila.verification_code or "",
+                "usuario_nombre": fila.usuario or "desconocido",
+                "fecha": fila.fecha.strftime("%Y-%m-%d %H:%M:%S") if fila.fecha else "",
+                "estado": fila.estado or "enviado"
+            }
+
+    @staticmethod
+    def _csv(filas: Iterator[Dict]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # BOM para que Excel detecte UTF-8 (acentos en nombres de sucursal/usuario)
+        buffer.write("\ufeff")
+        writer.writerow(ENCABEZADOS_CSV)
+
+        for i, fila in enumerate(filas, start=1):
+            writer.writerow([fila[c] for c in COLUMNAS])
+            if i % FILAS_POR_LOTE == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _ndjson(filas: Iterator[Dict]) -> Iterator[bytes]:
+        lote = []
+        for fila in filas:
+            lote.append(json.dumps(fila, ensure_ascii=False))
+            if len(lote) == FILAS_POR_LOTE:
+                yield ("\n".join(lote) + "\n").encode("utf-8")
+                lote = []
+        if lote:
+            yield ("\n".join(lote) + "\n").encode("utf-8")
+
+    @staticmethod
+    def exportar(formato: str, db: Optional[Session] = None, **filtros) -> Iterator[bytes]:
+        """
+        Genera la exportación en trozos de bytes (para StreamingResponse)
+
+        Si no se pasa `db`, abre su propia sesión: la del request se cierra
+        antes de que termine de enviarse la respuesta.
+
+        Args:
+            formato: "csv" o "ndjson"
+            filtros: usuario_id, sucursal, fecha_inicio, fecha_fin, estado
+        """
+        codificador = {"csv": ExportacionService._csv, "ndjson": ExportacionService._ndjson}[formato]
+
+        sesion = db or SessionLocal()
+        try:
+            yield from codificador(ExportacionService._filas(sesion, **filtros))
+        finally:
+            if db is None:
+                sesion.close()
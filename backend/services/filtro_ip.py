@@ -0,0 +1,215 @@
+"""
+Filtro de IPs permitidas y bloqueadas
+=====================================
+
+Compila las listas (IPs sueltas y rangos CIDR, IPv4 e IPv6) a intervalos
+ordenados y disjuntos: cada consulta es una búsqueda binaria sin importar
+cuántas entradas haya, y las IPs ya vistas se resuelven con un dict.
+
+Las listas salen de rate_limits.py (base) más la tabla `ip_reglas`,
+editable desde el panel de admin sin reiniciar.
+"""
+import bisect
+import ipaddress
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+from backend.config.rate_limits import BLACKLIST_IPS, REDIS_IP_VERSION_KEY, WHITELIST_IPS
+from backend.config.redis_config import get_redis_async, get_redis_client, registrar_error_redis
+from backend.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TIPOS = ("permitir", "bloquear")
+
+# Nombres que aparecen en las listas pero no son IPs
+_ALIAS = {"localhost": ("127.0.0.1", "::1")}
+
+
+def parsear_red(red: str) -> Union[ipaddress.IPv4Network, ipaddress.IPv6Network]:
+    """
+    Normaliza una IP o rango CIDR ("10.1.2.3" -> 10.1.2.3/32)
+
+    Raises:
+        ValueError si no es una IP ni un rango válido
+    """
+    return ipaddress.ip_network(red.strip(), strict=False)
+
+
+class RangosIP:
+    """Conjunto de redes como intervalos [inicio, fin] ordenados, por familia"""
+
+    def __init__(self, redes: Iterable[str] = ()):
+        intervalos: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        self.invalidas: List[str] = []
+        for red in redes:
+            for valor in _ALIAS.get(red.strip().lower(), (red,)):
+                try:
+                    if "/" in valor:
+                        net = parsear_red(valor)
+                        inicio, fin = int(net.network_address), int(net.broadcast_address)
+                    else:
+                        # IP suelta: ip_address es bastante más rápido que ip_network
+                        net = ipaddress.ip_address(valor.strip())
+                        inicio = fin = int(net)
+                except ValueError:
+                    self.invalidas.append(red)
+                    continue
+                intervalos[net.version].append((inicio, fin))
+
+        # Unir solapados y contiguos: quedan disjuntos y la búsqueda es exacta
+        self._inicios: Dict[int, List[int]] = {}
+        self._fines: Dict[int, List[int]] = {}
+        for version, lista in intervalos.items():
+            lista.sort()
+            inicios, fines = [], []
+            for inicio, fin in lista:
+                if fines and inicio <= fines[-1] + 1:
+                    fines[-1] = max(fines[-1], fin)
+                else:
+                    inicios.append(inicio)
+                    fines.append(fin)
+            self._inicios[version] = inicios
+            self._fines[version] = fines
+
+    def __len__(self) -> int:
+        return sum(len(inicios) for inicios in self._inicios.values())
+
+    def contiene(self, ip: str) -> bool:
+        """True si la IP cae en alguna red (False si no es una IP válida)"""
+        try:
+            direccion = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if direccion.version == 6 and direccion.ipv4_mapped:
+            direccion = direccion.ipv4_mapped  # ::ffff:1.2.3.4 -> 1.2.3.4
+
+        valor = int(direccion)
+        i = bisect.bisect_right(self._inicios[direccion.version], valor) - 1
+        return i >= 0 and valor <= self._fines[direccion.version][i]
+
+
+class FiltroIP:
+    """
+    Whitelist y blacklist compiladas, recargables en caliente
+
+    - `consultar` es lo único que corre por request: dict de IPs ya vistas
+      y, si no está, dos búsquedas binarias.
+    - Los cambios del panel incrementan una versión en Redis; cada worker
+      la mira cada RATE_LIMITS_RECARGA segundos y relee la tabla si cambió.
+    """
+
+    def __init__(self, max_cache: int = 10000):
+        self.max_cache = max_cache
+        self.permitidas = RangosIP(WHITELIST_IPS)
+        self.bloqueadas = RangosIP(BLACKLIST_IPS)
+        self._cache: Dict[str, Tuple[bool, bool]] = {}
+        self._cargada = False
+        self._version: Optional[str] = None
+        self._vence = 0.0
+        self._lock = threading.Lock()
+
+    def compilar(self, reglas: Iterable[Tuple[str, str]]):
+        """
+        Reemplaza las listas: base de rate_limits.py más las reglas
+
+        Args:
+            reglas: Pares (red, tipo) con tipo "permitir" o "bloquear"
+        """
+        permitir, bloquear = list(WHITELIST_IPS), list(BLACKLIST_IPS)
+        for red, tipo in reglas:
+            (permitir if tipo == "permitir" else bloquear).append(red)
+
+        permitidas, bloqueadas = RangosIP(permitir), RangosIP(bloquear)
+        invalidas = permitidas.invalidas + bloqueadas.invalidas
+        if invalidas:
+            logger.warning(f"⚠️ IPs inválidas ignoradas en whitelist/blacklist: {invalidas[:10]}")
+
+        with self._lock:
+            self.permitidas, self.bloqueadas = permitidas, bloqueadas
+            self._cache = {}
+
+    def cargar(self, db=None):
+        """Lee la tabla ip_reglas y recompila (con una sesión propia si no se pasa)"""
+        from backend.models import IpRegla
+        from backend.config.database import SessionLocal
+
+        propia = db is None
+        db = db or SessionLocal()
+        try:
+            reglas = db.query(IpRegla.red, IpRegla.tipo).all()
+        finally:
+            if propia:
+                db.close()
+
+        self.compilar(reglas)
+        self._cargada = True
+
+    async def recargar_si_cambio(self):
+        """Relee la tabla al arrancar y cuando otro worker publicó cambios"""
+        if time.monotonic() < self._vence:
+            return
+        self._vence = time.monotonic() + settings.RATE_LIMITS_RECARGA
+
+        version = self._version
+        cliente = get_redis_async()
+        if cliente is not None:
+            try:
+                version = await cliente.get(REDIS_IP_VERSION_KEY) or "0"
+            except Exception as e:
+                registrar_error_redis(e)
+
+        if self._cargada and version == self._version:
+            return
+        try:
+            await run_in_threadpool(self.cargar)
+            self._version = version
+        except Exception as e:
+            logger.error(f"❌ Error cargando reglas de IPs: {e}")
+
+    def publicar_cambio(self, db=None):
+        """Recompila en este proceso y avisa al resto de los workers"""
+        self.cargar(db)
+        try:
+            get_redis_client().incr(REDIS_IP_VERSION_KEY)
+        except Exception as e:
+            registrar_error_redis(e)
+            logger.warning(f"⚠️ Cambio de IPs aplicado solo en este proceso: {e}")
+
+    def consultar(self, ip: str) -> Tuple[bool, bool]:
+        """
+        Returns:
+            Tupla (permitida, bloqueada)
+        """
+        cache = self._cache
+        resultado = cache.get(ip)
+        if resultado is None:
+            resultado = (self.permitidas.contiene(ip), self.bloqueadas.contiene(ip))
+            if len(cache) >= self.max_cache:
+                cache.clear()
+            cache[ip] = resultado
+        return resultado
+
+    def permitida(self, ip: str) -> bool:
+        """IP en whitelist (sin rate limit)"""
+        return self.consultar(ip)[0]
+
+    def bloqueada(self, ip: str) -> bool:
+        """IP en blacklist"""
+        return self.consultar(ip)[1]
+
+    def estado(self) -> Dict[str, int]:
+        """Tamaño de las listas compiladas (para el panel)"""
+        return {
+            "rangos_permitidos": len(self.permitidas),
+            "rangos_bloqueados": len(self.bloqueadas),
+            "cache": len(self._cache),
+        }
+
+
+# Instancia global
+filtro_ip = FiltroIP()
@@ -0,0 +1,38 @@
+"""
+Cliente HTTP asíncrono compartido para llamadas al proveedor SMS
+"""
+import httpx
+from typing import Optional
+from backend.config.settings import settings
+
+# Cliente httpx singleton (pool de conexiones keep-alive)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Obtener cliente HTTP asíncrono (singleton pattern)
+
+    Reutiliza conexiones TCP/TLS hacia SMS Masivos en lugar de abrir
+    una conexión nueva por cada SMS.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.SMS_HTTP_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.SMS_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SMS_HTTP_MAX_KEEPALIVE
+            )
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """
+    Cerrar cliente HTTP (al apagar la aplicación)
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
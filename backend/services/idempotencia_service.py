@@ -0,0 +1,212 @@
+"""
+Claves de idempotencia para /send-sms
+=====================================
+
+Cada envío repetido (reintento del frontend, doble clic) gasta un SMS
+pago y escribe otra verificación. El primer request con una clave la
+reserva en Redis; mientras está en curso los duplicados reciben 409 y,
+cuando termina bien, reciben la misma respuesta sin volver a llamar al
+proveedor.
+
+- Con header `Idempotency-Key` la clave es por usuario y dura IDEMPOTENCIA_TTL.
+- Sin header se deriva de (DNI, teléfono, sucursal, código si lo eligió
+  el frontend, franja de IDEMPOTENCIA_VENTANA segundos): el mismo destino
+  dentro de la franja se considera el mismo envío.
+- Los envíos que fallan liberan la clave para que el reintento envíe.
+- Si Redis no responde, la deduplicación sigue en memoria (por proceso).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from backend.config.redis_config import get_redis_async, registrar_error_redis
+from backend.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = "idempotencia:sms:"
+EN_CURSO = "en_curso"
+COMPLETO = "completo"
+
+
+@dataclass(frozen=True)
+class EnvioPrevio:
+    """Lo que quedó guardado para una clave ya usada"""
+    estado: str  # en_curso | completo
+    huella: str
+    status_code: int = 200
+    cuerpo: Optional[Dict[str, Any]] = None
+
+
+def _resumen(*partes) -> str:
+    return hashlib.sha256("|".join(str(p) for p in partes).encode()).hexdigest()[:32]
+
+
+def huella(person_id: str, phone_number: str, merchant_code: str,
+           verification_code: Optional[str] = None, encolar: bool = False) -> str:
+    """Resumen del pedido: la misma clave con otros datos es un error del cliente"""
+    return _resumen(person_id, phone_number, merchant_code, verification_code or "", int(encolar))
+
+
+class IdempotenciaSMS:
+    """Reserva, guarda y libera claves de envío (Redis, o memoria si no responde)"""
+
+    ESPERA_REDIS = 30  # Segundos en memoria tras un error de Redis antes de volver a probar
+
+    def __init__(self, ttl_seconds: int, ventana_seconds: int, reserva_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.ventana_seconds = max(1, ventana_seconds)
+        self.reserva_seconds = reserva_seconds
+        self._memoria: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._redis_caido_hasta = 0.0
+        self._metricas = {"nuevos": 0, "deduplicados": 0, "en_curso": 0, "conflictos": 0, "liberados": 0}
+
+    # ========================================
+    # 🔑 CLAVES
+    # ========================================
+
+    def clave(self, usuario_id: int, idempotency_key: Optional[str], person_id: str,
+              phone_number: str, merchant_code: str, verification_code: Optional[str] = None,
+              ahora: Optional[float] = None) -> str:
+        """
+        Clave de Redis para un envío (del header o derivada del destino)
+
+        El código elegido por el frontend también entra en la clave
+        derivada: un código nuevo para el mismo DNI es otro SMS.
+        """
+        if idempotency_key:
+            return f"{PREFIJO}h:{usuario_id}:{_resumen(idempotency_key)}"
+
+        franja = int((ahora if ahora is not None else time.time()) // self.ventana_seconds)
+        return f"{PREFIJO}auto:{_resumen(person_id, phone_number, merchant_code, verification_code or '', franja)}"
+
+    # ========================================
+    # 🔒 RESERVAR / GUARDAR / LIBERAR
+    # ========================================
+
+    async def reservar(self, clave: str, huella_pedido: str) -> Optional[EnvioPrevio]:
+        """
+        Tomar la clave para este envío
+
+        Returns:
+            None si el envío es nuevo (la clave queda en curso), o lo que
+            había guardado si la clave ya se usó
+        """
+        valor = json.dumps({"estado": EN_CURSO, "huella": huella_pedido})
+        previo = await self._set_nx(clave, valor, self.reserva_seconds)
+
+        if previo is None:
+            self._contar("nuevos")
+            return None
+
+        envio = EnvioPrevio(**json.loads(previo))
+        if envio.huella != huella_pedido:
+            self._contar("conflictos")
+        elif envio.estado == EN_CURSO:
+            self._contar("en_curso")
+        else:
+            self._contar("deduplicados")
+            logger.info("📵 Envío deduplicado (%s)", clave)
+        return envio
+
+    async def guardar(self, clave: str, huella_pedido: str, status_code: int, cuerpo: Dict[str, Any]):
+        """Guardar la respuesta de un envío exitoso para devolverla a los duplicados"""
+        valor = json.dumps({"estado": COMPLETO, "huella": huella_pedido, "status_code": status_code, "cuerpo": cuerpo})
+        await self._set(clave, valor, self.ttl_seconds)
+
+    async def liberar(self, clave: str):
+        """El envío falló: el próximo intento con la misma clave vuelve a enviar"""
+        self._contar("liberados")
+        await self._delete(clave)
+
+    def estado(self) -> Dict[str, Any]:
+        """Contadores para el panel de admin"""
+        with self._lock:
+            return {
+                **self._metricas,
+                "en_memoria": len(self._memoria),
+                "redis_caido": time.monotonic() < self._redis_caido_hasta,
+                "ttl": self.ttl_seconds,
+                "ventana": self.ventana_seconds,
+            }
+
+    def _contar(self, metrica: str):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    # ========================================
+    # 🔴 REDIS CON RESPALDO EN MEMORIA
+    # ========================================
+
+    def _cliente(self):
+        if time.monotonic() < self._redis_caido_hasta:
+            return None
+        return get_redis_async()
+
+    def _fallo_redis(self, error: Exception):
+        registrar_error_redis(error)
+        self._redis_caido_hasta = time.monotonic() + self.ESPERA_REDIS
+        logger.warning(f"⚠️ Redis no responde, idempotencia en memoria: {error}")
+
+    async def _set_nx(self, clave: str, valor: str, ttl: int) -> Optional[str]:
+        """SET NX: None si se tomó la clave, si no el valor existente"""
+        cliente = self._cliente()
+        if cliente is not None:
+            try:
+                for _ in range(2):  # La clave puede expirar entre el SET y el GET
+                    if await cliente.set(clave, valor, nx=True, ex=ttl):
+                        return None
+                    previo = await cliente.get(clave)
+                    if previo is not None:
+                        return previo
+            except Exception as e:
+                self._fallo_redis(e)
+
+        with self._lock:
+            ahora = time.monotonic()
+            previo = self._memoria.get(clave)
+            if previo is not None and previo[0] > ahora:
+                return previo[1]
+            self._purgar(ahora)
+            self._memoria[clave] = (ahora + ttl, valor)
+            return None
+
+    async def _set(self, clave: str, valor: str, ttl: int):
+        cliente = self._cliente()
+        if cliente is not None:
+            try:
+                await cliente.set(clave, valor, ex=ttl)
+                return
+            except Exception as e:
+                self._fallo_redis(e)
+        with self._lock:
+            self._memoria[clave] = (time.monotonic() + ttl, valor)
+
+    async def _delete(self, clave: str):
+        with self._lock:
+            self._memoria.pop(clave, None)
+        cliente = self._cliente()
+        if cliente is not None:
+            try:
+                await cliente.delete(clave)
+            except Exception as e:
+                self._fallo_redis(e)
+
+    def _purgar(self, ahora: float):
+        # Barrido perezoso: solo cuando el dict crece
+        if len(self._memoria) > 1000:
+            for clave in [c for c, (expira, _) in self._memoria.items() if expira <= ahora]:
+                del self._memoria[clave]
+
+
+# 🌍 Instancia global
+idempotencia_sms = IdempotenciaSMS(
+    ttl_seconds=settings.IDEMPOTENCIA_TTL,
+    ventana_seconds=settings.IDEMPOTENCIA_VENTANA,
+    reserva_seconds=settings.IDEMPOTENCIA_RESERVA_TTL,
+)
@@ -0,0 +1,140 @@
+"""
+Caché del saldo de SMS disponibles en SMS Masivos
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any
+from backend.config.settings import settings
+from backend.services.sms_service import SMSService
+
+logger = logging.getLogger(__name__)
+
+
+class SaldoCache:
+    """
+    Caché en memoria del saldo del proveedor
+
+    - TTL corto: una consulta real a `obtener_saldo.asp` cada pocos segundos
+      como máximo, sin importar cuántos operadores tengan la página abierta.
+    - Single-flight: ante un cache miss concurrente se hace UNA sola llamada
+      upstream y el resto de los requests espera ese mismo resultado.
+    - Refresco en segundo plano para que el camino de envío no pague el
+      round trip de la consulta.
+    - Decremento local en cada envío exitoso (el refresco corrige el desvío).
+    - Si el proveedor no responde se sirve el último valor conocido y no se
+      vuelve a consultar hasta pasados ESPERA_ERROR segundos (el refresco
+      en segundo plano sigue probando).
+    """
+
+    ESPERA_ERROR = 10  # Segundos sirviendo el valor viejo tras una consulta fallida
+
+    def __init__(self, ttl_seconds: int, refresh_interval: int):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self._saldo: Optional[int] = None
+        self._actualizado: Optional[float] = None  # None = nunca consultado
+        self._ultimo_error: Optional[str] = None
+        self._espera_error_hasta = 0.0
+        self._en_vuelo: Optional[asyncio.Task] = None
+        self._tarea_refresco: Optional[asyncio.Task] = None
+
+    def _vigente(self) -> bool:
+        # Una respuesta no numérica (saldo None) también se cachea: si no,
+        # cada envío volvería a consultar al proveedor
+        if self._actualizado is None:
+            return False
+        ahora = time.monotonic()
+        return ahora - self._actualizado < self.ttl_seconds or ahora < self._espera_error_hasta
+
+    async def _consultar(self) -> Optional[int]:
+        """Consulta real al proveedor; actualiza la caché"""
+        try:
+            saldo = await SMSService.consultar_saldo_async()
+        except Exception as e:
+            self._ultimo_error = str(e) or type(e).__name__
+            if self._saldo is None:
+                raise
+            # Servir el último valor conocido si el proveedor no responde, sin
+            # que cada request pague otra consulta con el timeout completo
+            self._espera_error_hasta = time.monotonic() + min(self.ESPERA_ERROR, self.ttl_seconds)
+            logger.warning(f"⚠️ No se pudo refrescar saldo, usando valor en caché: {e}")
+            return self._saldo
+
+        self._saldo = saldo
+        self._actualizado = time.monotonic()
+        self._ultimo_error = None
+        self._espera_error_hasta = 0.0
+        return saldo
+
+    async def obtener(self, forzar: bool = False) -> Optional[int]:
+        """
+        Obtener saldo disponible
+
+        Args:
+            forzar: Si es True, ignora el TTL y consulta al proveedor
+
+        Returns:
+            Saldo en SMS, o None si el proveedor devolvió una respuesta no numérica
+
+        Raises:
+            Exception si el proveedor no responde y no hay valor en caché
+        """
+        if not forzar and self._vigente():
+            return self._saldo
+
+        # Single-flight: todos los que llegan durante la consulta la comparten
+        if self._en_vuelo is None or self._en_vuelo.done():
+            self._en_vuelo = asyncio.ensure_future(self._consultar())
+        return await asyncio.shield(self._en_vuelo)
+
+    def decrementar(self, cantidad: int = 1):
+        """Descontar SMS enviados del saldo en caché"""
+        if self._saldo is not None:
+            self._saldo = max(0, self._saldo - cantidad)
+
+    def invalidar(self):
+        """Forzar consulta al proveedor en el próximo acceso (ej: cambio de API Key)"""
+        self._saldo = None
+        self._actualizado = None
+        self._espera_error_hasta = 0.0
+
+    def estado(self) -> Dict[str, Any]:
+        """Estado de la caché (para diagnóstico)"""
+        return {
+            "saldo": self._saldo,
+            "edad_segundos": round(time.monotonic() - self._actualizado, 1) if self._actualizado is not None else None,
+            "vigente": self._vigente(),
+            "ultimo_error": self._ultimo_error
+        }
+
+    async def _loop_refresco(self):
+        while True:
+            if not settings.SMS_MODO_SIMULADO:
+                try:
+                    await self.obtener(forzar=True)
+                except Exception as e:
+                    logger.warning(f"⚠️ Error en refresco de saldo: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def iniciar_refresco(self):
+        """Iniciar tarea de refresco en segundo plano (lifespan de la app)"""
+        if self.refresh_interval > 0 and self._tarea_refresco is None:
+            self._tarea_refresco = asyncio.create_task(self._loop_refresco())
+
+    async def detener_refresco(self):
+        """Detener tarea de refresco"""
+        if self._tarea_refresco is not None:
+            self._tarea_refresco.cancel()
+            try:
+                await self._tarea_refresco
+            except asyncio.CancelledError:
+                pass
+            self._tarea_refresco = None
+
+
+# Instancia global
+saldo_cache = SaldoCache(
+    ttl_seconds=settings.SALDO_CACHE_TTL,
+    refresh_interval=settings.SALDO_REFRESCO_INTERVALO
+)
@@ -2,23 +2,49 @@
 Sistema de sesiones con Redis
 """
 import json
+import logging
 import secrets
-from typing import Optional, Dict, Any
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
+from redis.exceptions import ResponseError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from backend.config.settings import settings
 from backend.config.redis_config import (
-    get_redis_client, 
+    get_redis_client,
+    get_redis_async,
+    registrar_error_redis,
+    escanear_claves,
     SESSION_EXPIRE_SECONDS,
-    SESSION_KEY_PREFIX
+    SESSION_KEY_PREFIX,
+    USER_SESSIONS_KEY_PREFIX,
+    SESSION_TOUCH_SECONDS
 )
 
-class RedisSessionStore:
+logger = logging.getLogger(__name__)
+
+# Errores que cuentan como "Redis no disponible" para el circuit breaker
+ERRORES_REDIS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+class SessionBackend(ABC):
     """
-    Almacenamiento de sesiones en Redis
+    Interfaz común de los almacenamientos de sesiones
+    
+    Implementaciones: RedisSessionStore, MemorySessionStore y
+    TwoTierSessionStore (caché local delante de Redis con failover).
     """
     
-    def __init__(self):
-        self.redis = get_redis_client()
-        self.expire_seconds = SESSION_EXPIRE_SECONDS
+    @staticmethod
+    def nueva_sesion(user_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Genera un session ID seguro y los datos iniciales de la sesión"""
+        ahora = datetime.now().isoformat()
+        return secrets.token_urlsafe(32), {**user_data, "created_at": ahora, "last_activity": ahora}
+    
+    @abstractmethod
+    def guardar(self, session_id: str, session_data: Dict[str, Any]):
+        ...
     
     def create_session(self, user_data: Dict[str, Any]) -> str:
         """
@@ -30,25 +56,174 @@ class RedisSessionStore:
         Returns:
             session_id: ID de sesión único
         """
-        # Generar session ID seguro
-        session_id = secrets.token_urlsafe(32)
-        
-        # Agregar timestamp
-        session_data = {
-            **user_data,
-            "created_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat()
-        }
+        session_id, session_data = self.nueva_sesion(user_data)
+        self.guardar(session_id, session_data)
+        return session_id
+    
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+    
+    # Variantes async para handlers `async def` (login, get_current_user,
+    # logout). Por defecto delegan en las síncronas (memoria no bloquea).
+    
+    async def aguardar(self, session_id: str, session_data: Dict[str, Any]):
+        self.guardar(session_id, session_data)
+    
+    async def acreate_session(self, user_data: Dict[str, Any]) -> str:
+        session_id, session_data = self.nueva_sesion(user_data)
+        await self.aguardar(session_id, session_data)
+        return session_id
+    
+    async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_session(session_id)
+    
+    async def adelete_session(self, session_id: str):
+        self.delete_session(session_id)
+    
+    @abstractmethod
+    def update_session(self, session_id: str, data: Dict[str, Any]):
+        ...
+    
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        ...
+    
+    @abstractmethod
+    def get_user_session_ids(self, user_id: int) -> List[str]:
+        ...
+    
+    @abstractmethod
+    def revoke_user_sessions(self, user_id: int, excepto: Optional[str] = None) -> int:
+        ...
+    
+    @abstractmethod
+    def listar_sesiones(self, cursor: int = 0, limite: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        ...
+    
+    @abstractmethod
+    def contar_sesiones(self) -> int:
+        ...
+    
+    @abstractmethod
+    def extend_session(self, session_id: str):
+        ...
+    
+    def get_all_sessions(self) -> list:
+        """
+        Obtener todas las sesiones activas (recorre todas las páginas)
+        """
+        sessions, cursor = self.listar_sesiones()
+        while cursor:
+            pagina, cursor = self.listar_sesiones(cursor)
+            sessions.extend(pagina)
+        return sessions
+
+
+class RedisSessionStore(SessionBackend):
+    """
+    Almacenamiento de sesiones en Redis
+    
+    Cada sesión es un hash (un campo por dato, valor en JSON). La lectura
+    trae los datos y el TTL en un solo round trip; el TTL y `last_activity`
+    se renuevan solo si el último "touch" tiene más de `touch_seconds`,
+    así un operador activo no reescribe su sesión en cada request.
+    
+    Índice por usuario: `user_sessions:<id>` guarda los session_id de cada
+    usuario para poder cerrarlos todos sin recorrer las claves.
+    """
+    
+    def __init__(self):
+        self.redis = get_redis_client()
+        self.expire_seconds = SESSION_EXPIRE_SECONDS
+        self.touch_seconds = SESSION_TOUCH_SECONDS
+    
+    @staticmethod
+    def _codificar(data: Dict[str, Any]) -> Dict[str, str]:
+        return {campo: json.dumps(valor) for campo, valor in data.items()}
+    
+    @staticmethod
+    def _decodificar(data: Dict[str, str]) -> Dict[str, Any]:
+        return {campo: json.loads(valor) for campo, valor in data.items()}
+    
+    def _migrar_legacy(self, key: str) -> Optional[Dict[str, Any]]:
+        """Convierte una sesión guardada como JSON plano (formato anterior) a hash"""
+        data = self.redis.get(key)
+        if not data:
+            return None
         
-        # Guardar en Redis con expiración
+        session_data = json.loads(data)
+        ttl = self.redis.ttl(key)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self._codificar(session_data))
+        pipe.expire(key, ttl if ttl > 0 else self.expire_seconds)
+        if session_data.get("id") is not None:
+            indice = f"{USER_SESSIONS_KEY_PREFIX}{session_data['id']}"
+            pipe.sadd(indice, key.replace(SESSION_KEY_PREFIX, ""))
+            pipe.expire(indice, self.expire_seconds)
+        pipe.execute()
+        return session_data
+    
+    # Los comandos se arman sobre un pipeline síncrono o asíncrono
+    # (redis.asyncio); solo cambia quién llama a execute()
+    
+    def _preparar_touch(self, pipe, key: str, user_id: Any = None):
+        """Renueva TTL y última actividad en un solo round trip"""
+        pipe.hset(key, "last_activity", json.dumps(datetime.now().isoformat()))
+        pipe.expire(key, self.expire_seconds)
+        if user_id is not None:
+            # El índice vive al menos tanto como la sesión más nueva
+            pipe.expire(f"{USER_SESSIONS_KEY_PREFIX}{user_id}", self.expire_seconds)
+    
+    def _preparar_guardar(self, pipe, session_id: str, session_data: Dict[str, Any]):
         key = f"{SESSION_KEY_PREFIX}{session_id}"
-        self.redis.setex(
-            key,
-            self.expire_seconds,
-            json.dumps(session_data)
-        )
+        pipe.hset(key, mapping=self._codificar(session_data))
+        pipe.expire(key, self.expire_seconds)
+        if session_data.get("id") is not None:
+            indice = f"{USER_SESSIONS_KEY_PREFIX}{session_data['id']}"
+            pipe.sadd(indice, session_id)
+            pipe.expire(indice, self.expire_seconds)
+    
+    def _preparar_delete(self, pipe, session_id: str, user_id: Optional[str]):
+        pipe.delete(f"{SESSION_KEY_PREFIX}{session_id}")
+        if user_id is not None:
+            pipe.srem(f"{USER_SESSIONS_KEY_PREFIX}{json.loads(user_id)}", session_id)
+    
+    def _leer(self, data: Dict[str, str], ttl: int) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Decodifica una lectura; indica si corresponde renovar la sesión"""
+        if not data:
+            return None, False
         
-        return session_id
+        session_data = self._decodificar(data)
+        
+        # Actualizar última actividad solo si el último touch es viejo
+        if ttl >= 0 and self.expire_seconds - ttl >= self.touch_seconds:
+            session_data["last_activity"] = datetime.now().isoformat()
+            return session_data, True
+        return session_data, False
+    
+    def _touch(self, key: str, user_id: Any = None):
+        pipe = self.redis.pipeline(transaction=False)
+        self._preparar_touch(pipe, key, user_id)
+        pipe.execute()
+    
+    def guardar(self, session_id: str, session_data: Dict[str, Any]):
+        """
+        Guardar en Redis con expiración (sesión + índice del usuario, MULTI/EXEC)
+        """
+        pipe = self.redis.pipeline()
+        self._preparar_guardar(pipe, session_id, session_data)
+        pipe.execute()
+    
+    async def aguardar(self, session_id: str, session_data: Dict[str, Any]):
+        cliente = get_redis_async()
+        if cliente is None:
+            return self.guardar(session_id, session_data)
+        
+        pipe = cliente.pipeline()
+        self._preparar_guardar(pipe, session_id, session_data)
+        await pipe.execute()
     
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -61,70 +236,494 @@ class RedisSessionStore:
             Datos de sesión o None si no existe
         """
         key = f"{SESSION_KEY_PREFIX}{session_id}"
-        data = self.redis.get(key)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.ttl(key)
+        try:
+            data, ttl = pipe.execute()
+        except ResponseError:
+            # WRONGTYPE: sesión creada antes del cambio a hash
+            return self._migrar_legacy(key)
         
-        if data:
-            session_data = json.loads(data)
-            
-            # Actualizar última actividad
-            session_data["last_activity"] = datetime.now().isoformat()
-            self.redis.setex(
-                key,
-                self.expire_seconds,
-                json.dumps(session_data)
-            )
-            
-            return session_data
+        session_data, renovar = self._leer(data, ttl)
+        if renovar:
+            self._touch(key, session_data.get("id"))
+        return session_data
+    
+    async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Igual que get_session, con el pool asíncrono (no bloquea el event loop)
+        """
+        cliente = get_redis_async()
+        if cliente is None:
+            return self.get_session(session_id)
         
-        return None
+        key = f"{SESSION_KEY_PREFIX}{session_id}"
+        pipe = cliente.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.ttl(key)
+        try:
+            data, ttl = await pipe.execute()
+        except ResponseError:
+            return self._migrar_legacy(key)
+        
+        session_data, renovar = self._leer(data, ttl)
+        if renovar:
+            pipe = cliente.pipeline(transaction=False)
+            self._preparar_touch(pipe, key, session_data.get("id"))
+            await pipe.execute()
+        return session_data
     
     def update_session(self, session_id: str, data: Dict[str, Any]):
         """
         Actualizar datos de sesión
         """
         key = f"{SESSION_KEY_PREFIX}{session_id}"
-        existing = self.get_session(session_id)
         
-        if existing:
-            existing.update(data)
-            existing["last_activity"] = datetime.now().isoformat()
-            self.redis.setex(
-                key,
-                self.expire_seconds,
-                json.dumps(existing)
-            )
+        if self.redis.exists(key):
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping=self._codificar({
+                **data,
+                "last_activity": datetime.now().isoformat()
+            }))
+            pipe.expire(key, self.expire_seconds)
+            pipe.execute()
     
     def delete_session(self, session_id: str):
         """
         Eliminar sesión (logout)
         """
         key = f"{SESSION_KEY_PREFIX}{session_id}"
-        self.redis.delete(key)
+        try:
+            user_id = self.redis.hget(key, "id")
+        except ResponseError:
+            user_id = None  # Sesión en formato anterior (sin índice)
+        
+        pipe = self.redis.pipeline()
+        self._preparar_delete(pipe, session_id, user_id)
+        pipe.execute()
     
-    def get_all_sessions(self) -> list:
+    async def adelete_session(self, session_id: str):
+        cliente = get_redis_async()
+        if cliente is None:
+            return self.delete_session(session_id)
+        
+        try:
+            user_id = await cliente.hget(f"{SESSION_KEY_PREFIX}{session_id}", "id")
+        except ResponseError:
+            user_id = None
+        
+        pipe = cliente.pipeline()
+        self._preparar_delete(pipe, session_id, user_id)
+        await pipe.execute()
+    
+    def get_user_session_ids(self, user_id: int) -> List[str]:
         """
-        Obtener todas las sesiones activas (para admin panel)
+        IDs de sesión registrados para un usuario (pueden incluir sesiones ya expiradas)
         """
-        keys = self.redis.keys(f"{SESSION_KEY_PREFIX}*")
-        sessions = []
+        return list(self.redis.smembers(f"{USER_SESSIONS_KEY_PREFIX}{user_id}"))
+    
+    def revoke_user_sessions(self, user_id: int, excepto: Optional[str] = None) -> int:
+        """
+        Cerrar todas las sesiones de un usuario
+        
+        Args:
+            user_id: ID del usuario
+            excepto: session_id a conservar (ej: la del propio usuario que se edita)
+        
+        Returns:
+            Cantidad de sesiones eliminadas
+        """
+        indice = f"{USER_SESSIONS_KEY_PREFIX}{user_id}"
+        session_ids = [s for s in self.redis.smembers(indice) if s != excepto]
+        if not session_ids:
+            return 0
+        
+        pipe = self.redis.pipeline()
+        pipe.delete(*[f"{SESSION_KEY_PREFIX}{s}" for s in session_ids])
+        pipe.srem(indice, *session_ids)
+        eliminadas, _ = pipe.execute()
+        return eliminadas
+    
+    def listar_sesiones(self, cursor: int = 0, limite: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Una página de sesiones activas (para admin panel)
         
+        Recorre las claves con SCAN y trae datos + TTL de toda la página
+        en un solo pipeline.
+        
+        Returns:
+            (sesiones, siguiente_cursor); el cursor 0 indica que no hay más
+        """
+        keys, siguiente = escanear_claves(self.redis, f"{SESSION_KEY_PREFIX}*", cursor, limite)
+        
+        pipe = self.redis.pipeline(transaction=False)
         for key in keys:
-            data = self.redis.get(key)
-            if data:
-                session_data = json.loads(data)
-                ttl = self.redis.ttl(key)
+            pipe.hgetall(key)
+            pipe.ttl(key)
+        resultados = pipe.execute(raise_on_error=False) if keys else []
+        
+        sessions = []
+        for i, key in enumerate(keys):
+            data, ttl = resultados[2 * i], resultados[2 * i + 1]
+            if isinstance(data, ResponseError):
+                session_data = self._migrar_legacy(key)
+            else:
+                session_data = self._decodificar(data) if data else None
+            if session_data:
                 session_data["ttl_seconds"] = ttl
                 session_data["session_id"] = key.replace(SESSION_KEY_PREFIX, "")
                 sessions.append(session_data)
         
-        return sessions
+        return sessions, siguiente
+    
+    def contar_sesiones(self) -> int:
+        """
+        Total de sesiones activas (SCARD de los índices `user_sessions:*`)
+        
+        Un índice puede conservar sesiones ya expiradas mientras el usuario
+        tenga otra activa: el total es una cota superior cercana.
+        """
+        indices, cursor = escanear_claves(self.redis, f"{USER_SESSIONS_KEY_PREFIX}*")
+        while cursor:
+            pagina, cursor = escanear_claves(self.redis, f"{USER_SESSIONS_KEY_PREFIX}*", cursor)
+            indices.extend(pagina)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for indice in set(indices):
+            pipe.scard(indice)
+        return sum(pipe.execute()) if indices else 0
     
     def extend_session(self, session_id: str):
         """
         Extender tiempo de expiración de sesión
         """
         key = f"{SESSION_KEY_PREFIX}{session_id}"
-        self.redis.expire(key, self.expire_seconds)
+        if self.redis.exists(key):
+            self._touch(key, self.redis.hget(key, "id"))
+
+
+class MemorySessionStore(SessionBackend):
+    """
+    Sesiones en memoria del proceso (LRU con TTL)
+    
+    Sirve como backend único (desarrollo / un solo worker), como caché
+    local del modo de dos niveles y como respaldo cuando Redis no responde.
+    Las sesiones no se comparten entre procesos.
+    """
+    
+    def __init__(self, expire_seconds: int = SESSION_EXPIRE_SECONDS, max_entradas: int = 10000):
+        self.expire_seconds = expire_seconds
+        self.max_entradas = max_entradas
+        self._sesiones: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _vigente(self, session_id: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        entrada = self._sesiones.get(session_id)
+        if entrada and entrada[0] <= time.monotonic():
+            del self._sesiones[session_id]
+            return None
+        return entrada
+    
+    def guardar(self, session_id: str, session_data: Dict[str, Any], ttl: Optional[int] = None):
+        """Guarda (o reemplaza) una sesión con el id indicado"""
+        vence = time.monotonic() + (ttl if ttl and ttl > 0 else self.expire_seconds)
+        with self._lock:
+            self._sesiones[session_id] = (vence, dict(session_data))
+            self._sesiones.move_to_end(session_id)
+            while len(self._sesiones) > self.max_entradas:
+                self._sesiones.popitem(last=False)
+    
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._vigente(session_id)
+            if not entrada:
+                return None
+            self._sesiones.move_to_end(session_id)
+            return dict(entrada[1])
+    
+    def update_session(self, session_id: str, data: Dict[str, Any]):
+        with self._lock:
+            entrada = self._vigente(session_id)
+            if entrada:
+                entrada[1].update(data)
+                entrada[1]["last_activity"] = datetime.now().isoformat()
+    
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._sesiones.pop(session_id, None)
+    
+    def get_user_session_ids(self, user_id: int) -> List[str]:
+        with self._lock:
+            return [
+                session_id for session_id in list(self._sesiones)
+                if self._vigente(session_id) and self._sesiones[session_id][1].get("id") == user_id
+            ]
+    
+    def revoke_user_sessions(self, user_id: int, excepto: Optional[str] = None) -> int:
+        session_ids = [s for s in self.get_user_session_ids(user_id) if s != excepto]
+        with self._lock:
+            for session_id in session_ids:
+                self._sesiones.pop(session_id, None)
+        return len(session_ids)
+    
+    def listar_sesiones(self, cursor: int = 0, limite: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """El cursor es un desplazamiento sobre las sesiones vigentes"""
+        ahora = time.monotonic()
+        with self._lock:
+            vigentes = [(s, e) for s, e in self._sesiones.items() if e[0] > ahora]
+        
+        pagina = []
+        for session_id, (vence, session_data) in vigentes[cursor:cursor + limite]:
+            pagina.append({
+                **session_data,
+                "ttl_seconds": int(vence - ahora),
+                "session_id": session_id
+            })
+        
+        siguiente = cursor + limite
+        return pagina, siguiente if siguiente < len(vigentes) else 0
+    
+    def contar_sesiones(self) -> int:
+        ahora = time.monotonic()
+        with self._lock:
+            return sum(1 for vence, _ in self._sesiones.values() if vence > ahora)
+    
+    def extend_session(self, session_id: str):
+        with self._lock:
+            entrada = self._vigente(session_id)
+            if entrada:
+                entrada[1]["last_activity"] = datetime.now().isoformat()
+                self._sesiones[session_id] = (time.monotonic() + self.expire_seconds, entrada[1])
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simple para Redis
+    
+    Tras `fallos_max` errores de conexión seguidos el circuito se abre y
+    durante `espera` segundos no se intenta usar Redis. Pasado ese tiempo
+    se deja pasar un intento: si funciona se cierra, si falla vuelve a abrirse.
+    """
+    
+    def __init__(self, fallos_max: int, espera: int, nombre: str = "sesiones"):
+        self.fallos_max = fallos_max
+        self.espera = espera
+        self.nombre = nombre
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._lock = threading.Lock()
+    
+    def disponible(self) -> bool:
+        return time.monotonic() >= self._abierto_hasta
+    
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_hasta = 0.0
+    
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos >= self.fallos_max:
+                if self.disponible():
+                    logger.warning(f"⚠️ Redis no responde: {self.nombre} en memoria por {self.espera}s")
+                self._abierto_hasta = time.monotonic() + self.espera
+    
+    @property
+    def estado(self) -> str:
+        if self.disponible():
+            return "cerrado" if self._fallos < self.fallos_max else "semiabierto"
+        return "abierto"
+
+
+class TwoTierSessionStore(SessionBackend):
+    """
+    Caché local delante de Redis, con failover a memoria
+    
+    - Una sesión leída de Redis se sirve desde memoria durante
+      `ttl_local` segundos (sin round trip por request).
+    - Si Redis no responde (circuit breaker abierto), las sesiones conocidas
+      por este proceso se siguen sirviendo desde memoria y los logins nuevos
+      se guardan en memoria hasta que Redis vuelva.
+    - Cerrar / revocar sesiones se aplica en ambos niveles; otros procesos
+      lo ven como mucho `ttl_local` segundos después.
+    """
+    
+    def __init__(self, redis_store: RedisSessionStore, local: MemorySessionStore, breaker: CircuitBreaker, ttl_local: int):
+        self.redis_store = redis_store
+        self.local = local
+        self.breaker = breaker
+        self.ttl_local = ttl_local
+        self._sincronizadas: Dict[str, float] = {}  # session_id -> última lectura de Redis
+        self._solo_local: set = set()  # Creadas mientras Redis no respondía
+    
+    def _redis(self, operacion, *args, **kwargs):
+        """Ejecuta una operación en Redis; devuelve (ok, resultado)"""
+        if not self.breaker.disponible():
+            return False, None
+        try:
+            resultado = operacion(*args, **kwargs)
+        except ERRORES_REDIS as e:
+            self._fallo_redis(e)
+            return False, None
+        self.breaker.exito()
+        return True, resultado
+    
+    async def _aredis(self, operacion, *args, **kwargs):
+        """Igual que _redis para operaciones async"""
+        if not self.breaker.disponible():
+            return False, None
+        try:
+            resultado = await operacion(*args, **kwargs)
+        except ERRORES_REDIS as e:
+            self._fallo_redis(e)
+            return False, None
+        self.breaker.exito()
+        return True, resultado
+    
+    def _fallo_redis(self, error: Exception):
+        logger.warning(f"⚠️ Error de Redis en sesiones: {error}")
+        registrar_error_redis(error)
+        self.breaker.fallo()
+    
+    def _cachear(self, session_id: str, session_data: Dict[str, Any]):
+        self.local.guardar(session_id, session_data)
+        self._sincronizadas[session_id] = time.monotonic()
+        if len(self._sincronizadas) > 2 * self.local.max_entradas:
+            # Descartar marcas de sesiones que el LRU local ya expulsó
+            self._sincronizadas = {
+                s: t for s, t in self._sincronizadas.items() if s in self.local._sesiones
+            }
+    
+    def _olvidar(self, session_id: str):
+        self.local.delete_session(session_id)
+        self._sincronizadas.pop(session_id, None)
+        self._solo_local.discard(session_id)
+    
+    def _guardado(self, ok: bool, session_id: str, session_data: Dict[str, Any]):
+        if ok:
+            self._cachear(session_id, session_data)
+        else:
+            self.local.guardar(session_id, session_data)
+            self._solo_local.add(session_id)
+    
+    def guardar(self, session_id: str, session_data: Dict[str, Any]):
+        ok, _ = self._redis(self.redis_store.guardar, session_id, session_data)
+        self._guardado(ok, session_id, session_data)
+    
+    async def aguardar(self, session_id: str, session_data: Dict[str, Any]):
+        ok, _ = await self._aredis(self.redis_store.aguardar, session_id, session_data)
+        self._guardado(ok, session_id, session_data)
+    
+    def _local_fresca(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """La copia local, si se leyó de Redis hace menos de ttl_local"""
+        sincronizada = self._sincronizadas.get(session_id)
+        if sincronizada and time.monotonic() - sincronizada < self.ttl_local:
+            return self.local.get_session(session_id)
+        return None
+    
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        local = self._local_fresca(session_id)
+        if local:
+            return local
+        
+        ok, session_data = self._redis(self.redis_store.get_session, session_id)
+        return self._resolver(session_id, ok, session_data)
+    
+    async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        local = self._local_fresca(session_id)
+        if local:
+            return local
+        
+        ok, session_data = await self._aredis(self.redis_store.aget_session, session_id)
+        return self._resolver(session_id, ok, session_data)
+    
+    def _resolver(self, session_id: str, ok: bool, session_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Combina la lectura de Redis con la copia local"""
+        if not ok:
+            # Redis caído: servir desde memoria las sesiones conocidas
+            return self.local.get_session(session_id)
+        
+        if session_data is None and session_id in self._solo_local:
+            # Creada durante la caída: pasarla a Redis ahora que volvió
+            session_data = self.local.get_session(session_id)
+            if session_data and self._redis(self.redis_store.guardar, session_id, session_data)[0]:
+                self._solo_local.discard(session_id)
+                self._cachear(session_id, session_data)
+            return session_data
+        
+        if session_data is None:
+            self._olvidar(session_id)
+            return None
+        
+        self._cachear(session_id, session_data)
+        return session_data
+    
+    def update_session(self, session_id: str, data: Dict[str, Any]):
+        self.local.update_session(session_id, data)
+        self._redis(self.redis_store.update_session, session_id, data)
+    
+    def delete_session(self, session_id: str):
+        self._olvidar(session_id)
+        self._redis(self.redis_store.delete_session, session_id)
+    
+    async def adelete_session(self, session_id: str):
+        self._olvidar(session_id)
+        await self._aredis(self.redis_store.adelete_session, session_id)
+    
+    def get_user_session_ids(self, user_id: int) -> List[str]:
+        ok, session_ids = self._redis(self.redis_store.get_user_session_ids, user_id)
+        return sorted(set(session_ids or []) | set(self.local.get_user_session_ids(user_id)))
+    
+    def revoke_user_sessions(self, user_id: int, excepto: Optional[str] = None) -> int:
+        locales = [s for s in self.local.get_user_session_ids(user_id) if s != excepto]
+        for session_id in locales:
+            self._olvidar(session_id)
+        ok, eliminadas = self._redis(self.redis_store.revoke_user_sessions, user_id, excepto)
+        return eliminadas if ok else len(locales)
+    
+    def listar_sesiones(self, cursor: int = 0, limite: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        ok, resultado = self._redis(self.redis_store.listar_sesiones, cursor, limite)
+        return resultado if ok else self.local.listar_sesiones(cursor, limite)
+    
+    def contar_sesiones(self) -> int:
+        ok, total = self._redis(self.redis_store.contar_sesiones)
+        return total if ok else self.local.contar_sesiones()
+    
+    def extend_session(self, session_id: str):
+        self.local.extend_session(session_id)
+        self._redis(self.redis_store.extend_session, session_id)
+    
+    def estado(self) -> Dict[str, Any]:
+        """Estado del almacenamiento (para diagnóstico)"""
+        return {
+            "circuito": self.breaker.estado,
+            "sesiones_locales": len(self.local._sesiones),
+            "solo_locales": len(self._solo_local)
+        }
+
+
+def crear_session_store(backend: str = settings.SESSION_BACKEND) -> SessionBackend:
+    """
+    Crea el almacenamiento de sesiones según SESSION_BACKEND
+    
+    - redis: solo Redis (comportamiento anterior)
+    - memoria: solo memoria del proceso (sin Redis; no compartido entre workers)
+    - dos_niveles: caché local + Redis con failover a memoria (por defecto)
+    """
+    if backend == "redis":
+        return RedisSessionStore()
+    if backend == "memoria":
+        return MemorySessionStore(max_entradas=settings.SESSION_CACHE_LOCAL_MAX)
+    if backend == "dos_niveles":
+        return TwoTierSessionStore(
+            RedisSessionStore(),
+            MemorySessionStore(max_entradas=settings.SESSION_CACHE_LOCAL_MAX),
+            CircuitBreaker(settings.SESSION_BREAKER_FALLOS, settings.SESSION_BREAKER_ESPERA),
+            ttl_local=settings.SESSION_CACHE_LOCAL_TTL
+        )
+    raise ValueError(f"SESSION_BACKEND desconocido: {backend}")
 
 # Instancia global
-session_store = RedisSessionStore()
+session_store = crear_session_store()
@@ -0,0 +1,333 @@
+"""
+Cola persistente de SMS salientes con pool de workers
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, func, update
+from sqlalchemy.orm import Session
+from backend.config.database import SessionLocal
+from backend.config.settings import settings
+from backend.models import Verificacion, SmsCola
+from backend.services.sms_service import SMSService
+from backend.services.saldo_service import saldo_cache
+from backend.services.estadisticas_service import EstadisticasService
+
+logger = logging.getLogger(__name__)
+
+
+# Resultado de registrar_fallo cuando otro worker ya tomó el SMS
+LEASE_PERDIDO = "lease_perdido"
+
+
+def duracion_lease() -> float:
+    """
+    Segundos que un worker retiene un SMS tomado
+
+    Nunca menos que varias veces el peor caso de un envío (timeout del
+    proveedor + consulta de saldo): si el lease vence con el envío en
+    vuelo, otro worker lo toma y el SMS pago sale dos veces.
+    """
+    minimo = 3 * (settings.SMS_HTTP_TIMEOUT + settings.SMS_SALDO_TIMEOUT)
+    return max(settings.SMS_COLA_LEASE_SEGUNDOS, minimo)
+
+
+class SMSColaService:
+    """Operaciones de base de datos sobre la cola de SMS"""
+
+    @staticmethod
+    def calcular_backoff(intentos: int) -> float:
+        """
+        Espera exponencial con jitter antes del próximo intento
+
+        Args:
+            intentos: Intentos realizados hasta ahora (>= 1)
+
+        Returns:
+            Segundos a esperar
+        """
+        espera = min(
+            settings.SMS_COLA_BACKOFF_BASE * (2 ** (intentos - 1)),
+            settings.SMS_COLA_BACKOFF_MAX
+        )
+        # Jitter: evita que todos los reintentos caigan juntos sobre el proveedor
+        return espera / 2 + random.uniform(0, espera / 2)
+
+    @staticmethod
+    def encolar(
+        db: Session,
+        person_id: str,
+        phone_number: str,
+        merchant_code: str,
+        verification_code: str,
+        usuario_id: int,
+        texto: str
+    ) -> Verificacion:
+        """
+        Registra la verificación como "encolado" y agrega el SMS a la cola
+        en una sola transacción
+        """
+        verificacion = SMSService.crear_verificacion(
+            db=db,
+            person_id=person_id,
+            phone_number=phone_number,
+            merchant_code=merchant_code,
+            verification_code=verification_code,
+            usuario_id=usuario_id,
+            estado="encolado"
+        )
+        db.flush()  # Obtener verificacion.id
+
+        db.add(SmsCola(
+            verificacion_id=verificacion.id,
+            phone_number=phone_number,
+            texto=texto
+        ))
+        db.commit()
+        db.refresh(verificacion)
+
+        return verificacion
+
+    @staticmethod
+    def _condicion_disponible(ahora: datetime):
+        """Pendientes cuyo backoff venció, o tomados por un worker caído"""
+        return or_(
+            and_(SmsCola.estado == "pendiente", SmsCola.proximo_intento <= ahora),
+            and_(SmsCola.estado == "procesando", SmsCola.bloqueado_hasta < ahora)
+        )
+
+    @staticmethod
+    def reclamar(db: Session) -> Optional[Dict[str, Any]]:
+        """
+        Toma el próximo SMS disponible de forma atómica
+
+        El UPDATE condicional garantiza que dos workers (o dos procesos) no
+        tomen el mismo SMS: solo uno ve rowcount == 1.
+
+        Returns:
+            Datos del SMS tomado, o None si la cola está vacía
+        """
+        ahora = datetime.now()
+        candidatos = db.query(SmsCola.id).filter(
+            SMSColaService._condicion_disponible(ahora)
+        ).order_by(SmsCola.proximo_intento).limit(5).all()
+
+        for (job_id,) in candidatos:
+            resultado = db.execute(
+                update(SmsCola)
+                .where(SmsCola.id == job_id, SMSColaService._condicion_disponible(ahora))
+                .values(
+                    estado="procesando",
+                    intentos=SmsCola.intentos + 1,
+                    bloqueado_hasta=ahora + timedelta(seconds=duracion_lease())
+                )
+            )
+            db.commit()
+
+            if resultado.rowcount == 1:
+                job = db.query(SmsCola).filter(SmsCola.id == job_id).first()
+                return {
+                    "id": job.id,
+                    "verificacion_id": job.verificacion_id,
+                    "phone_number": job.phone_number,
+                    "texto": job.texto,
+                    "intentos": job.intentos
+                }
+
+        return None
+
+    @staticmethod
+    def _condicion_lease(job: Dict[str, Any]):
+        """
+        El worker sigue siendo dueño del SMS: en proceso y sin que otro lo
+        haya reclamado (cada toma suma un intento)
+
+        No mira `bloqueado_hasta`: un envío que terminó con el lease vencido
+        pero sin que nadie lo reclamara tiene que completarse, si no la
+        próxima toma lo volvería a enviar (y a cobrar).
+        """
+        return and_(
+            SmsCola.id == job["id"],
+            SmsCola.estado == "procesando",
+            SmsCola.intentos == job["intentos"]
+        )
+
+    @staticmethod
+    def completar(db: Session, job: Dict[str, Any], estado_final: str) -> bool:
+        """
+        Marca la verificación como enviada y saca el SMS de la cola
+
+        Returns:
+            False si el lease se perdió (no se toca nada)
+        """
+        borrados = db.query(SmsCola).filter(
+            SMSColaService._condicion_lease(job)
+        ).delete(synchronize_session=False)
+        if borrados == 0:
+            db.rollback()
+            return False
+
+        verificacion = db.query(Verificacion).filter(Verificacion.id == job["verificacion_id"]).first()
+        if verificacion:
+            EstadisticasService.cambiar_estado(db, verificacion, estado_final)
+            verificacion.error_mensaje = None
+
+        db.commit()
+        return True
+
+    @staticmethod
+    def registrar_fallo(db: Session, job: Dict[str, Any], error: str) -> str:
+        """
+        Programa un reintento con backoff o pasa el SMS a dead-letter
+
+        Returns:
+            Nuevo estado de la verificación ("reintentando" o "fallido"),
+            o LEASE_PERDIDO si otro worker ya tomó el SMS (no se toca nada)
+        """
+        if job["intentos"] >= settings.SMS_COLA_MAX_INTENTOS:
+            # 💀 Dead-letter: queda en la tabla para inspección/reintento manual
+            estado = "fallido"
+            valores = {"estado": "dead", "bloqueado_hasta": None, "ultimo_error": error}
+        else:
+            estado = "reintentando"
+            valores = {
+                "estado": "pendiente",
+                "bloqueado_hasta": None,
+                "ultimo_error": error,
+                "proximo_intento": datetime.now() + timedelta(
+                    seconds=SMSColaService.calcular_backoff(job["intentos"])
+                )
+            }
+
+        resultado = db.execute(
+            update(SmsCola).where(SMSColaService._condicion_lease(job)).values(**valores)
+        )
+        if resultado.rowcount == 0:
+            db.rollback()
+            return LEASE_PERDIDO
+
+        verificacion = db.query(Verificacion).filter(Verificacion.id == job["verificacion_id"]).first()
+        if verificacion:
+            EstadisticasService.cambiar_estado(db, verificacion, estado)
+            verificacion.error_mensaje = error
+
+        db.commit()
+        return estado
+
+    @staticmethod
+    def reintentar(db: Session, job_id: int) -> bool:
+        """Devuelve un SMS en dead-letter a la cola (reintento manual)"""
+        entrada = db.query(SmsCola).filter(SmsCola.id == job_id, SmsCola.estado == "dead").first()
+        if not entrada:
+            return False
+
+        entrada.estado = "pendiente"
+        entrada.intentos = 0
+        entrada.proximo_intento = datetime.now()
+        EstadisticasService.cambiar_estado(db, entrada.verificacion, "encolado")
+        db.commit()
+        return True
+
+    @staticmethod
+    def resumen(db: Session) -> Dict[str, int]:
+        """Cantidad de SMS en la cola por estado"""
+        filas = db.query(SmsCola.estado, func.count(SmsCola.id)).group_by(SmsCola.estado).all()
+        return {estado: total for estado, total in filas}
+
+    @staticmethod
+    def get_dead_letters(db: Session, limit: int = 100) -> List[SmsCola]:
+        """SMS que agotaron los reintentos"""
+        return db.query(SmsCola).filter(
+            SmsCola.estado == "dead"
+        ).order_by(SmsCola.fecha_creacion.desc()).limit(limit).all()
+
+
+def _con_sesion(funcion, *args, **kwargs):
+    """Ejecuta una operación de la cola con su propia sesión de DB"""
+    db = SessionLocal()
+    try:
+        return funcion(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class SMSColaWorkers:
+    """
+    Pool de workers asíncronos que drenan la cola de SMS
+
+    Cada worker procesa un SMS a la vez, por lo que la concurrencia hacia el
+    proveedor queda acotada por la cantidad de workers. Las operaciones de DB
+    corren en el threadpool; el envío usa el cliente httpx compartido.
+    """
+
+    def __init__(self, cantidad: int):
+        self.cantidad = cantidad
+        self._tareas: List[asyncio.Task] = []
+        self._hay_trabajo: Optional[asyncio.Event] = None
+
+    def despertar(self):
+        """Avisar a los workers inactivos que hay un SMS nuevo"""
+        if self._hay_trabajo is not None:
+            self._hay_trabajo.set()
+
+    async def _procesar(self, job: Dict[str, Any]):
+        resultado = await SMSService.enviar_sms_async(job["phone_number"], job["texto"])
+
+        if resultado["ok"]:
+            if settings.SMS_MODO_SIMULADO:
+                estado_final = "test"
+            else:
+                estado_final = "enviado"
+                saldo_cache.decrementar()
+            if not await run_in_threadpool(_con_sesion, SMSColaService.completar, job, estado_final):
+                logger.error(f"❌ SMS {job['id']} enviado con el lease vencido: otro worker puede reenviarlo")
+            return
+
+        error = str(resultado.get("mensaje", "Error desconocido"))
+        estado = await run_in_threadpool(_con_sesion, SMSColaService.registrar_fallo, job, error)
+        logger.warning(f"⚠️ SMS {job['id']} falló (intento {job['intentos']}): {error} → {estado}")
+
+    async def _worker(self, numero: int):
+        while True:
+            try:
+                job = await run_in_threadpool(_con_sesion, SMSColaService.reclamar)
+            except Exception as e:
+                logger.error(f"❌ Worker {numero}: error leyendo la cola: {e}")
+                job = None
+
+            if job is None:
+                # Cola vacía: esperar un SMS nuevo o el próximo sondeo
+                self._hay_trabajo.clear()
+                try:
+                    await asyncio.wait_for(self._hay_trabajo.wait(), settings.SMS_COLA_POLL_INTERVALO)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._procesar(job)
+            except Exception as e:
+                # El lease vence y otro worker lo vuelve a tomar
+                logger.error(f"❌ Worker {numero}: error procesando SMS {job['id']}: {e}")
+
+    def iniciar(self):
+        """Iniciar workers (lifespan de la app)"""
+        if self.cantidad <= 0 or self._tareas:
+            return
+        self._hay_trabajo = asyncio.Event()
+        self._tareas = [asyncio.create_task(self._worker(i)) for i in range(self.cantidad)]
+        logger.info(f"📬 Cola de SMS: {self.cantidad} workers iniciados")
+
+    async def detener(self):
+        """Detener workers; los SMS tomados se liberan al vencer el lease"""
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+
+# Instancia global
+sms_cola_workers = SMSColaWorkers(cantidad=settings.SMS_COLA_WORKERS)
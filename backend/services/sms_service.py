@@ -1,13 +1,45 @@
 """Servicio de envío y gestión de SMS"""
+import asyncio
+import base64
+import json
+import time
 import requests
+import httpx
 import random
 import unicodedata
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, insert
 from typing import Dict, List, Optional, Tuple
-from backend.models import Verificacion, Usuario
+from backend.models import Verificacion, VerificacionDiaria, Usuario
 from backend.config.settings import settings
+from backend.services.http_client import get_http_client
+from backend.services.estadisticas_service import EstadisticasService
+from backend.services.sucursal_cache import sucursal_cache
+
+
+# Granularidades soportadas por SMSService.histograma
+BUCKETS_HISTOGRAMA = ("hora", "dia", "semana", "mes")
+
+
+# Caché de totales del panel: filtros -> (timestamp, total)
+_conteo_cache: Dict[Tuple, Tuple[float, int]] = {}
+_CONTEO_CACHE_MAX = 500
+
+
+# Errores conocidos en el cuerpo de respuesta de SMS Masivos
+ERRORES_CONOCIDOS = [
+    "error",
+    "credito insuficiente",
+    "creditos agotados",
+    "sin credito",
+    "apikey invalida",
+    "apikey incorrecta",
+    "no autorizado",
+    "unauthorized",
+    "failed",
+    "fallo"
+]
 
 
 class SMSService:
@@ -29,8 +61,86 @@ class SMSService:
     
     @staticmethod
     def get_nombre_sucursal(codigo: str) -> str:
-        """Obtiene el nombre de la sucursal por su código"""
-        return settings.SUCURSALES.get(codigo, f"Sucursal {codigo}")
+        """Obtiene el nombre de la sucursal por su código (desde la caché de la tabla)"""
+        return sucursal_cache.nombre(codigo)
+    
+    @staticmethod
+    async def aget_nombre_sucursal(codigo: str) -> str:
+        """get_nombre_sucursal() para rutas async (si hay que releer la tabla, fuera del event loop)"""
+        return await sucursal_cache.anombre(codigo)
+    
+    @staticmethod
+    def construir_mensaje(
+        merchant_code: str,
+        person_id: str,
+        verification_code: str,
+        merchant_name: Optional[str] = None
+    ) -> str:
+        """Arma el texto del SMS de verificación"""
+        merchant_name = merchant_name or SMSService.get_nombre_sucursal(merchant_code)
+        return f"{merchant_code} - {merchant_name} - DNI: {person_id} - Su Codigo es: {verification_code}"
+    
+    @staticmethod
+    def _payload_envio(phone_number: str, mensaje_limpio: str) -> Dict:
+        """Parámetros según documentación de SMS Masivos: APIKEY, TOS, TEXTO"""
+        return {
+            "APIKEY": settings.SMS_API_KEY,
+            "TOS": phone_number,
+            "TEXTO": mensaje_limpio
+        }
+    
+    @staticmethod
+    def _simular_envio(phone_number: str, mensaje_limpio: str) -> Dict:
+        """Resultado de envío en modo simulado (desarrollo/testing)"""
+        print(f"\n📱 MODO SIMULADO - SMS a {phone_number}:")
+        print(f"📝 Mensaje: {mensaje_limpio}")
+        return {
+            "ok": True,
+            "mensaje": "SMS simulado enviado correctamente",
+            "detalles": f"📱 {phone_number}: {mensaje_limpio}"
+        }
+    
+    @staticmethod
+    def _interpretar_respuesta(status_code: int, texto: str) -> Dict:
+        """
+        Interpreta la respuesta HTTP de la API de SMS Masivos
+        
+        Args:
+            status_code: Código HTTP de la respuesta
+            texto: Cuerpo de la respuesta
+            
+        Returns:
+            Dict con el resultado del envío
+        """
+        print(f"✅ Respuesta HTTP {status_code}")
+        print(f"📄 Contenido: {texto}")
+        
+        # Verificar status code
+        if status_code != 200:
+            return {
+                "ok": False,
+                "mensaje": f"Error HTTP {status_code}",
+                "detalles": texto
+            }
+        
+        # Verificar contenido de la respuesta
+        respuesta_texto = texto.strip().lower()
+        
+        # Si la respuesta contiene algún error conocido
+        for error in ERRORES_CONOCIDOS:
+            if error in respuesta_texto:
+                return {
+                    "ok": False,
+                    "mensaje": "Error al enviar SMS",
+                    "detalles": texto
+                }
+        
+        # Si llegamos aquí, el SMS se envió correctamente
+        return {
+            "ok": True,
+            "mensaje": "SMS enviado exitosamente",
+            "detalles": texto
+        }
     
     @staticmethod
     def enviar_sms(
@@ -39,7 +149,7 @@ class SMSService:
         modo_simulado: Optional[bool] = None
     ) -> Dict:
         """
-        Envía un SMS a través de la API
+        Envía un SMS a través de la API (bloqueante, para scripts)
         
         Args:
             phone_number: Número de teléfono destino
@@ -57,68 +167,16 @@ class SMSService:
         
         # Modo simulado para desarrollo/testing
         if modo_simulado:
-            print(f"\n📱 MODO SIMULADO - SMS a {phone_number}:")
-            print(f"📝 Mensaje: {mensaje_limpio}")
-            return {
-                "ok": True,
-                "mensaje": "SMS simulado enviado correctamente",
-                "detalles": f"📱 {phone_number}: {mensaje_limpio}"
-            }
+            return SMSService._simular_envio(phone_number, mensaje_limpio)
         
         # Envío real a la API
         try:
-            # Parámetros correctos según documentación: APIKEY, TOS, TEXTO
-            data = {
-                "APIKEY": settings.SMS_API_KEY,
-                "TOS": phone_number,
-                "TEXTO": mensaje_limpio
-            }
-            
-            response = requests.post(settings.SMS_API_URL, data=data, timeout=10)
-            
-            print(f"✅ Respuesta HTTP {response.status_code}")
-            print(f"📄 Contenido: {response.text}")
-            
-            # Verificar status code
-            if response.status_code != 200:
-                return {
-                    "ok": False,
-                    "mensaje": f"Error HTTP {response.status_code}",
-                    "detalles": response.text
-                }
-            
-            # Verificar contenido de la respuesta
-            respuesta_texto = response.text.strip().lower()
-            
-            # Detectar errores comunes en la respuesta
-            errores_conocidos = [
-                "error",
-                "credito insuficiente",
-                "creditos agotados",
-                "sin credito",
-                "apikey invalida",
-                "apikey incorrecta",
-                "no autorizado",
-                "unauthorized",
-                "failed",
-                "fallo"
-            ]
-            
-            # Si la respuesta contiene algún error conocido
-            for error in errores_conocidos:
-                if error in respuesta_texto:
-                    return {
-                        "ok": False,
-                        "mensaje": "Error al enviar SMS",
-                        "detalles": response.text
-                    }
-            
-            # Si llegamos aquí, el SMS se envió correctamente
-            return {
-                "ok": True,
-                "mensaje": "SMS enviado exitosamente",
-                "detalles": response.text
-            }
+            response = requests.post(
+                settings.SMS_API_URL,
+                data=SMSService._payload_envio(phone_number, mensaje_limpio),
+                timeout=settings.SMS_HTTP_TIMEOUT
+            )
+            return SMSService._interpretar_respuesta(response.status_code, response.text)
         
         except requests.RequestException as e:
             return {
@@ -128,7 +186,120 @@ class SMSService:
             }
     
     @staticmethod
-    def registrar_verificacion(
+    async def enviar_sms_async(
+        phone_number: str,
+        mensaje: str,
+        modo_simulado: Optional[bool] = None
+    ) -> Dict:
+        """
+        Envía un SMS a través de la API sin bloquear el event loop
+        
+        Usa el cliente httpx compartido (pool de conexiones keep-alive),
+        por lo que un SMS en vuelo no retiene un worker del threadpool.
+        
+        Args:
+            phone_number: Número de teléfono destino
+            mensaje: Texto del mensaje
+            modo_simulado: Si es True, simula el envío sin llamar a la API
+            
+        Returns:
+            Dict con el resultado del envío
+        """
+        if modo_simulado is None:
+            modo_simulado = settings.SMS_MODO_SIMULADO
+        
+        mensaje_limpio = SMSService.normalizar_texto(mensaje)
+        
+        if modo_simulado:
+            return SMSService._simular_envio(phone_number, mensaje_limpio)
+        
+        try:
+            response = await get_http_client().post(
+                settings.SMS_API_URL,
+                data=SMSService._payload_envio(phone_number, mensaje_limpio),
+                timeout=settings.SMS_HTTP_TIMEOUT
+            )
+            return SMSService._interpretar_respuesta(response.status_code, response.text)
+        
+        except httpx.HTTPError as e:
+            return {
+                "ok": False,
+                "mensaje": "Error al conectar con API SMS",
+                "detalles": str(e) or type(e).__name__
+            }
+    
+    @staticmethod
+    async def enviar_lote(
+        destinos: List[Tuple[str, str]],
+        modo_simulado: Optional[bool] = None
+    ) -> List[Dict]:
+        """
+        Envía muchos SMS agrupando destinatarios por llamada al proveedor
+        
+        Los destinos con el mismo texto (ej: una campaña) viajan juntos en el
+        parámetro TOS, en tandas de hasta SMS_LOTE_TAMANO números. Los textos
+        distintos (ej: códigos individuales) se envían en llamadas separadas,
+        con a lo sumo SMS_LOTE_CONCURRENCIA llamadas en vuelo.
+        
+        Args:
+            destinos: Lista de (número de teléfono, mensaje)
+            modo_simulado: Si es True, simula el envío sin llamar a la API
+            
+        Returns:
+            Resultado de envío de cada destino, en el mismo orden
+        """
+        # Agrupar índices por texto normalizado
+        por_texto: Dict[str, List[int]] = {}
+        for i, (_, mensaje) in enumerate(destinos):
+            por_texto.setdefault(SMSService.normalizar_texto(mensaje), []).append(i)
+        
+        tandas = []
+        for mensaje, indices in por_texto.items():
+            for inicio in range(0, len(indices), settings.SMS_LOTE_TAMANO):
+                tandas.append((mensaje, indices[inicio:inicio + settings.SMS_LOTE_TAMANO]))
+        
+        resultados: List[Optional[Dict]] = [None] * len(destinos)
+        semaforo = asyncio.Semaphore(settings.SMS_LOTE_CONCURRENCIA)
+        
+        async def enviar_tanda(mensaje: str, indices: List[int]):
+            numeros = ",".join(destinos[i][0] for i in indices)
+            async with semaforo:
+                resultado = await SMSService.enviar_sms_async(numeros, mensaje, modo_simulado)
+            # El proveedor responde una vez por llamada: aplica a toda la tanda
+            for i in indices:
+                resultados[i] = resultado
+        
+        await asyncio.gather(*(enviar_tanda(mensaje, indices) for mensaje, indices in tandas))
+        return resultados
+    
+    @staticmethod
+    async def consultar_saldo_async() -> Optional[int]:
+        """
+        Consulta el saldo de SMS disponibles en SMS Masivos
+        
+        Returns:
+            Cantidad de SMS disponibles, o None si la respuesta no es un número
+            
+        Raises:
+            httpx.HTTPError si falla la conexión o el proveedor responde con error
+        """
+        response = await get_http_client().get(
+            settings.SMS_SALDO_URL,
+            params={"apikey": settings.SMS_API_KEY},
+            timeout=settings.SMS_SALDO_TIMEOUT
+        )
+        response.raise_for_status()
+        
+        texto_respuesta = response.text.strip()
+        try:
+            return int(texto_respuesta)
+        except ValueError:
+            # Si no es un número, es un mensaje de error del proveedor
+            print(f"⚠️ Respuesta de API saldo: {texto_respuesta}")
+            return None
+    
+    @staticmethod
+    def crear_verificacion(
         db: Session,
         person_id: str,
         phone_number: str,
@@ -138,7 +309,7 @@ class SMSService:
         estado: str = "enviado",
         error_mensaje: Optional[str] = None
     ) -> Verificacion:
-        """Registra una verificación SMS en la base de datos"""
+        """Agrega una verificación a la sesión sin hacer commit"""
         merchant_name = SMSService.get_nombre_sucursal(merchant_code)
         
         verificacion = Verificacion(
@@ -147,33 +318,90 @@ class SMSService:
             merchant_code=merchant_code,
             merchant_name=merchant_name,
             verification_code=verification_code,
+            fecha=datetime.now(),
             usuario_id=usuario_id,
             estado=estado,
             error_mensaje=error_mensaje
         )
         
         db.add(verificacion)
+        
+        # 📊 Mantener estadísticas diarias en la misma transacción
+        EstadisticasService.registrar(db, verificacion.fecha, merchant_code, usuario_id, estado)
+        return verificacion
+    
+    @staticmethod
+    def registrar_verificacion(
+        db: Session,
+        person_id: str,
+        phone_number: str,
+        merchant_code: str,
+        verification_code: str,
+        usuario_id: int,
+        estado: str = "enviado",
+        error_mensaje: Optional[str] = None
+    ) -> Verificacion:
+        """Registra una verificación SMS en la base de datos"""
+        verificacion = SMSService.crear_verificacion(
+            db=db,
+            person_id=person_id,
+            phone_number=phone_number,
+            merchant_code=merchant_code,
+            verification_code=verification_code,
+            usuario_id=usuario_id,
+            estado=estado,
+            error_mensaje=error_mensaje
+        )
+        
         db.commit()
         db.refresh(verificacion)
         
         return verificacion
     
     @staticmethod
-    def get_verificaciones(
+    def registrar_verificaciones_lote(db: Session, filas: List[Dict]) -> int:
+        """
+        Registra muchas verificaciones con un único INSERT y un solo commit
+        
+        Args:
+            filas: Dicts con person_id, phone_number, merchant_code,
+                   verification_code, usuario_id, estado y error_mensaje
+            
+        Returns:
+            Cantidad de verificaciones registradas
+        """
+        if not filas:
+            return 0
+        
+        ahora = datetime.now()
+        filas = [
+            {
+                **fila,
+                "merchant_name": SMSService.get_nombre_sucursal(fila["merchant_code"]),
+                "fecha": ahora
+            }
+            for fila in filas
+        ]
+        db.execute(insert(Verificacion), filas)
+        EstadisticasService.registrar_lote(db, filas)
+        db.commit()
+        
+        return len(filas)
+    
+    @staticmethod
+    def query_verificaciones(
         db: Session,
         usuario_id: Optional[int] = None,
         sucursal: Optional[str] = None,
         fecha_inicio: Optional[datetime] = None,
         fecha_fin: Optional[datetime] = None,
-        estado: Optional[str] = None,
-        skip: int = 0,
-        limit: int = 100
-    ) -> Tuple[List[Verificacion], int]:
+        estado: Optional[str] = None
+    ):
         """
-        Obtiene verificaciones con filtros y paginación
+        Consulta de verificaciones con los filtros del panel (sin ordenar ni paginar)
         
-        Returns:
-            Tupla de (lista de verificaciones, total)
+        Cada filtro tiene un índice compuesto terminado en `fecha`
+        (ver backend/migrations/m0001_indices_verificaciones.py).
         """
         query = db.query(Verificacion)
         
@@ -185,20 +413,171 @@ class SMSService:
         if sucursal:
             query = query.filter(Verificacion.merchant_code == sucursal)
         
+        # Filtrar por estado
+        if estado:
+            query = query.filter(Verificacion.estado == estado)
+        
         # Filtrar por rango de fechas
         if fecha_inicio:
             query = query.filter(Verificacion.fecha >= fecha_inicio)
         if fecha_fin:
             query = query.filter(Verificacion.fecha <= fecha_fin)
         
-        # Obtener total
-        total = query.count()
+        return query
+    
+    @staticmethod
+    def get_verificaciones(
+        db: Session,
+        usuario_id: Optional[int] = None,
+        sucursal: Optional[str] = None,
+        fecha_inicio: Optional[datetime] = None,
+        fecha_fin: Optional[datetime] = None,
+        estado: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Verificacion], int]:
+        """
+        Obtiene verificaciones con filtros y paginación
+        
+        Returns:
+            Tupla de (lista de verificaciones, total)
+        """
+        filtros = {
+            "usuario_id": usuario_id,
+            "sucursal": sucursal,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+            "estado": estado
+        }
+        query = SMSService.query_verificaciones(db, **filtros)
+        
+        # Obtener total (caché con TTL corto)
+        total = SMSService.contar_verificaciones(db, **filtros)
         
         # Ordenar y paginar
-        verificaciones = query.order_by(Verificacion.fecha.desc()).offset(skip).limit(limit).all()
+        verificaciones = query.order_by(Verificacion.fecha.desc(), Verificacion.id.desc()).offset(skip).limit(limit).all()
         
         return verificaciones, total
     
+    @staticmethod
+    def contar_verificaciones(db: Session, **filtros) -> int:
+        """
+        Total de verificaciones para los filtros del panel
+        
+        El resultado se reutiliza durante CONTEO_CACHE_TTL segundos, así
+        paginar o refrescar no vuelve a contar toda la selección.
+        """
+        clave = tuple(sorted((k, str(v)) for k, v in filtros.items() if v is not None))
+        ahora = time.monotonic()
+        
+        en_cache = _conteo_cache.get(clave)
+        if en_cache and ahora - en_cache[0] < settings.CONTEO_CACHE_TTL:
+            return en_cache[1]
+        
+        total = SMSService.query_verificaciones(db, **filtros).count()
+        
+        if len(_conteo_cache) >= _CONTEO_CACHE_MAX:
+            _conteo_cache.clear()
+        _conteo_cache[clave] = (ahora, total)
+        return total
+    
+    @staticmethod
+    def codificar_cursor(fecha: datetime, id: int, direccion: str) -> str:
+        """Cursor opaco para paginar por (fecha, id)"""
+        datos = json.dumps({"f": fecha.isoformat(), "i": id, "d": direccion}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decodificar_cursor(cursor: str) -> Tuple[datetime, int, str]:
+        """
+        Returns:
+            Tupla (fecha, id, dirección)
+            
+        Raises:
+            ValueError si el cursor es inválido
+        """
+        try:
+            relleno = "=" * (-len(cursor) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            direccion = datos["d"]
+            if direccion not in ("next", "prev"):
+                raise ValueError(direccion)
+            return datetime.fromisoformat(datos["f"]), int(datos["i"]), direccion
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    @staticmethod
+    def get_verificaciones_cursor(
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        **filtros
+    ) -> Tuple[List[Verificacion], Optional[str], Optional[str]]:
+        """
+        Página de verificaciones ordenadas por (fecha, id) descendente (keyset)
+        
+        A diferencia de OFFSET, el costo de cada página no crece con la
+        profundidad: el motor entra al índice directamente en la posición
+        del cursor.
+        
+        Args:
+            cursor: `next_cursor` o `prev_cursor` de una página anterior (None = primera)
+            limit: Registros por página
+            filtros: usuario_id, sucursal, fecha_inicio, fecha_fin, estado
+            
+        Returns:
+            Tupla (verificaciones, next_cursor, prev_cursor)
+            
+        Raises:
+            ValueError si el cursor es inválido
+        """
+        query = SMSService.query_verificaciones(db, **filtros)
+        direccion = "next"
+        
+        if cursor:
+            fecha, id_cursor, direccion = SMSService.decodificar_cursor(cursor)
+            if direccion == "next":
+                # fecha <= x permite usar los índices (…, fecha); id desempata
+                query = query.filter(
+                    Verificacion.fecha <= fecha,
+                    or_(Verificacion.fecha < fecha, Verificacion.id < id_cursor)
+                )
+            else:
+                query = query.filter(
+                    Verificacion.fecha >= fecha,
+                    or_(Verificacion.fecha > fecha, Verificacion.id > id_cursor)
+                )
+        
+        if direccion == "next":
+            orden = (Verificacion.fecha.desc(), Verificacion.id.desc())
+        else:
+            orden = (Verificacion.fecha.asc(), Verificacion.id.asc())
+        
+        # Un registro extra indica si hay más páginas en esa dirección
+        filas = query.order_by(*orden).limit(limit + 1).all()
+        hay_mas = len(filas) > limit
+        filas = filas[:limit]
+        
+        if direccion == "prev":
+            filas.reverse()
+        
+        if not filas:
+            return [], None, None
+        
+        primero, ultimo = filas[0], filas[-1]
+        if direccion == "next":
+            siguiente = hay_mas
+            anterior = cursor is not None
+        else:
+            siguiente = True
+            anterior = hay_mas
+        
+        return (
+            filas,
+            SMSService.codificar_cursor(ultimo.fecha, ultimo.id, "next") if siguiente else None,
+            SMSService.codificar_cursor(primero.fecha, primero.id, "prev") if anterior else None
+        )
+    
     @staticmethod
     def get_estadisticas(db: Session, usuario_id: Optional[int] = None) -> Dict:
         """
@@ -211,22 +590,121 @@ class SMSService:
         Returns:
             Dict con estadísticas
         """
-        query = db.query(Verificacion)
+        # 📊 Desde el rollup diario (no escanea verificaciones)
+        return {
+            "total_sms": EstadisticasService.total(db, usuario_id=usuario_id),
+            "sms_hoy": EstadisticasService.total(db, desde=datetime.now().date(), usuario_id=usuario_id)
+        }
+    
+    # ========================================
+    # 📈 HISTOGRAMAS POR INTERVALO DE TIEMPO
+    # ========================================
+    
+    @staticmethod
+    def truncar_fecha(fecha: datetime, bucket: str) -> datetime:
+        """Inicio del intervalo (hora, día, semana desde el lunes o mes) que contiene a `fecha`"""
+        if bucket == "hora":
+            return fecha.replace(minute=0, second=0, microsecond=0)
+        inicio = datetime(fecha.year, fecha.month, fecha.day)
+        if bucket == "semana":
+            return inicio - timedelta(days=inicio.weekday())
+        if bucket == "mes":
+            return inicio.replace(day=1)
+        return inicio
+    
+    @staticmethod
+    def _siguiente_bucket(inicio: datetime, bucket: str) -> datetime:
+        if bucket == "hora":
+            return inicio + timedelta(hours=1)
+        if bucket == "dia":
+            return inicio + timedelta(days=1)
+        if bucket == "semana":
+            return inicio + timedelta(weeks=1)
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    
+    @staticmethod
+    def _expresion_bucket(columna, bucket: str, dialecto: str):
+        """Expresión SQL que lleva `columna` al inicio de su intervalo"""
+        if dialecto == "postgresql":
+            unidad = {"hora": "hour", "dia": "day", "semana": "week", "mes": "month"}[bucket]
+            return func.date_trunc(unidad, columna)
+        
+        # SQLite (y motores con funciones de fecha compatibles)
+        if bucket == "hora":
+            return func.strftime("%Y-%m-%d %H:00:00", columna)
+        if bucket == "semana":
+            # Próximo domingo (o el mismo día) menos 6 días = lunes de esa semana
+            return func.date(columna, "weekday 0", "-6 days")
+        if bucket == "mes":
+            return func.strftime("%Y-%m-01", columna)
+        return func.date(columna)
+    
+    @staticmethod
+    def histograma(
+        db: Session,
+        bucket: str,
+        desde: datetime,
+        hasta: datetime,
+        sucursal: Optional[str] = None,
+        usuario_id: Optional[int] = None,
+        estados: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Cantidad de verificaciones por intervalo, con una sola consulta agrupada
+        
+        Los intervalos de día, semana y mes se calculan sobre el rollup
+        `verificaciones_diarias`; los de hora sobre `verificaciones`.
+        
+        Args:
+            bucket: "hora", "dia", "semana" o "mes"
+            desde: Fecha/hora incluida en el primer intervalo
+            hasta: Fecha/hora incluida en el último intervalo
+            sucursal, usuario_id, estados: Filtros opcionales
+            
+        Returns:
+            Lista densa (intervalos sin datos en 0) de {"inicio": datetime, "total": int}
+        """
+        if bucket not in BUCKETS_HISTOGRAMA:
+            raise ValueError(f"Bucket inválido: {bucket}")
         
+        primero = SMSService.truncar_fecha(desde, bucket)
+        limite = SMSService._siguiente_bucket(SMSService.truncar_fecha(hasta, bucket), bucket)
+        dialecto = db.get_bind().dialect.name
+        
+        if bucket == "hora":
+            tabla, conteo = Verificacion, func.count(Verificacion.id)
+            query_desde, query_hasta = primero, limite
+            columna_usuario, columna_sucursal = Verificacion.usuario_id, Verificacion.merchant_code
+        else:
+            tabla, conteo = VerificacionDiaria, func.sum(VerificacionDiaria.total)
+            query_desde, query_hasta = primero.date(), limite.date()
+            columna_usuario, columna_sucursal = VerificacionDiaria.usuario_id, VerificacionDiaria.merchant_code
+        
+        intervalo = SMSService._expresion_bucket(tabla.fecha, bucket, dialecto)
+        query = db.query(intervalo.label("inicio"), conteo.label("total")).filter(
+            tabla.fecha >= query_desde,
+            tabla.fecha < query_hasta
+        )
+        if sucursal:
+            query = query.filter(columna_sucursal == sucursal)
         if usuario_id:
-            query = query.filter(Verificacion.usuario_id == usuario_id)
+            query = query.filter(columna_usuario == usuario_id)
+        if estados:
+            query = query.filter(tabla.estado.in_(estados))
         
-        total = query.count()
+        totales = {}
+        for inicio, total in query.group_by(intervalo).all():
+            if isinstance(inicio, str):
+                inicio = datetime.fromisoformat(inicio)
+            elif not isinstance(inicio, datetime):
+                inicio = datetime(inicio.year, inicio.month, inicio.day)
+            totales[inicio.replace(tzinfo=None)] = int(total or 0)
         
-        # SMS de hoy (compatible con PostgreSQL)
-        hoy_inicio = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        hoy_fin = hoy_inicio + timedelta(days=1)
+        # Completar con ceros los intervalos sin datos
+        resultado = []
+        actual = primero
+        while actual < limite:
+            resultado.append({"inicio": actual, "total": totales.get(actual, 0)})
+            actual = SMSService._siguiente_bucket(actual, bucket)
         
-        # Aquí puedes agregar más métricas según necesites
-        return {
-            "total_sms": total,
-            "sms_hoy": query.filter(
-                Verificacion.fecha >= hoy_inicio,
-                Verificacion.fecha < hoy_fin
-            ).count()
-        }
+        return resultado
@@ -0,0 +1,136 @@
+"""
+Caché de sucursales
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+from fastapi.concurrency import run_in_threadpool
+from backend.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Listado:
+    """Snapshot de la tabla sucursales, listo para el envío y para /api/sucursales"""
+    nombres: Dict[str, str] = field(default_factory=dict)
+    cuerpo: bytes = b"[]"
+    etag: str = '"vacio"'
+    cargado: float = float("-inf")
+    generacion: int = -1
+
+
+class SucursalCache:
+    """
+    Caché en memoria de la tabla sucursales (código -> nombre)
+
+    - Se carga al arrancar y las rutas de /api/sucursales la invalidan al
+      crear, editar o eliminar: el envío de SMS no consulta la base.
+    - TTL: un cambio hecho desde otro proceso se ve a más tardar en
+      `ttl_seconds`; un código desconocido fuerza una recarga (como mucho
+      una cada `recarga_minima` segundos) por si la sucursal es nueva.
+    - El JSON y el ETag del listado se arman una vez por carga.
+    - Desde código async usar `anombre()`: si hay que releer la tabla, la
+      consulta corre en el threadpool y no bloquea el event loop.
+    """
+
+    def __init__(self, ttl_seconds: int, recarga_minima: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self.recarga_minima = recarga_minima
+        self._listado = _Listado()
+        self._generacion = 0  # Se incrementa al invalidar
+        self._lock = threading.Lock()
+
+    def cargar(self, db=None) -> _Listado:
+        """Lee la tabla (con una sesión propia si no se pasa) y reemplaza el snapshot"""
+        from backend.models import Sucursal
+        from backend.config.database import SessionLocal
+
+        generacion = self._generacion
+        propia = db is None
+        db = db or SessionLocal()
+        try:
+            filas = db.query(Sucursal.codigo, Sucursal.nombre).order_by(Sucursal.codigo).all()
+        except Exception as e:
+            # Sin base no se corta el envío: se sigue con lo que había
+            logger.error(f"❌ Error cargando sucursales: {e}")
+            filas = None
+        finally:
+            if propia:
+                db.close()
+
+        with self._lock:
+            if filas is None:
+                self._listado = _Listado(
+                    self._listado.nombres, self._listado.cuerpo, self._listado.etag,
+                    time.monotonic(), generacion
+                )
+                return self._listado
+
+            cuerpo = json.dumps(
+                [{"codigo": codigo, "nombre": nombre} for codigo, nombre in filas],
+                ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            # Si se invalidó durante la carga, la generación ya no coincide
+            # y se vuelve a leer en el próximo acceso
+            self._listado = _Listado(
+                nombres=dict(filas),
+                cuerpo=cuerpo,
+                etag=f'"{hashlib.sha1(cuerpo).hexdigest()[:16]}"',
+                cargado=time.monotonic(),
+                generacion=generacion
+            )
+            return self._listado
+
+    def _expirado(self, listado: _Listado) -> bool:
+        return listado.generacion != self._generacion or time.monotonic() - listado.cargado >= self.ttl_seconds
+
+    def _vigente(self) -> _Listado:
+        listado = self._listado
+        if self._expirado(listado):
+            return self.cargar()
+        return listado
+
+    def nombre(self, codigo: str) -> str:
+        """Nombre de la sucursal (con fallback "Sucursal <código>")"""
+        listado = self._vigente()
+        nombre = listado.nombres.get(codigo)
+        if nombre is None and time.monotonic() - listado.cargado >= self.recarga_minima:
+            nombre = self.cargar().nombres.get(codigo)
+        return nombre or f"Sucursal {codigo}"
+
+    async def anombre(self, codigo: str) -> str:
+        """nombre() sin bloquear el event loop: la recarga, si hace falta, va al threadpool"""
+        listado = self._listado
+        if not self._expirado(listado):
+            nombre = listado.nombres.get(codigo)
+            if nombre is not None:
+                return nombre
+            if time.monotonic() - listado.cargado < self.recarga_minima:
+                return f"Sucursal {codigo}"
+        return await run_in_threadpool(self.nombre, codigo)
+
+    def listado(self) -> Tuple[bytes, str]:
+        """
+        Returns:
+            Tupla (JSON de [{codigo, nombre}], ETag)
+        """
+        listado = self._vigente()
+        return listado.cuerpo, listado.etag
+
+    def invalidar(self):
+        """Descarta el snapshot (se relee en el próximo acceso)"""
+        with self._lock:
+            self._generacion += 1
+
+    def estado(self) -> Dict[str, int]:
+        """Estado de la caché (para diagnóstico)"""
+        return {"sucursales": len(self._listado.nombres), "ttl_seconds": self.ttl_seconds}
+
+
+# Instancia global
+sucursal_cache = SucursalCache(ttl_seconds=settings.SUCURSAL_CACHE_TTL)
@@ -1,9 +1,19 @@
 """Servicio de gestión de usuarios"""
+import threading
+from collections import OrderedDict
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from backend.models import Usuario
 from backend.core.security import hash_password
-from typing import List, Optional, Tuple
+from backend.services.estadisticas_service import EstadisticasService
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 🧠 Caché LRU id → nombre de usuario (listados del panel)
+# Se invalida desde las rutas que crean, editan o eliminan usuarios
+_nombres_cache: "OrderedDict[int, str]" = OrderedDict()
+_NOMBRES_CACHE_MAX = 5000
+_nombres_lock = threading.Lock()
 
 
 class UserService:
@@ -19,6 +29,49 @@ class UserService:
         """Obtiene un usuario por su ID"""
         return db.query(Usuario).filter(Usuario.id == user_id).first()
     
+    @staticmethod
+    def get_nombres(db: Session, ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Resuelve id → nombre de usuario para los ids pedidos
+
+        Los que ya están en caché no consultan la base; el resto se trae
+        en una sola consulta (solo id y usuario) y se agrega a la caché.
+        """
+        nombres = {}
+        faltantes = set()
+        with _nombres_lock:
+            for user_id in set(ids):
+                if user_id is None:
+                    continue
+                if user_id in _nombres_cache:
+                    _nombres_cache.move_to_end(user_id)
+                    nombres[user_id] = _nombres_cache[user_id]
+                else:
+                    faltantes.add(user_id)
+        
+        if not faltantes:
+            return nombres
+        
+        filas = db.query(Usuario.id, Usuario.usuario).filter(Usuario.id.in_(faltantes)).all()
+        with _nombres_lock:
+            for user_id, usuario in filas:
+                nombres[user_id] = usuario
+                _nombres_cache[user_id] = usuario
+                _nombres_cache.move_to_end(user_id)
+            while len(_nombres_cache) > _NOMBRES_CACHE_MAX:
+                _nombres_cache.popitem(last=False)
+        
+        return nombres
+    
+    @staticmethod
+    def invalidar_nombres(user_id: Optional[int] = None) -> None:
+        """Quita un usuario de la caché de nombres (o la vacía si no se indica)"""
+        with _nombres_lock:
+            if user_id is None:
+                _nombres_cache.clear()
+            else:
+                _nombres_cache.pop(user_id, None)
+    
     @staticmethod
     def get_user_by_username(db: Session, username: str) -> Optional[Usuario]:
         """Obtiene un usuario por su nombre de usuario"""
@@ -95,6 +148,8 @@ class UserService:
         if not user:
             return False
         
+        # 📊 Sus verificaciones se borran por cascade: también del rollup
+        EstadisticasService.eliminar_usuario(db, user.id)
         db.delete(user)
         db.commit()
         
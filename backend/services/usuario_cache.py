@@ -0,0 +1,120 @@
+"""
+Caché del usuario autenticado
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from backend.config.settings import settings
+
+
+@dataclass(frozen=True)
+class UsuarioSesion:
+    """Snapshot inmutable del usuario logueado (lo que usan rutas y templates)"""
+    id: int
+    usuario: str
+    rol: str
+    email: Optional[str] = None
+
+
+class UsuarioCache:
+    """
+    Caché en memoria de usuarios autenticados, por nombre de usuario
+
+    - TTL corto: un cambio hecho desde otro proceso se ve a más tardar
+      en `ttl_seconds`.
+    - Versión por usuario: editar o eliminar incrementa la versión y las
+      entradas anteriores dejan de valer, incluso las que estaban cargándose
+      desde la base en ese momento.
+    - No guarda usuarios inexistentes.
+    - Desde código async usar `aobtener()`: el cache miss consulta la base
+      en el threadpool.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entradas: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entradas = max_entradas
+        self._entradas: Dict[str, Tuple[float, Tuple[int, int], UsuarioSesion]] = {}
+        self._versiones: Dict[str, int] = {}
+        self._generacion = 0  # Se incrementa al invalidar toda la caché
+        self._lock = threading.Lock()
+
+    def _cargar(self, usuario: str) -> Optional[UsuarioSesion]:
+        """Consulta la base con una sesión propia (solo en cache miss)"""
+        from backend.models import Usuario
+        from backend.config.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            fila = db.query(
+                Usuario.id, Usuario.usuario, Usuario.rol, Usuario.email
+            ).filter(Usuario.usuario == usuario).first()
+        finally:
+            db.close()
+
+        if not fila:
+            return None
+        return UsuarioSesion(id=fila.id, usuario=fila.usuario, rol=fila.rol, email=fila.email)
+
+    def obtener(self, usuario: str) -> Optional[UsuarioSesion]:
+        """
+        Obtener el usuario por nombre
+
+        Returns:
+            Snapshot del usuario o None si no existe
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            version = (self._generacion, self._versiones.get(usuario, 0))
+            cacheado = self._vigente(usuario, version, ahora)
+        if cacheado is not None:
+            return cacheado
+
+        snapshot = self._cargar(usuario)
+        if snapshot is None or self.ttl_seconds <= 0:
+            return snapshot
+
+        with self._lock:
+            if len(self._entradas) >= self.max_entradas:
+                self._entradas.clear()
+            # Si se invalidó durante la carga, la versión ya no coincide y
+            # la entrada se descarta en la próxima lectura
+            self._entradas[usuario] = (ahora, version, snapshot)
+
+        return snapshot
+
+    async def aobtener(self, usuario: str) -> Optional[UsuarioSesion]:
+        """obtener() sin bloquear el event loop: en cache miss la consulta va al threadpool"""
+        with self._lock:
+            version = (self._generacion, self._versiones.get(usuario, 0))
+            cacheado = self._vigente(usuario, version, time.monotonic())
+        if cacheado is not None:
+            return cacheado
+        return await run_in_threadpool(self.obtener, usuario)
+
+    def _vigente(self, usuario: str, version: Tuple[int, int], ahora: float) -> Optional[UsuarioSesion]:
+        # Llamar con el lock tomado
+        entrada = self._entradas.get(usuario)
+        if entrada and entrada[1] == version and ahora - entrada[0] < self.ttl_seconds:
+            return entrada[2]
+        return None
+
+    def invalidar(self, usuario: Optional[str] = None):
+        """Invalida un usuario (o toda la caché si no se indica)"""
+        with self._lock:
+            if usuario is None:
+                self._entradas.clear()
+                self._generacion += 1
+            else:
+                self._entradas.pop(usuario, None)
+                self._versiones[usuario] = self._versiones.get(usuario, 0) + 1
+
+    def estado(self) -> Dict[str, int]:
+        """Estado de la caché (para diagnóstico)"""
+        with self._lock:
+            return {"entradas": len(self._entradas), "ttl_seconds": self.ttl_seconds}
+
+
+# Instancia global
+usuario_cache = UsuarioCache(ttl_seconds=settings.USUARIO_CACHE_TTL)
@@ -0,0 +1,163 @@
+"""
+Benchmark de bloqueo del event loop en endpoints async con base de datos
+========================================================================
+
+Dispara requests concurrentes a las métricas del panel (rollup diario +
+histograma por hora sobre verificaciones) mientras un latido mide cuánto
+se atrasa el event loop, comparando:
+
+- antes:     `async def` con la sesión síncrona (el ORM bloquea el loop)
+- hilos:     get_async_db sin DB_ASYNC (run_sync en el threadpool)
+- async:     get_async_db con DB_ASYNC (AsyncSession sobre aiosqlite)
+
+Uso:
+    python benchmarks/bench_db_async.py --filas 20000 --requests 200 --concurrency 20
+
+La base SQLite se crea en un directorio temporal (BENCH_TMP=/dev/shm para
+usar memoria).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def preparar_base(filas: int):
+    """Verificaciones de las últimas 24 horas más su rollup diario"""
+    from sqlalchemy import insert
+
+    from backend.config import Base, SessionLocal, engine
+    from backend.models import Verificacion
+    from backend.services.estadisticas_service import EstadisticasService
+
+    Base.metadata.create_all(bind=engine)
+    ahora = datetime.now()
+    db = SessionLocal()
+    try:
+        db.execute(insert(Verificacion), [
+            {
+                "person_id": f"{10000000 + i}",
+                "phone_number": "3811234567",
+                "merchant_code": ("389", "561", "776")[i % 3],
+                "merchant_name": "Bench",
+                "verification_code": "1234",
+                "fecha": ahora - timedelta(seconds=i * 86400 / filas),
+                "usuario_id": 1 + i % 5,
+                "estado": "enviado" if i % 10 else "fallido",
+            }
+            for i in range(filas)
+        ])
+        db.commit()
+        EstadisticasService.reconstruir(db)
+    finally:
+        db.close()
+
+
+def crear_app(modo: str):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from backend.auth_utils import get_current_user
+    from backend.config import database
+    from backend.config.database import crear_engine_async, get_async_db, get_db
+    from backend.routes import registros
+    from backend.services.usuario_cache import UsuarioSesion
+
+    app = FastAPI()
+    app.include_router(registros.router)
+    app.dependency_overrides[get_current_user] = lambda: UsuarioSesion(id=1, usuario="bench", rol="admin")
+
+    if modo == "antes":
+        # Implementación anterior: ORM síncrono dentro de `async def`
+        @app.get("/bench/metricas")
+        async def metricas(db=Depends(get_db)):
+            return {"ok": True, "datos": registros._metricas(db)}
+    else:
+        if modo == "async":
+            app.state.engine_async = crear_engine_async(echo=False)
+            database.AsyncSessionLocal = async_sessionmaker(app.state.engine_async, expire_on_commit=False)
+        else:
+            database.AsyncSessionLocal = None
+        app.add_api_route("/bench/metricas", registros.obtener_metricas, methods=["GET"])
+        app.dependency_overrides[get_async_db] = database.get_async_db
+    return app
+
+
+async def latido(detener: asyncio.Event, atrasos: list, intervalo: float = 0.001):
+    """Duerme `intervalo` en loop y anota cuánto de más tardó en despertar"""
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atrasos.append(time.perf_counter() - inicio - intervalo)
+
+
+async def correr(app, total: int, concurrencia: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        assert (await client.get("/bench/metricas")).json()["ok"]  # Calentar
+
+        pendientes = iter(range(total))
+        latencias, atrasos = [], []
+
+        async def trabajador():
+            for _ in pendientes:
+                inicio = time.perf_counter()
+                respuesta = await client.get("/bench/metricas")
+                latencias.append(time.perf_counter() - inicio)
+                assert respuesta.status_code == 200
+
+        detener = asyncio.Event()
+        pulso = asyncio.create_task(latido(detener, atrasos))
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+        detener.set()
+        await pulso
+
+    # Las conexiones de aiosqlite tienen su propio hilo: cerrarlas en este loop
+    if getattr(app.state, "engine_async", None) is not None:
+        await app.state.engine_async.dispose()
+
+    return {
+        "rps": total / duracion,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "atraso_p99_ms": statistics.quantiles(atrasos, n=100)[-1] * 1000,
+        "atraso_max_ms": max(atrasos) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(dir=os.environ.get("BENCH_TMP"))) / "bench.db"
+    os.environ.update({"SECRET_KEY": "bench", "DATABASE_URL": f"sqlite:///{db_path}", "DEBUG": "false"})
+
+    preparar_base(args.filas)
+    resultados = {
+        modo: asyncio.run(correr(crear_app(modo), args.requests, args.concurrency))
+        for modo in ("antes", "hilos", "async")
+    }
+
+    print(f"\n📊 Métricas del panel sobre {args.filas} verificaciones, "
+          f"{args.requests} requests, concurrencia {args.concurrency}\n")
+    print(f"{'modo':<8}{'req/s':>9}{'p50 ms':>10}{'atraso p99 ms':>16}{'atraso max ms':>16}")
+    for modo, r in resultados.items():
+        print(f"{modo:<8}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['atraso_p99_ms']:>16.1f}{r['atraso_max_ms']:>16.1f}")
+    print("\n'atraso' = cuánto tarda de más un asyncio.sleep(1 ms) mientras corren los requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark del filtro de IPs (whitelist/blacklist de 100k entradas)
+==================================================================
+
+Compara el costo por request entre:
+
+- antes:   `ip in lista` (búsqueda lineal, solo IPs exactas)
+- despues: RangosIP (intervalos ordenados + búsqueda binaria, con CIDR)
+- cache:   FiltroIP.consultar con las IPs ya vistas (dict)
+
+Uso:
+    python benchmarks/bench_filtro_ip.py --entradas 100000 --consultas 2000
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def generar_lista(entradas: int) -> list:
+    """70% IPv4 sueltas, 20% rangos /24 IPv4 y 10% rangos /48 IPv6"""
+    lista = []
+    for i in range(entradas):
+        tipo = i % 10
+        if tipo < 7:
+            lista.append(str(ipaddress.IPv4Address(random.getrandbits(32))))
+        elif tipo < 9:
+            lista.append(f"{ipaddress.IPv4Address(random.getrandbits(24) << 8)}/24")
+        else:
+            lista.append(f"{ipaddress.IPv6Address(random.getrandbits(48) << 80)}/48")
+    return lista
+
+
+def generar_consultas(lista: list, consultas: int) -> list:
+    """Mitad IPs de la lista (aciertos), mitad al azar (casi todas fallan)"""
+    sueltas = [entrada for entrada in lista if "/" not in entrada]
+    ips = random.sample(sueltas, consultas // 2)
+    ips += [str(ipaddress.IPv4Address(random.getrandbits(32))) for _ in range(consultas - len(ips))]
+    random.shuffle(ips)
+    return ips
+
+
+def medir(funcion, ips: list) -> float:
+    """Microsegundos promedio por consulta"""
+    inicio = time.perf_counter()
+    for ip in ips:
+        funcion(ip)
+    return (time.perf_counter() - inicio) / len(ips) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entradas", type=int, default=100000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from backend.services.filtro_ip import FiltroIP, RangosIP
+
+    random.seed(42)
+    lista = generar_lista(args.entradas)
+    ips = generar_consultas(lista, args.consultas)
+
+    inicio = time.perf_counter()
+    rangos = RangosIP(lista)
+    compilar_ms = (time.perf_counter() - inicio) * 1000
+
+    filtro = FiltroIP(max_cache=args.consultas * 2)
+    filtro.compilar((entrada, "bloquear") for entrada in lista)
+    for ip in ips:
+        filtro.consultar(ip)
+
+    resultados = {
+        "antes": medir(lambda ip: ip in lista, ips),
+        "despues": medir(rangos.contiene, ips),
+        "cache": medir(filtro.consultar, ips),
+    }
+
+    print(f"\n📊 {args.entradas} entradas ({len(rangos)} intervalos), {args.consultas} consultas")
+    print(f"   Compilación: {compilar_ms:.0f} ms (al arrancar y en cada cambio del panel)\n")
+    print(f"{'modo':<10}{'µs/consulta':>14}")
+    for modo, micros in resultados.items():
+        print(f"{modo:<10}{micros:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
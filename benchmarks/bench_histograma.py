@@ -0,0 +1,154 @@
+"""
+Benchmark de los gráficos del dashboard (7 días + últimas 24 horas)
+==================================================================
+
+Compara cantidad de consultas y latencia entre:
+
+- antes:   un COUNT(*) por día sobre `verificaciones` + GROUP BY extract(hour)
+           sin completar las horas vacías
+- despues: SMSService.histograma (una consulta agrupada por gráfico; los
+           días salen del rollup `verificaciones_diarias`)
+
+Uso:
+    python benchmarks/bench_histograma.py --filas 200000 --repeticiones 20
+
+La base SQLite se crea en un directorio temporal (BENCH_TMP para elegirlo).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def preparar_db(filas: int):
+    """Crea una base temporal con `filas` verificaciones de los últimos 180 días"""
+    db_path = Path(tempfile.mkdtemp(dir=os.environ.get("BENCH_TMP"))) / "bench.db"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from backend.config.database import Base
+    from backend.models import Verificacion
+    from backend.services.estadisticas_service import EstadisticasService
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    ahora = datetime.now()
+    sucursales = ["389", "561", "776", "777", "778"]
+    estados = ["enviado"] * 8 + ["fallido", "test"]
+    lote = []
+    for i in range(filas):
+        lote.append({
+            "person_id": str(10000000 + i),
+            "phone_number": "3815551234",
+            "merchant_code": random.choice(sucursales),
+            "verification_code": str(random.randint(1000, 9999)),
+            "fecha": ahora - timedelta(seconds=random.randint(0, 180 * 86400)),
+            "usuario_id": random.randint(1, 20),
+            "estado": random.choice(estados),
+        })
+        if len(lote) == 10000:
+            db.execute(insert(Verificacion), lote)
+            lote = []
+    if lote:
+        db.execute(insert(Verificacion), lote)
+    db.commit()
+
+    EstadisticasService.reconstruir(db)
+    return engine, db
+
+
+def graficos_antes(db):
+    """Implementación anterior: 7 round trips + hora sin completar"""
+    from sqlalchemy import func, or_
+    from backend.models import Verificacion
+
+    hoy = datetime.now()
+    hace_7_dias = hoy - timedelta(days=6)
+    dias = []
+    for i in range(7):
+        fecha = hace_7_dias + timedelta(days=i)
+        inicio_dia = datetime(fecha.year, fecha.month, fecha.day)
+        fin_dia = inicio_dia + timedelta(days=1)
+        dias.append(db.query(Verificacion).filter(
+            Verificacion.fecha >= inicio_dia,
+            Verificacion.fecha < fin_dia,
+            or_(Verificacion.estado == "enviado", Verificacion.estado == "test")
+        ).count())
+
+    horas = db.query(
+        func.extract('hour', Verificacion.fecha).label('hora'),
+        func.count(Verificacion.id).label('total')
+    ).filter(
+        Verificacion.fecha >= hoy - timedelta(hours=24)
+    ).group_by(
+        func.extract('hour', Verificacion.fecha)
+    ).all()
+    return dias, horas
+
+
+def graficos_despues(db):
+    """Implementación actual: una consulta agrupada por gráfico"""
+    from backend.services import SMSService
+
+    ahora = datetime.now()
+    dias = SMSService.histograma(db, "dia", ahora - timedelta(days=6), ahora, estados=["enviado", "test"])
+    horas = SMSService.histograma(db, "hora", ahora - timedelta(hours=23), ahora)
+    return dias, horas
+
+
+def medir(engine, db, funcion, repeticiones: int) -> dict:
+    from sqlalchemy import event
+
+    consultas = []
+
+    def contar(*args):
+        consultas.append(1)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(db)
+        latencias.append(time.perf_counter() - inicio)
+    event.remove(engine, "before_cursor_execute", contar)
+
+    return {
+        "consultas": len(consultas) // repeticiones,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "max_ms": max(latencias) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=200000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"🗄️ Generando {args.filas} verificaciones...")
+    engine, db = preparar_db(args.filas)
+
+    resultados = {
+        "antes": medir(engine, db, graficos_antes, args.repeticiones),
+        "despues": medir(engine, db, graficos_despues, args.repeticiones),
+    }
+
+    print(f"\n📊 Gráficos de 7 días + 24 horas, {args.repeticiones} repeticiones\n")
+    print(f"{'modo':<10}{'consultas':>11}{'p50 ms':>10}{'max ms':>10}")
+    for modo, r in resultados.items():
+        print(f"{modo:<10}{r['consultas']:>11}{r['p50_ms']:>10.1f}{r['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
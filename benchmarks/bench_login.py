@@ -0,0 +1,155 @@
+"""
+Benchmark de una ráfaga de logins
+=================================
+
+Dispara logins concurrentes (bcrypt) mientras un latido mide cuánto se
+atrasa el event loop y un cliente aparte pega a una ruta síncrona
+liviana (threadpool de Starlette), comparando:
+
+- antes:   verify_password dentro del `async def` (bcrypt bloquea el loop)
+- hilos:   bcrypt en el threadpool genérico (ocupa los hilos de las rutas sync)
+- pool:    AuthService.aauthenticate_user (pool acotado de bcrypt)
+
+Uso:
+    python benchmarks/bench_login.py --requests 200 --concurrency 50 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+USUARIO, PASSWORD = "bench", "clave-de-bench"
+
+
+def preparar_base():
+    from backend.config import Base, SessionLocal, engine
+    from backend.core.security import hash_password
+    from backend.models import Usuario
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(Usuario(usuario=USUARIO, hash_password=hash_password(PASSWORD), rol="operador"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def crear_app(modo: str):
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.concurrency import run_in_threadpool
+
+    from backend.config.database import get_async_db
+    from backend.core import security
+    from backend.services import AuthService, UserService
+
+    app = FastAPI()
+
+    @app.get("/bench/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.post("/bench/login")
+    async def login(db=Depends(get_async_db)):
+        if modo == "pool":
+            user = await AuthService.aauthenticate_user(db, USUARIO, PASSWORD)
+        else:
+            user = await db.run_sync(UserService.get_user_by_username, USUARIO)
+            if modo == "antes":
+                valido = security._checkpw(PASSWORD, user.hash_password)
+            else:
+                valido = await run_in_threadpool(security._checkpw, PASSWORD, user.hash_password)
+            user = user if valido else None
+        if not user:
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    return app
+
+
+async def latido(detener: asyncio.Event, atrasos: list, intervalo: float = 0.001):
+    """Duerme `intervalo` en loop y anota cuánto de más tardó en despertar"""
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atrasos.append(time.perf_counter() - inicio - intervalo)
+
+
+async def correr(app, total: int, concurrencia: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        assert (await client.post("/bench/login")).status_code == 200  # Calentar
+
+        pendientes = iter(range(total))
+        latencias, pings, atrasos = [], [], []
+        detener = asyncio.Event()
+
+        async def trabajador():
+            for _ in pendientes:
+                inicio = time.perf_counter()
+                respuesta = await client.post("/bench/login")
+                latencias.append(time.perf_counter() - inicio)
+                assert respuesta.status_code == 200, respuesta.status_code
+
+        async def sondear():
+            while not detener.is_set():
+                inicio = time.perf_counter()
+                await client.get("/bench/ping")
+                pings.append(time.perf_counter() - inicio)
+                await asyncio.sleep(0.01)
+
+        pulso = asyncio.create_task(latido(detener, atrasos))
+        sonda = asyncio.create_task(sondear())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+        detener.set()
+        await asyncio.gather(pulso, sonda)
+
+    return {
+        "rps": total / duracion,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "ping_p99_ms": statistics.quantiles(pings, n=100)[-1] * 1000 if len(pings) > 1 else pings[0] * 1000,
+        "atraso_max_ms": max(atrasos) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(dir=os.environ.get("BENCH_TMP"))) / "bench.db"
+    os.environ.update({
+        "SECRET_KEY": "bench", "DATABASE_URL": f"sqlite:///{db_path}", "DEBUG": "false",
+        "BCRYPT_ROUNDS": str(args.rounds), "BCRYPT_MAX_COLA": str(args.requests),
+    })
+
+    preparar_base()
+    resultados = {
+        modo: asyncio.run(correr(crear_app(modo), args.requests, args.concurrency))
+        for modo in ("antes", "hilos", "pool")
+    }
+
+    from backend.core import pool_hash
+    print(f"\n🔑 {args.requests} logins, concurrencia {args.concurrency}, bcrypt costo {args.rounds}, "
+          f"{pool_hash.workers} hilos de bcrypt\n")
+    print(f"{'modo':<8}{'req/s':>9}{'p50 ms':>10}{'ping p99 ms':>14}{'atraso max ms':>16}")
+    for modo, r in resultados.items():
+        print(f"{modo:<8}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['ping_p99_ms']:>14.1f}{r['atraso_max_ms']:>16.1f}")
+    print("\n'ping' = ruta síncrona liviana durante la ráfaga; "
+          "'atraso' = cuánto tarda de más un asyncio.sleep(1 ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark de los middlewares de logging y filtro de IPs
+=======================================================
+
+Mide requests chicos por segundo sobre `/health` y un archivo de `/static`
+con la pila de middlewares de main.py, comparando:
+
+- antes:   LoggingMiddleware sobre BaseHTTPMiddleware y check_ip_restrictions
+           registrado con app.middleware("http") (tareas extra por request,
+           f-strings siempre y los estáticos pasan por los dos)
+- despues: LoggingMiddleware y RestriccionIPMiddleware ASGI puros
+
+Uso:
+    python benchmarks/bench_middleware.py --requests 5000 --concurrency 50
+    python benchmarks/bench_middleware.py --log-level INFO
+
+Con el nivel por defecto (WARNING, como en producción) el log de cada
+request no se formatea.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def preparar_antes(app):
+    """Implementación anterior (copiada de logging_middleware.py y rate_limiting.py)"""
+    from fastapi import Request
+    from fastapi.responses import JSONResponse
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    from backend.config.rate_limits import ERROR_MESSAGES
+    from backend.middleware.rate_limiting import get_real_ip
+    from backend.services.filtro_ip import filtro_ip
+
+    logger = logging.getLogger("backend.middleware.logging_middleware")
+
+    class LoggingMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            start_time = time.time()
+            logger.info(f"🔵 {request.method} {request.url.path}")
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            logger.info(
+                f"✅ {request.method} {request.url.path} - "
+                f"Status: {response.status_code} - "
+                f"Time: {process_time:.3f}s"
+            )
+            response.headers["X-Process-Time"] = str(process_time)
+            return response
+
+    async def check_ip_restrictions(request: Request, call_next):
+        await filtro_ip.recargar_si_cambio()
+        ip = get_real_ip(request)
+        permitida, bloqueada = filtro_ip.consultar(ip)
+        if bloqueada:
+            return JSONResponse(status_code=403, content={"detail": ERROR_MESSAGES["ip_blocked"]})
+        request.state.whitelisted = permitida
+        return await call_next(request)
+
+    app.add_middleware(LoggingMiddleware)
+    app.middleware("http")(check_ip_restrictions)
+
+
+def preparar_despues(app):
+    """Implementación actual"""
+    from backend.middleware import LoggingMiddleware
+    from backend.middleware.rate_limiting import RestriccionIPMiddleware
+
+    app.add_middleware(LoggingMiddleware)
+    app.add_middleware(RestriccionIPMiddleware)
+
+
+def crear_app(preparar, estaticos: str):
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+
+    app = FastAPI()
+    preparar(app)
+    app.mount("/static", StaticFiles(directory=estaticos), name="static")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+async def correr(app, path: str, total: int, concurrencia: int) -> float:
+    """Requests por segundo"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 5000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        pendientes = iter(range(total))
+
+        async def trabajador():
+            for _ in pendientes:
+                respuesta = await client.get(path)
+                assert respuesta.status_code == 200, respuesta.status_code
+
+        await trabajador()  # Calentar (y cargar el filtro de IPs)
+        pendientes = iter(range(total))
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        return total / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    logging.basicConfig(level=args.log_level, stream=open(os.devnull, "w"))
+
+    from backend.services.filtro_ip import filtro_ip
+
+    # Sin base ni Redis: las listas base de rate_limits.py
+    filtro_ip._cargada, filtro_ip._vence = True, float("inf")
+
+    with tempfile.TemporaryDirectory() as estaticos:
+        Path(estaticos, "app.css").write_text("body { margin: 0 }\n" * 20)
+        apps = {
+            "antes": crear_app(preparar_antes, estaticos),
+            "despues": crear_app(preparar_despues, estaticos),
+        }
+        resultados = {
+            modo: {
+                path: asyncio.run(correr(app, path, args.requests, args.concurrency))
+                for path in ("/health", "/static/app.css")
+            }
+            for modo, app in apps.items()
+        }
+
+    print(f"\n🏃 {args.requests} requests, concurrencia {args.concurrency}, log {args.log_level}\n")
+    print(f"{'modo':<10}{'/health req/s':>16}{'/static req/s':>16}")
+    for modo, r in resultados.items():
+        print(f"{modo:<10}{r['/health']:>16.0f}{r['/static/app.css']:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark del rate limiting de /send-sms (minuto + hora + día)
+==============================================================
+
+Compara comandos Redis por request y latencia entre:
+
+- antes:   ventana fija de slowapi/limits con tres decoradores: un EVALSHA
+           (INCRBY + EXPIRE) por ventana y GET + TTL de la ventana informada
+           para los headers X-RateLimit-*
+- despues: Limitador de ventana deslizante (un EVALSHA que evalúa las tres ventanas)
+
+Uso:
+    REDIS_URL=redis://localhost:6379/15 python benchmarks/bench_rate_limit.py --requests 2000
+
+Requiere Redis. Usa claves `ratelimit:*:bench:*` / `LIMITS:bench:*` y las borra al terminar.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SMS = ("sms_enviar", "sms_enviar_por_hora", "sms_enviar_por_dia")
+
+# Script de limits (RedisStorage.lua_incr_expire)
+INCR_EXPIRE_LUA = """
+local current
+local amount = tonumber(ARGV[2])
+current = redis.call("incrby", KEYS[1], amount)
+if tonumber(current) == amount then
+    redis.call("expire", KEYS[1], ARGV[1])
+end
+return current
+"""
+
+
+class Contador:
+    """Envuelve execute_command del cliente para contar round trips"""
+
+    def __init__(self, cliente):
+        self.total = 0
+        original = cliente.execute_command
+
+        async def contar(*args, **kwargs):
+            self.total += 1
+            return await original(*args, **kwargs)
+
+        cliente.execute_command = contar
+
+
+def preparar_antes(cliente):
+    """Implementación anterior: ventana fija por decorador"""
+    from backend.config.rate_limits import RATE_LIMITS
+
+    incr_expire = cliente.register_script(INCR_EXPIRE_LUA)
+    configs = [RATE_LIMITS[limit_key] for limit_key in SMS]
+
+    async def request(identificador: str):
+        claves = []
+        for limit_key, config in zip(SMS, configs):
+            ventana = int(time.time() // config.period)
+            clave = f"LIMITS:bench:{limit_key}:{identificador}:{ventana}"
+            claves.append(clave)
+            actual = await incr_expire(keys=[clave], args=[config.period, 1])
+            if actual > config.limit:
+                break
+        # Headers: estadísticas de la última ventana evaluada
+        await cliente.get(claves[-1])
+        await cliente.ttl(claves[-1])
+
+    return request
+
+
+def preparar_despues(cliente):
+    """Implementación actual: un script para las tres ventanas"""
+    from backend.middleware.limitador import Limitador
+
+    limitador = Limitador()
+
+    async def request(identificador: str):
+        await limitador.evaluar(f"bench:{identificador}", SMS)
+
+    return request
+
+
+async def comandos_servidor(cliente) -> int:
+    """Total de comandos procesados por Redis (INFO commandstats)"""
+    try:
+        stats = await cliente.info("commandstats")
+    except Exception:
+        return -1
+    return sum(valor["calls"] for valor in stats.values() if isinstance(valor, dict))
+
+
+async def medir(cliente, request, requests: int, usuarios: int) -> dict:
+    servidor_inicio = await comandos_servidor(cliente)
+    contador = Contador(cliente)
+    latencias = []
+    for i in range(requests):
+        inicio = time.perf_counter()
+        await request(f"user:{i % usuarios}")
+        latencias.append(time.perf_counter() - inicio)
+    del cliente.execute_command
+    servidor_fin = await comandos_servidor(cliente)
+
+    # El INFO final se cuenta a sí mismo en el servidor
+    servidor = (servidor_fin - servidor_inicio - 1) / requests if servidor_inicio >= 0 else None
+    return {
+        "round_trips": contador.total / requests,
+        "comandos": servidor,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": statistics.quantiles(latencias, n=20)[-1] * 1000,
+    }
+
+
+async def limpiar(cliente):
+    for patron in ("LIMITS:bench:*", "ratelimit:*:bench:*"):
+        claves = [clave async for clave in cliente.scan_iter(match=patron, count=500)]
+        if claves:
+            await cliente.unlink(*claves)
+
+
+async def ejecutar(args):
+    from backend.config.redis_config import cerrar_redis_async, iniciar_redis_async
+
+    cliente = await iniciar_redis_async()
+    try:
+        await cliente.ping()
+        await limpiar(cliente)
+        resultados = {
+            "antes": await medir(cliente, preparar_antes(cliente), args.requests, args.usuarios),
+            "despues": await medir(cliente, preparar_despues(cliente), args.requests, args.usuarios),
+        }
+        await limpiar(cliente)
+    finally:
+        await cerrar_redis_async()
+
+    print(f"\n📊 Rate limiting de /send-sms, {args.requests} requests, {args.usuarios} usuarios\n")
+    print(f"{'modo':<10}{'round trips':>13}{'comandos':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for modo, r in resultados.items():
+        comandos = f"{r['comandos']:.2f}" if r["comandos"] is not None else "-"
+        print(
+            f"{modo:<10}{r['round_trips']:>13.2f}{comandos:>10}"
+            f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+        )
+    print("\n'comandos' incluye los que corren dentro de los scripts (INFO commandstats)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--usuarios", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == "__main__":
+    main()
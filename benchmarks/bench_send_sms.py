@@ -0,0 +1,221 @@
+"""
+Benchmark de /send-sms contra un proveedor SMS simulado
+=======================================================
+
+Levanta un stub local de SMS Masivos (en otro proceso, con latencia
+configurable) y dispara requests concurrentes contra la app en proceso,
+comparando:
+
+- sync:  implementación anterior (endpoint `def` + `requests` bloqueante,
+         limitado por el threadpool de Starlette)
+- async: implementación actual (`async def` + cliente httpx compartido)
+
+Uso:
+    python benchmarks/bench_send_sms.py --requests 1000 --concurrency 200 --delay 0.5
+
+La base SQLite se crea en un directorio temporal (BENCH_TMP=/dev/shm para
+usar memoria y que el fsync del commit no domine la medición).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# ========================================
+# 📡 PROVEEDOR SMS SIMULADO
+# ========================================
+
+async def _atender_conexion(reader, writer, delay: float):
+    """Responde como SMS Masivos después de `delay` segundos (HTTP/1.1 keep-alive)"""
+    try:
+        while True:
+            linea = await reader.readline()
+            if not linea:
+                break
+            metodo = linea.split(b" ", 1)[0]
+            largo = 0
+            while (header := await reader.readline()) not in (b"\r\n", b""):
+                nombre, _, valor = header.partition(b":")
+                if nombre.strip().lower() == b"content-length":
+                    largo = int(valor)
+            if largo:
+                await reader.readexactly(largo)
+
+            await asyncio.sleep(delay)
+            # GET = obtener_saldo.asp, POST = enviar_sms.asp
+            cuerpo = b"100000" if metodo == b"GET" else b"OK"
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: " + str(len(cuerpo)).encode() + b"\r\n\r\n" + cuerpo
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def _servir_stub(delay: float, puerto):
+    async def servir():
+        server = await asyncio.start_server(
+            lambda r, w: _atender_conexion(r, w, delay), "127.0.0.1", 0, backlog=2048
+        )
+        puerto.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(servir())
+
+
+def iniciar_stub(delay: float) -> tuple:
+    """
+    Levanta el stub en un proceso aparte para que no compita por el GIL
+    con la app bajo prueba.
+
+    Returns:
+        Tupla (proceso, url base)
+    """
+    puerto = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=_servir_stub, args=(delay, puerto), daemon=True)
+    proceso.start()
+    return proceso, f"http://127.0.0.1:{puerto.get(timeout=10)}"
+
+
+# ========================================
+# 🧪 APP BAJO PRUEBA
+# ========================================
+
+def preparar_app(stub_url: str):
+    """Configura el entorno e importa la app con autenticación simulada"""
+    db_path = Path(tempfile.mkdtemp(dir=os.environ.get("BENCH_TMP"))) / "bench.db"
+    os.environ.update({
+        "SECRET_KEY": "bench",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SMS_MODO_SIMULADO": "false",
+        "SMS_API_URL": f"{stub_url}/enviar_sms.asp",
+        "SMS_SALDO_URL": f"{stub_url}/obtener_saldo.asp",
+        "DEBUG": "false",
+    })
+    os.environ.pop("REDIS_URL", None)
+
+    from fastapi import Depends
+    from sqlalchemy.orm import Session
+    import requests
+
+    from backend.main import app
+    from backend.config import get_db, settings
+    from backend.core import get_current_user
+    from backend.middleware.limitador import limitador
+    from backend.routes.sms import SmsRequest
+    from backend.services import SMSService
+
+    limitador.enabled = False
+
+    class UsuarioBench:
+        id = 1
+        usuario = "bench"
+        rol = "operador"
+        email = None
+
+    async def usuario_bench():
+        return UsuarioBench()
+
+    app.dependency_overrides[get_current_user] = usuario_bench
+
+    # Implementación anterior de /send-sms (bloqueante) para comparar
+    @app.post("/bench/send-sms-sync")
+    def handle_sms_sync(data: SmsRequest, db: Session = Depends(get_db)):
+        code = SMSService.generar_codigo()
+        saldo = requests.get(
+            settings.SMS_SALDO_URL,
+            params={"apikey": settings.SMS_API_KEY},
+            timeout=settings.SMS_SALDO_TIMEOUT
+        )
+        int(saldo.text.strip())
+        texto = f"{data.merchantCode} - {SMSService.get_nombre_sucursal(data.merchantCode)} - DNI: {data.personId} - Su Codigo es: {code}"
+        resultado = SMSService.enviar_sms(data.phoneNumber, texto)
+        SMSService.registrar_verificacion(
+            db=db,
+            person_id=data.personId,
+            phone_number=data.phoneNumber,
+            merchant_code=data.merchantCode,
+            verification_code=code,
+            usuario_id=1,
+            estado="enviado" if resultado["ok"] else "fallido"
+        )
+        return {"verificationCode": code}
+
+    return app
+
+
+# ========================================
+# 🏃 EJECUCIÓN
+# ========================================
+
+async def correr(app, path: str, total: int, concurrencia: int) -> dict:
+    import httpx
+    from backend.services.http_client import close_http_client
+
+    payload = {"personId": "12345678", "phoneNumber": "3815551234", "merchantCode": "389"}
+    latencias = []
+    errores = 0
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def una_request():
+            nonlocal errores
+            async with semaforo:
+                inicio = time.perf_counter()
+                resp = await client.post(path, json=payload)
+                latencias.append(time.perf_counter() - inicio)
+                if resp.status_code != 200:
+                    errores += 1
+
+        inicio_total = time.perf_counter()
+        await asyncio.gather(*(una_request() for _ in range(total)))
+        duracion = time.perf_counter() - inicio_total
+
+    # El pool httpx queda atado a este event loop
+    await close_http_client()
+
+    latencias.sort()
+    return {
+        "rps": total / duracion,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": latencias[max(0, int(len(latencias) * 0.99) - 1)] * 1000,
+        "errores": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.5, help="Latencia del proveedor simulado (s)")
+    args = parser.parse_args()
+
+    stub, stub_url = iniciar_stub(args.delay)
+    app = preparar_app(stub_url)
+
+    resultados = {}
+    for modo, path in (("sync", "/bench/send-sms-sync"), ("async", "/send-sms")):
+        resultados[modo] = asyncio.run(correr(app, path, args.requests, args.concurrency))
+    stub.terminate()
+
+    print(f"\n📡 Proveedor simulado con latencia {args.delay * 1000:.0f} ms")
+    print(f"🏃 {args.requests} requests, concurrencia {args.concurrency}\n")
+    print(f"{'modo':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}")
+    for modo, r in resultados.items():
+        print(f"{modo:<8}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errores']:>10}")
+
+
+if __name__ == "__main__":
+    main()
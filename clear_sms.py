@@ -1,8 +1,9 @@
 from backend.database import SessionLocal
-from backend.models import Verificacion
+from backend.models import Verificacion, VerificacionDiaria
 
 db = SessionLocal()
 db.query(Verificacion).delete()
+db.query(VerificacionDiaria).delete()
 db.commit()
 db.close()
 
@@ -1,10 +1,11 @@
 from backend.database import SessionLocal
-from backend.models import Verificacion
+from backend.models import Verificacion, VerificacionDiaria
 
 print("🧹 Limpiando todos los registros de la tabla 'verificaciones'...")
 
 db = SessionLocal()
 db.query(Verificacion).delete()
+db.query(VerificacionDiaria).delete()
 db.commit()
 db.close()
 
@@ -12,6 +12,11 @@ let filtroEstado = "";
 // 🔢 Total de registros según filtros
 let totalRegistros = 0;
 
+// 🔖 Cursores de la página actual (paginación por cursor)
+let cursorActual = null;
+let nextCursor = null;
+let prevCursor = null;
+
 // 🟢 Iniciar todo al cargar la página
 document.addEventListener("DOMContentLoaded", () => {
   cargarUsuarios();
@@ -39,6 +44,7 @@ async function cargarUsuarios() {
 // 🔍 Aplica filtros y actualiza tabla desde página 1
 function aplicarFiltros() {
   paginaActual = 1;
+  cursorActual = null;
   filtroUsuario     = document.getElementById("usuarioSelect").value;
   filtroSucursal    = document.getElementById("sucursalSelect").value;
   filtroFechaInicio = document.getElementById("fechaInicio").value;
@@ -74,7 +80,10 @@ async function obtenerTotalRegistros() {
 
 // 📄 Cargar registros paginados y mostrarlos en la tabla
 async function cargarPagina() {
-  let url = `/api/admin/sms?skip=${(paginaActual - 1) * registrosPorPagina}&limit=${registrosPorPagina}`;
+  // Paginación por cursor: el total se pide aparte (obtenerTotalRegistros)
+  let url = `/api/admin/sms?paginacion=cursor&incluir_total=false&limit=${registrosPorPagina}`;
+
+  if (cursorActual)      url += `&cursor=${encodeURIComponent(cursorActual)}`;
 
   if (filtroUsuario)     url += `&usuario_id=${filtroUsuario}`;
   if (filtroSucursal)    url += `&sucursal=${filtroSucursal}`;
@@ -95,6 +104,8 @@ async function cargarPagina() {
 
     const data = await res.json();
     const sms = data.sms || data; // Soportar ambos formatos
+    nextCursor = data.next_cursor || null;
+    prevCursor = data.prev_cursor || null;
 
     // 🔃 Ordenar por fecha descendente (últimos arriba)
     sms.sort((a, b) => new Date(b.fecha) - new Date(a.fecha));
@@ -142,8 +153,8 @@ async function cargarPagina() {
     const rangoRegistrosEl = document.getElementById("rangoRegistros");
 
     if (paginaActualEl) paginaActualEl.textContent = paginaActual;
-    if (prevPaginaBtn)  prevPaginaBtn.disabled = paginaActual === 1;
-    if (nextPaginaBtn)  nextPaginaBtn.disabled = paginaActual * registrosPorPagina >= totalRegistros;
+    if (prevPaginaBtn)  prevPaginaBtn.disabled = !prevCursor;
+    if (nextPaginaBtn)  nextPaginaBtn.disabled = !nextCursor;
 
     const inicio = (paginaActual - 1) * registrosPorPagina + 1;
     const fin = Math.min(paginaActual * registrosPorPagina, totalRegistros);
@@ -179,6 +190,20 @@ function getEstadoBadge(estado) {
     </span>`;
   }
   
+  if (estadoLower === "encolado") {
+    return `<span class="inline-flex items-center gap-1 px-2 py-1 rounded-full text-xs font-semibold bg-blue-500/20 text-blue-300 border border-blue-500/40">
+      <span class="w-1.5 h-1.5 rounded-full bg-blue-400"></span>
+      Encolado
+    </span>`;
+  }
+  
+  if (estadoLower === "reintentando") {
+    return `<span class="inline-flex items-center gap-1 px-2 py-1 rounded-full text-xs font-semibold bg-orange-500/20 text-orange-300 border border-orange-500/40">
+      <span class="w-1.5 h-1.5 rounded-full bg-orange-400"></span>
+      Reintentando
+    </span>`;
+  }
+  
   // Estado desconocido
   return `<span class="inline-flex items-center gap-1 px-2 py-1 rounded-full text-xs font-semibold bg-gray-500/20 text-gray-300 border border-gray-500/40">
     <span class="w-1.5 h-1.5 rounded-full bg-gray-400"></span>
@@ -193,8 +218,9 @@ function iniciarPaginacion() {
 
   if (btnPrev) {
     btnPrev.addEventListener("click", () => {
-      if (paginaActual > 1) {
+      if (prevCursor) {
         paginaActual--;
+        cursorActual = prevCursor;
         cargarPagina();
       }
     });
@@ -202,17 +228,19 @@ function iniciarPaginacion() {
 
   if (btnNext) {
     btnNext.addEventListener("click", () => {
-      if (paginaActual * registrosPorPagina < totalRegistros) {
+      if (nextCursor) {
         paginaActual++;
+        cursorActual = nextCursor;
         cargarPagina();
       }
     });
   }
 }
 
-// 📁 Exportar todos los registros filtrados (sin paginación)
-async function exportarExcel() {
+// 📁 Exportar todos los registros filtrados (CSV en streaming, sin límite de filas)
+function exportarExcel() {
   const filtroParams = [
+    "formato=csv",
     filtroUsuario     && `usuario_id=${filtroUsuario}`,
     filtroSucursal    && `sucursal=${filtroSucursal}`,
     filtroFechaInicio && `fecha_inicio=${filtroFechaInicio}`,
@@ -220,48 +248,13 @@ async function exportarExcel() {
     filtroEstado      && `estado=${filtroEstado}`
   ].filter(Boolean).join("&");
 
-  const url = `/api/admin/sms/todos${filtroParams ? "?" + filtroParams : ""}`;
-
-  try {
-    const res = await fetch(url);
-    if (!res.ok) {
-      const msg = await res.text();
-      throw new Error(`Error ${res.status}: ${msg}`);
-    }
-
-    const registros = await res.json();
-    if (registros.length === 0) {
-      alert("No hay registros para exportar con los filtros actuales.");
-      return;
-    }
-
-    const tabla = document.createElement("table");
-    tabla.innerHTML = `
-      <thead>
-        <tr><th>DNI</th><th>Celular</th><th>Sucursal</th><th>Código</th><th>Usuario</th><th>Fecha</th><th>Estado</th></tr>
-      </thead>
-      <tbody>
-        ${registros.map(r => `
-          <tr>
-            <td>${r.dni}</td>
-            <td>${r.celular}</td>
-            <td>${r.sucursal}</td>
-            <td>${r.codigo}</td>
-            <td>${r.usuario_nombre}</td>
-            <td>${r.fecha}</td>
-            <td>${r.estado || 'N/A'}</td>
-          </tr>
-        `).join("")}
-      </tbody>
-    `;
-
-    const wb = XLSX.utils.table_to_book(tabla, { sheet: "SMS Admin" });
-    XLSX.writeFile(wb, "sms_admin_completo.xlsx");
-
-  } catch (error) {
-    console.error("⚠️ Exportación fallida:", error.message);
-    alert("Error al exportar registros. Detalle: " + error.message);
-  }
+  // El navegador descarga el archivo a medida que llega (no se arma en memoria)
+  const link = document.createElement("a");
+  link.href = `/api/admin/sms/exportar?${filtroParams}`;
+  link.download = "";
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
 }
 
 
@@ -282,6 +275,7 @@ function limpiarFiltros() {
 
   // Actualizar visualmente tabla
   paginaActual = 1;
+  cursorActual = null;
   obtenerTotalRegistros().then(() => {
     cargarPagina();
   });
@@ -21,6 +21,12 @@ document.addEventListener("DOMContentLoaded", () => {
 
   let sucursales = {}; // Se cargará desde la BD
   let saldoDisponible = null; // Se verificará al cargar
+  let claveEnvio = ""; // 📵 Idempotency-Key del código generado
+
+  function nuevaClaveEnvio() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+  }
 
   // 💰 Verificar saldo disponible
   async function verificarSaldo() {
@@ -129,6 +135,7 @@ document.addEventListener("DOMContentLoaded", () => {
     generateBtn.addEventListener("click", () => {
       const code = Math.floor(1000 + Math.random() * 9000).toString();
       verificationCode.value = code;
+      claveEnvio = nuevaClaveEnvio(); // 📵 Reintentos de este código no pagan otro SMS
       codeDisplay.textContent = code;
       previewCode.textContent = code; // Actualizar preview
       submitBtn.disabled = false;
@@ -188,7 +195,7 @@ document.addEventListener("DOMContentLoaded", () => {
     try {
       const res = await fetch("/send-sms", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "Idempotency-Key": claveEnvio },
         body: JSON.stringify(data),
       });
 
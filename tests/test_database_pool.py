@@ -0,0 +1,70 @@
+"""
+Tests del motor de base de datos
+================================
+
+Verifica los PRAGMAs de SQLite (WAL, synchronous, busy_timeout), las
+métricas del pool y que el módulo viejo reutiliza el mismo motor.
+"""
+
+import pytest
+from sqlalchemy import exc, text
+
+from backend.config import database
+from backend.config.database import PoolMedido, crear_engine, estado_db
+
+
+def test_sqlite_en_wal(tmp_path):
+    """
+    Test: con WAL una lectura no espera a la transacción de escritura abierta
+    """
+    engine = crear_engine(f"sqlite:///{tmp_path / 'wal.db'}", echo=False)
+    assert isinstance(engine.pool, PoolMedido)
+
+    with engine.connect() as conexion:
+        assert conexion.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conexion.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conexion.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        conexion.execute(text("CREATE TABLE t (x INTEGER)"))
+        conexion.commit()
+
+    with engine.connect() as escritor, engine.connect() as lector:
+        escritor.execute(text("INSERT INTO t VALUES (1)"))  # Transacción abierta
+        assert lector.execute(text("SELECT count(*) FROM t")).scalar() == 0
+        escritor.commit()
+
+    engine.dispose()
+
+
+def test_metricas_del_pool(tmp_path):
+    """
+    Test: checkouts, ocupación y timeout cuando el pool se agota
+    """
+    engine = crear_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", echo=False,
+        pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+
+    with engine.connect():
+        estado = estado_db(engine)
+        assert (estado["tamano"], estado["en_uso"], estado["libres"]) == (1, 1, 0)
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    estado = estado_db(engine)
+    assert (estado["checkouts"], estado["timeouts"], estado["en_uso"]) == (2, 1, 0)
+    assert estado["espera_max_ms"] >= 50
+
+    engine.dispose()
+    assert estado_db(engine)["checkouts"] == 2  # dispose no pierde las métricas
+
+
+def test_modulo_viejo_sin_segundo_pool():
+    """
+    Test: backend.database re-exporta el motor de backend.config.database
+    """
+    from backend import database as legacy
+
+    assert legacy.engine is database.engine
+    assert legacy.SessionLocal is database.SessionLocal
+    assert legacy.get_db is database.get_db
@@ -0,0 +1,125 @@
+"""
+Tests de las sesiones para endpoints async
+==========================================
+
+Verifica que los servicios síncronos corren igual sobre AsyncSession
+(aiosqlite) vía run_sync y que, sin DB_ASYNC, get_async_db manda cada
+llamada al threadpool en vez de bloquear el event loop.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.auth_utils import get_current_user
+from backend.config import database
+from backend.config.database import Base, PoolMedidoAsync, crear_engine_async, get_async_db, url_async
+from backend.routes import registros
+from backend.services.sms_service import SMSService
+from backend.services.usuario_cache import UsuarioSesion
+
+
+def test_url_async():
+    """
+    Test: cada base usa su driver asíncrono, con usuario y contraseña intactos
+    """
+    assert url_async("postgresql://u:clave@db:5432/sms") == "postgresql+asyncpg://u:clave@db:5432/sms"
+    assert url_async("postgresql+psycopg2://u@db/sms") == "postgresql+asyncpg://u@db/sms"
+    assert url_async("sqlite:///./usuarios.db") == "sqlite+aiosqlite:///./usuarios.db"
+    with pytest.raises(ValueError):
+        url_async("mysql://u@db/sms")
+
+
+def _registrar(db, i):
+    return SMSService.registrar_verificacion(
+        db, person_id=f"1234567{i}", phone_number="3811234567", merchant_code="389",
+        verification_code="4321", usuario_id=1
+    )
+
+
+@pytest.fixture
+def engine_async(tmp_path):
+    pytest.importorskip("aiosqlite")
+    engine = crear_engine_async(f"sqlite:///{tmp_path / 'async.db'}", echo=False)
+
+    async def crear():
+        async with engine.begin() as conexion:
+            await conexion.run_sync(Base.metadata.create_all)
+
+    asyncio.run(crear())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+def test_servicios_sobre_aiosqlite(engine_async):
+    """
+    Test: registrar y consultar por run_sync, con WAL y métricas en el pool async
+    """
+    fabrica = async_sessionmaker(engine_async, expire_on_commit=False)
+
+    async def usar():
+        async with fabrica() as db:
+            verif = await db.run_sync(_registrar, 1)
+            modo = (await db.execute(text("PRAGMA journal_mode"))).scalar()
+            total = await db.run_sync(lambda s: SMSService.get_verificaciones(s, limit=10)[1])
+        return verif, modo, total
+
+    verif, modo, total = asyncio.run(usar())
+    assert (verif.id, verif.merchant_code, modo, total) == (1, "389", "wal", 1)
+    assert isinstance(engine_async.pool, PoolMedidoAsync)
+    assert engine_async.pool.metricas.checkouts >= 1
+
+
+def test_sin_db_async_usa_el_threadpool(monkeypatch):
+    """
+    Test: el fallback corre el servicio fuera del hilo del event loop
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+
+    async def usar():
+        hilo_loop = threading.get_ident()
+        dependencia = get_async_db()
+        db = await dependencia.__anext__()
+        hilo, verif = await db.run_sync(lambda s: (threading.get_ident(), _registrar(s, 2)))
+        await dependencia.aclose()
+        return hilo != hilo_loop, verif.person_id
+
+    assert asyncio.run(usar()) == (True, "12345672")
+
+
+def test_metricas_por_sesion_async(engine_async):
+    """
+    Test: /api/registros/metricas responde igual con la sesión de aiosqlite
+    """
+    fabrica = async_sessionmaker(engine_async, expire_on_commit=False)
+
+    async def sesion():
+        async with fabrica() as db:
+            yield db
+
+    async def cargar():
+        async with fabrica() as db:
+            for i in range(3):
+                await db.run_sync(_registrar, i)
+
+    asyncio.run(cargar())
+
+    app = FastAPI()
+    app.include_router(registros.router)
+    app.dependency_overrides[get_async_db] = sesion
+    app.dependency_overrides[get_current_user] = lambda: UsuarioSesion(id=1, usuario="ana", rol="admin")
+
+    respuesta = TestClient(app).get("/api/registros/metricas").json()
+    assert respuesta["ok"], respuesta
+    assert respuesta["datos"]["tasa_exito_fallo"]["exitosos"] == 3
+    assert sum(h["total"] for h in respuesta["datos"]["sms_por_hora"]) == 3
@@ -0,0 +1,123 @@
+"""
+Tests de estadísticas diarias
+=============================
+
+Verifica que el rollup `verificaciones_diarias` mantenido de forma
+incremental coincide con una reconstrucción completa.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.models import VerificacionDiaria
+from backend.services.estadisticas_service import EstadisticasService
+from backend.services.sms_service import SMSService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+    yield sesion
+    sesion.close()
+
+
+def _snapshot(db):
+    return sorted(
+        (f.fecha, f.merchant_code, f.usuario_id, f.estado, f.total)
+        for f in db.query(VerificacionDiaria).filter(VerificacionDiaria.total != 0)
+    )
+
+
+def _registrar(db, merchant_code="389", usuario_id=1, estado="enviado"):
+    return SMSService.registrar_verificacion(
+        db=db,
+        person_id="12345678",
+        phone_number="3815551234",
+        merchant_code=merchant_code,
+        verification_code="1234",
+        usuario_id=usuario_id,
+        estado=estado
+    )
+
+
+def test_incremental_coincide_con_reconstruccion(db):
+    """
+    Test: registrar verificaciones (individuales y por lote) mantiene el rollup
+    """
+    _registrar(db)
+    _registrar(db)
+    _registrar(db, merchant_code="561", estado="fallido")
+    _registrar(db, usuario_id=2, estado="test")
+    SMSService.registrar_verificaciones_lote(db, [
+        {
+            "person_id": "12345678",
+            "phone_number": "3815551234",
+            "merchant_code": "389",
+            "verification_code": None,
+            "usuario_id": 1,
+            "estado": "enviado",
+            "error_mensaje": None
+        }
+        for _ in range(3)
+    ])
+
+    incremental = _snapshot(db)
+    EstadisticasService.reconstruir(db)
+
+    assert incremental == _snapshot(db)
+    assert EstadisticasService.total(db) == 7
+    assert EstadisticasService.por_estado(db) == {"enviado": 5, "fallido": 1, "test": 1}
+    assert EstadisticasService.top_sucursales(db, limite=1) == [("389", 6)]
+
+
+def test_cambio_de_estado_mueve_el_conteo(db):
+    """
+    Test: una transición de estado (ej: cola) resta del estado anterior y suma al nuevo
+    """
+    verificacion = _registrar(db, estado="encolado")
+
+    EstadisticasService.cambiar_estado(db, verificacion, "reintentando")
+    EstadisticasService.cambiar_estado(db, verificacion, "enviado")
+    db.commit()
+
+    assert verificacion.estado == "enviado"
+    assert EstadisticasService.por_estado(db, estados=["encolado", "reintentando", "enviado"]) == {
+        "encolado": 0, "reintentando": 0, "enviado": 1
+    }
+
+
+
+def test_eliminar_usuario_descuenta_del_rollup(db):
+    """
+    Test: borrar un usuario (cascade de sus verificaciones) baja los totales del dashboard
+    """
+    from backend.models import Usuario
+    from backend.services.user_service import UserService
+
+    db.add_all([
+        Usuario(id=1, usuario="ana", hash_password="x", rol="operador"),
+        Usuario(id=2, usuario="beto", hash_password="x", rol="operador"),
+    ])
+    db.commit()
+    _registrar(db)
+    _registrar(db, merchant_code="561", estado="fallido")
+    _registrar(db, usuario_id=2)
+    assert EstadisticasService.total(db) == 3
+
+    assert UserService.delete_user(db, 1)
+
+    assert EstadisticasService.total(db) == 1
+    assert EstadisticasService.por_estado(db) == {"enviado": 1}
+    assert EstadisticasService.top_sucursales(db) == [("389", 1)]
+    incremental = _snapshot(db)
+    EstadisticasService.reconstruir(db)
+    assert incremental == _snapshot(db)
@@ -0,0 +1,83 @@
+"""
+Tests de la exportación en streaming
+====================================
+
+Verifica que CSV y NDJSON se generan de a trozos, sin tope de filas y con
+el estado real de cada verificación.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.models import Usuario, Verificacion
+from backend.services.exportacion_service import ExportacionService, FILAS_POR_LOTE
+
+TOTAL = FILAS_POR_LOTE * 2 + 500
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+    sesion.add(Usuario(id=1, usuario="operador1", hash_password="x", rol="operador"))
+    sesion.commit()
+
+    base = datetime(2025, 1, 1)
+    sesion.execute(insert(Verificacion), [
+        {
+            "person_id": str(10000000 + i),
+            "phone_number": "3815551234",
+            "merchant_code": "389",
+            "verification_code": "1234",
+            "fecha": base + timedelta(seconds=i),
+            "usuario_id": 1 if i % 2 else 99,  # 99 no existe
+            "estado": "fallido" if i % 5 == 0 else "enviado",
+        }
+        for i in range(TOTAL)
+    ])
+    sesion.commit()
+
+    yield sesion
+    sesion.close()
+
+
+def test_csv_en_trozos_sin_tope(db):
+    """
+    Test: el CSV incluye todas las filas y se emite de a lotes
+    """
+    trozos = list(ExportacionService.exportar("csv", db=db))
+    assert len(trozos) > 2
+
+    contenido = b"".join(trozos).decode("utf-8-sig")
+    filas = list(csv.reader(io.StringIO(contenido)))
+
+    assert filas[0] == ["DNI", "Celular", "Sucursal", "Código", "Usuario", "Fecha", "Estado"]
+    assert len(filas) == TOTAL + 1
+    # Orden: más recientes primero; estado y usuario reales
+    assert filas[1][0] == str(10000000 + TOTAL - 1)
+    assert {f[6] for f in filas[1:]} == {"enviado", "fallido"}
+    assert {f[4] for f in filas[1:]} == {"operador1", "desconocido"}
+
+
+def test_ndjson_con_filtros(db):
+    """
+    Test: NDJSON respeta los filtros del panel
+    """
+    contenido = b"".join(ExportacionService.exportar("ndjson", db=db, estado="fallido"))
+    registros = [json.loads(linea) for linea in contenido.decode("utf-8").splitlines()]
+
+    assert len(registros) == TOTAL // 5
+    assert all(r["estado"] == "fallido" for r in registros)
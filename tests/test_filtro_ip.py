@@ -0,0 +1,113 @@
+"""
+Tests del filtro de IPs
+=======================
+
+Verifica rangos CIDR IPv4/IPv6, la recarga desde la tabla `ip_reglas` y
+que una IP bloqueada recibe un 403 (no un 500).
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config import database, settings
+from backend.config.database import Base
+from backend.middleware.rate_limiting import RestriccionIPMiddleware
+from backend.models import IpRegla
+from backend.services import filtro_ip as modulo
+from backend.services.filtro_ip import FiltroIP, RangosIP
+
+
+def test_rangos_cidr_ipv4_e_ipv6():
+    """
+    Test: IPs sueltas, rangos solapados, IPv6 e IPv4 mapeada
+    """
+    rangos = RangosIP([
+        "10.0.0.0/8", "10.1.0.0/16", "192.168.1.7", "2001:db8::/32", "localhost", "no-es-ip"
+    ])
+
+    assert rangos.contiene("10.255.255.255") and rangos.contiene("10.1.2.3")
+    assert not rangos.contiene("11.0.0.0") and not rangos.contiene("9.255.255.255")
+    assert rangos.contiene("192.168.1.7") and not rangos.contiene("192.168.1.8")
+    assert rangos.contiene("2001:db8:ffff::1") and not rangos.contiene("2001:db9::1")
+    assert rangos.contiene("::ffff:10.9.9.9")
+    assert rangos.contiene("127.0.0.1") and rangos.contiene("::1")
+    assert not rangos.contiene("desconocida")
+
+    # 10.1.0.0/16 queda dentro de 10.0.0.0/8: se unen en un solo intervalo
+    assert len(rangos) == 5
+    assert rangos.invalidas == ["no-es-ip"]
+
+
+def test_cache_se_vacia_al_recompilar():
+    """
+    Test: una IP ya consultada refleja la regla nueva tras recompilar
+    """
+    filtro = FiltroIP()
+    assert filtro.consultar("203.0.113.9") == (False, False)
+
+    filtro.compilar([("203.0.113.0/24", "bloquear")])
+    assert filtro.consultar("203.0.113.9") == (False, True)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", fabrica)
+
+    sesion = fabrica()
+    yield sesion
+    sesion.close()
+
+
+def test_recarga_desde_la_tabla(db, monkeypatch):
+    """
+    Test: sin Redis, otro worker toma las reglas de la tabla al arrancar
+    """
+    monkeypatch.setattr(modulo, "get_redis_async", lambda: None)
+    db.add(IpRegla(red="198.51.100.0/24", tipo="bloquear"))
+    db.add(IpRegla(red="2001:db8::/48", tipo="permitir"))
+    db.commit()
+
+    filtro = FiltroIP()
+    asyncio.run(filtro.recargar_si_cambio())
+
+    assert filtro.bloqueada("198.51.100.200")
+    assert filtro.permitida("2001:db8:0:1::5")
+    assert filtro.permitida("127.0.0.1")  # La base de rate_limits.py sigue vigente
+
+
+def test_ip_bloqueada_recibe_403(monkeypatch):
+    """
+    Test: el middleware responde 403 con JSON en vez de propagar la excepción
+    """
+    filtro = FiltroIP()
+    filtro.compilar([("127.0.0.0/8", "bloquear")])
+    filtro._cargada, filtro._vence = True, float("inf")
+    monkeypatch.setattr("backend.middleware.rate_limiting.filtro_ip", filtro)
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["testclient"])
+
+    app = FastAPI()
+    app.add_middleware(RestriccionIPMiddleware)
+
+    @app.get("/")
+    def inicio():
+        return {"ok": True}
+
+    client = TestClient(app)
+    respuesta = client.get("/", headers={"X-Forwarded-For": "127.0.0.5"})
+    assert respuesta.status_code == 403
+    assert "bloqueada" in respuesta.json()["detail"]
+
+    assert client.get("/", headers={"X-Forwarded-For": "8.8.8.8"}).status_code == 200
@@ -0,0 +1,125 @@
+"""
+Tests del pool de bcrypt
+========================
+
+Verifica que bcrypt corre en los hilos dedicados, que el pool rechaza
+cuando la cola está llena y que el login rehace los hashes SHA-256
+legacy o con otro costo.
+"""
+
+import asyncio
+import hashlib
+import threading
+
+import bcrypt
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base, SesionEnHilo
+from backend.config.settings import settings
+from backend.core.hash_pool import PoolHash, PoolHashSaturado
+from backend.core.security import averify_password, hash_password, necesita_rehash
+from backend.models import Usuario
+from backend.services import AuthService, auth_service
+
+
+@pytest.fixture(autouse=True)
+def costo_bajo(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+
+
+def test_necesita_rehash():
+    """
+    Test: SHA-256 legacy y bcrypt con otro costo se rehacen; el vigente no
+    """
+    assert necesita_rehash(hashlib.sha256(b"clave").hexdigest())
+    assert necesita_rehash(bcrypt.hashpw(b"clave", bcrypt.gensalt(rounds=5)).decode())
+    assert not necesita_rehash(hash_password("clave"))
+
+
+def test_pool_rechaza_con_la_cola_llena():
+    """
+    Test: 1 hilo + 1 en cola; el tercer pedido falla sin esperar
+    """
+    pool = PoolHash(workers=1, max_cola=1)
+    liberar = threading.Event()
+
+    def lento():
+        liberar.wait(5)
+        return threading.current_thread().name
+
+    async def usar():
+        tareas = [asyncio.create_task(pool.ejecutar(lento)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolHashSaturado):
+            await pool.ejecutar(lento)
+        estado = pool.estado()
+        liberar.set()
+        return estado, await asyncio.gather(*tareas)
+
+    estado, hilos = asyncio.run(usar())
+    pool.cerrar()
+
+    assert (estado["en_curso"], estado["en_cola"], estado["rechazados"]) == (1, 1, 1)
+    assert all(hilo.startswith("bcrypt") for hilo in hilos)
+    assert pool.estado()["completados"] == 2
+
+
+@pytest.fixture
+def fabrica():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def _login(fabrica, usuario, password):
+    async def usar():
+        db = SesionEnHilo(fabrica())
+        try:
+            return await AuthService.aauthenticate_user(db, usuario, password)
+        finally:
+            await db.close()
+
+    return asyncio.run(usar())
+
+
+def test_login_rehace_hash_legacy(fabrica):
+    """
+    Test: un login correcto migra el SHA-256 a bcrypt; uno incorrecto no toca el hash
+    """
+    legacy = hashlib.sha256(b"admin123").hexdigest()
+    db = fabrica()
+    db.add(Usuario(usuario="admin", hash_password=legacy, rol="admin"))
+    db.commit()
+    db.close()
+
+    assert _login(fabrica, "admin", "otra") is None
+    assert fabrica().query(Usuario).one().hash_password == legacy
+
+    user = _login(fabrica, "admin", "admin123")
+    guardado = fabrica().query(Usuario).one().hash_password
+    assert user.hash_password == guardado
+    assert guardado.startswith("$2b$04$")
+    assert asyncio.run(averify_password("admin123", guardado))
+    assert _login(fabrica, "admin", "admin123") is not None
+
+
+def test_login_con_pool_saturado_pospone_el_rehash(fabrica, monkeypatch):
+    """
+    Test: si el rehash no entra en el pool, el login igual pasa y el hash queda legacy
+    """
+    legacy = hashlib.sha256(b"admin123").hexdigest()
+    db = fabrica()
+    db.add(Usuario(usuario="admin", hash_password=legacy, rol="admin"))
+    db.commit()
+    db.close()
+
+    async def saturado(password):
+        raise PoolHashSaturado("Demasiados hashes en espera")
+
+    monkeypatch.setattr(auth_service, "ahash_password", saturado)
+
+    assert _login(fabrica, "admin", "admin123") is not None
+    assert fabrica().query(Usuario).one().hash_password == legacy
@@ -0,0 +1,113 @@
+"""
+Tests del histograma por intervalos de tiempo
+=============================================
+
+Verifica intervalos densos (sin huecos) y filtros de SMSService.histograma.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.models import Verificacion
+from backend.services.estadisticas_service import EstadisticasService
+from backend.services.sms_service import SMSService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+
+    # Miércoles 2025-01-01 10:15 a domingo 2025-02-02
+    for fecha, sucursal, estado in [
+        (datetime(2025, 1, 1, 10, 15), "389", "enviado"),
+        (datetime(2025, 1, 1, 10, 45), "389", "fallido"),
+        (datetime(2025, 1, 1, 12, 5), "561", "enviado"),
+        (datetime(2025, 1, 3, 9, 0), "389", "enviado"),
+        (datetime(2025, 1, 6, 9, 0), "389", "test"),
+        (datetime(2025, 2, 2, 23, 59), "561", "enviado"),
+    ]:
+        sesion.add(Verificacion(
+            person_id="12345678", phone_number="3815551234", merchant_code=sucursal,
+            verification_code="1234", fecha=fecha, usuario_id=1, estado=estado
+        ))
+    sesion.commit()
+    EstadisticasService.reconstruir(sesion)
+
+    yield sesion
+    sesion.close()
+
+
+def _totales(histograma):
+    return [(b["inicio"], b["total"]) for b in histograma]
+
+
+def test_histograma_por_dia_denso(db):
+    """
+    Test: los días sin SMS aparecen con total 0
+    """
+    resultado = SMSService.histograma(db, "dia", datetime(2025, 1, 1), datetime(2025, 1, 4))
+
+    assert _totales(resultado) == [
+        (datetime(2025, 1, 1), 3),
+        (datetime(2025, 1, 2), 0),
+        (datetime(2025, 1, 3), 1),
+        (datetime(2025, 1, 4), 0),
+    ]
+
+
+def test_histograma_por_hora_con_filtros(db):
+    """
+    Test: intervalos por hora desde la tabla cruda, filtrando sucursal y estado
+    """
+    resultado = SMSService.histograma(
+        db, "hora", datetime(2025, 1, 1, 10, 30), datetime(2025, 1, 1, 12, 0),
+        sucursal="389", estados=["enviado"]
+    )
+
+    assert _totales(resultado) == [
+        (datetime(2025, 1, 1, 10), 1),
+        (datetime(2025, 1, 1, 11), 0),
+        (datetime(2025, 1, 1, 12), 0),
+    ]
+
+
+def test_histograma_por_semana_y_mes(db):
+    """
+    Test: las semanas empiezan el lunes y los meses el día 1
+    """
+    semanas = SMSService.histograma(db, "semana", datetime(2025, 1, 1), datetime(2025, 1, 12))
+    assert _totales(semanas) == [
+        (datetime(2024, 12, 30), 4),
+        (datetime(2025, 1, 6), 1),
+    ]
+
+    meses = SMSService.histograma(db, "mes", datetime(2024, 12, 15), datetime(2025, 2, 1))
+    assert _totales(meses) == [
+        (datetime(2024, 12, 1), 0),
+        (datetime(2025, 1, 1), 5),
+        (datetime(2025, 2, 1), 1),
+    ]
+
+
+def test_histograma_en_una_sola_consulta(db):
+    """
+    Test: todo el rango se resuelve con una única consulta agrupada
+    """
+    consultas = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: consultas.append(args[2]))
+
+    SMSService.histograma(db, "dia", datetime(2025, 1, 1), datetime(2025, 1, 31))
+
+    assert len(consultas) == 1
+    assert "GROUP BY" in consultas[0]
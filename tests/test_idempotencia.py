@@ -0,0 +1,144 @@
+"""
+Tests de la idempotencia de /send-sms
+=====================================
+
+Verifica que un reintento con la misma clave (header o derivada) devuelve
+la respuesta guardada sin volver a llamar al proveedor, que los envíos
+fallidos liberan la clave y que un duplicado en curso recibe 409. Sin
+Redis la deduplicación corre en memoria.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.core import get_current_user
+from backend.config.database import Base, SesionEnHilo, get_async_db
+from backend.config.settings import settings
+from backend.middleware.limitador import limitador
+from backend.models import Verificacion
+from backend.routes import sms
+from backend.services.idempotencia_service import IdempotenciaSMS, huella
+from backend.services.sms_service import SMSService
+from backend.services.usuario_cache import UsuarioSesion
+
+DATOS = {"personId": "12345678", "phoneNumber": "3815551234", "merchantCode": "389", "verificationCode": "4321"}
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine)
+
+    async def sesion():
+        db = SesionEnHilo(fabrica())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    llamadas = []
+    respuestas = []
+
+    async def enviar(phone_number, mensaje, modo_simulado=None):
+        llamadas.append(phone_number)
+        return respuestas.pop(0) if respuestas else {"ok": True, "mensaje": "OK"}
+
+    idempotencia = IdempotenciaSMS(ttl_seconds=60, ventana_seconds=120, reserva_seconds=60)
+    monkeypatch.setattr(sms, "idempotencia_sms", idempotencia)
+    monkeypatch.setattr(SMSService, "enviar_sms_async", staticmethod(enviar))
+    monkeypatch.setattr(settings, "SMS_MODO_SIMULADO", True)
+    monkeypatch.setattr(limitador, "enabled", False)
+
+    app = FastAPI()
+    app.include_router(sms.router)
+    app.dependency_overrides[get_async_db] = sesion
+    app.dependency_overrides[get_current_user] = lambda: UsuarioSesion(id=1, usuario="ana", rol="operador")
+
+    return TestClient(app), fabrica, llamadas, respuestas, idempotencia
+
+
+def test_reintento_con_header_no_reenvia(entorno):
+    """
+    Test: misma Idempotency-Key = una llamada al proveedor y una verificación
+    """
+    client, fabrica, llamadas, _, idempotencia = entorno
+    headers = {"Idempotency-Key": "envio-1"}
+
+    primera = client.post("/send-sms", json=DATOS, headers=headers)
+    segunda = client.post("/send-sms", json=DATOS, headers=headers)
+
+    assert primera.status_code == segunda.status_code == 200
+    assert segunda.json() == primera.json()
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert len(llamadas) == 1
+    assert fabrica().query(Verificacion).count() == 1
+    assert idempotencia.estado()["deduplicados"] == 1
+
+    otro_destino = client.post("/send-sms", json={**DATOS, "personId": "87654321"}, headers=headers)
+    assert otro_destino.status_code == 422
+    assert len(llamadas) == 1
+
+
+def test_clave_derivada_sin_header(entorno):
+    """
+    Test: sin header, el mismo destino y código se deduplica; un código nuevo se envía
+    """
+    client, fabrica, llamadas, _, _ = entorno
+
+    assert client.post("/send-sms", json=DATOS).status_code == 200
+    assert client.post("/send-sms", json=DATOS).headers.get("Idempotent-Replayed") == "true"
+    assert client.post("/send-sms", json={**DATOS, "verificationCode": "9999"}).status_code == 200
+
+    assert len(llamadas) == 2
+    assert fabrica().query(Verificacion).count() == 2
+
+
+def test_envio_fallido_libera_la_clave(entorno):
+    """
+    Test: si el proveedor falla, el reintento vuelve a enviar
+    """
+    client, fabrica, llamadas, respuestas, _ = entorno
+    respuestas.append({"ok": False, "mensaje": "Proveedor caído"})
+    headers = {"Idempotency-Key": "envio-2"}
+
+    assert client.post("/send-sms", json=DATOS, headers=headers).status_code == 500
+    reintento = client.post("/send-sms", json=DATOS, headers=headers)
+
+    assert reintento.status_code == 200
+    assert "Idempotent-Replayed" not in reintento.headers
+    assert len(llamadas) == 2
+
+
+def test_duplicado_en_curso(entorno):
+    """
+    Test: mientras el primer envío no termina, el duplicado recibe 409
+    """
+    client, _, llamadas, _, idempotencia = entorno
+    clave = idempotencia.clave(1, "envio-3", "12345678", "3815551234", "389", "4321")
+    asyncio.run(idempotencia.reservar(clave, huella("12345678", "3815551234", "389", "4321")))
+
+    respuesta = client.post("/send-sms", json=DATOS, headers={"Idempotency-Key": "envio-3"})
+
+    assert respuesta.status_code == 409
+    assert llamadas == []
+    assert idempotencia.estado()["en_curso"] == 1
+
+
+def test_franjas_de_la_clave_derivada():
+    """
+    Test: la clave derivada cambia de franja cada `ventana` segundos
+    """
+    idempotencia = IdempotenciaSMS(ttl_seconds=60, ventana_seconds=120, reserva_seconds=60)
+    clave = lambda ahora: idempotencia.clave(1, None, "12345678", "3815551234", "389", ahora=ahora)
+
+    assert clave(1200) == clave(1319)
+    assert clave(1200) != clave(1320)
+    assert idempotencia.clave(1, None, "12345678", "3815551234", "389", ahora=1200) \
+        == idempotencia.clave(2, None, "12345678", "3815551234", "389", ahora=1200)
@@ -0,0 +1,110 @@
+"""
+Tests de planes de consulta del panel de SMS
+============================================
+
+Verifica que las consultas de SMSService.get_verificaciones usan los
+índices creados por la migración m0001 (no recorren la tabla completa).
+
+SQLite se prueba siempre. PostgreSQL solo si TEST_POSTGRES_URL apunta a
+una base de pruebas (se crean y eliminan las tablas).
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.config.database import Base
+from backend.migrations import aplicar_migraciones, schema_migrations
+from backend.models import Verificacion
+from backend.services.sms_service import SMSService
+
+DESDE = datetime(2025, 1, 1)
+HASTA = datetime(2025, 1, 31)
+
+# (filtros del panel, índice esperado)
+CASOS = [
+    ({}, "ix_verificaciones_fecha"),
+    ({"fecha_inicio": DESDE, "fecha_fin": HASTA}, "ix_verificaciones_fecha"),
+    ({"usuario_id": 3, "fecha_inicio": DESDE}, "ix_verificaciones_usuario_fecha"),
+    ({"sucursal": "389", "fecha_inicio": DESDE, "fecha_fin": HASTA}, "ix_verificaciones_merchant_fecha"),
+    ({"estado": "fallido"}, "ix_verificaciones_estado_fecha"),
+]
+
+
+def _preparar(engine):
+    # Tablas SIN los índices del modelo: deben venir de la migración
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables["usuarios"]])
+    tabla = Base.metadata.tables["verificaciones"]
+    indices = set(tabla.indexes)
+    tabla.indexes.clear()
+    try:
+        tabla.create(engine)
+    finally:
+        tabla.indexes.update(indices)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Verificacion), [
+            {
+                "person_id": str(10000000 + i),
+                "phone_number": "3815551234",
+                "merchant_code": ["389", "561", "776", "777"][i % 4],
+                "verification_code": "1234",
+                "fecha": DESDE + timedelta(minutes=i),
+                "usuario_id": i % 20,
+                "estado": "fallido" if i % 10 == 0 else "enviado",
+            }
+            for i in range(2000)
+        ])
+
+    assert aplicar_migraciones(engine) == ["m0001_indices_verificaciones"]
+    assert aplicar_migraciones(engine) == []
+
+
+def _sql_panel(db, filtros):
+    """SQL de la página del panel (filtros + ORDER BY fecha DESC, id DESC + LIMIT)"""
+    query = SMSService.query_verificaciones(db, **filtros).order_by(
+        Verificacion.fecha.desc(), Verificacion.id.desc()
+    ).limit(5)
+    return query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+
+
+def test_plan_sqlite_usa_indices(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plan.db'}")
+    _preparar(engine)
+    db = sessionmaker(bind=engine)()
+
+    for filtros, indice in CASOS:
+        plan = " ".join(
+            str(fila[-1]) for fila in db.execute(text(f"EXPLAIN QUERY PLAN {_sql_panel(db, filtros)}"))
+        )
+        assert indice in plan, f"{filtros}: {plan}"
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, f"{filtros}: {plan}"
+
+    db.close()
+    engine.dispose()
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL no configurada")
+def test_plan_postgres_usa_indices():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    Base.metadata.drop_all(bind=engine)
+    schema_migrations.drop(engine, checkfirst=True)
+    _preparar(engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        db.execute(text("ANALYZE verificaciones"))
+        # Con pocas filas el planner prefiere seq scan: verificar que el índice es utilizable
+        db.execute(text("SET enable_seqscan = off"))
+        for filtros, indice in CASOS:
+            plan = " ".join(fila[0] for fila in db.execute(text(f"EXPLAIN {_sql_panel(db, filtros)}")))
+            assert indice in plan, f"{filtros}: {plan}"
+    finally:
+        db.rollback()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        schema_migrations.drop(engine, checkfirst=True)
+        engine.dispose()
@@ -0,0 +1,253 @@
+"""
+Tests del limitador de ventana deslizante
+=========================================
+
+Verifica las ventanas combinadas (minuto/hora/día), los multiplicadores por
+rol y que en ningún intervalo de `period` pasan más de `limit` requests. El
+script Lua se prueba contra el mismo algoritmo en memoria si hay Redis
+(REDIS_URL).
+"""
+
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from backend.config import redis_config, settings
+from backend.config.rate_limits import RATE_LIMITS, ROLE_MULTIPLIERS, aplicar_overrides
+from backend.core import get_current_user_optional
+from backend.middleware import rate_limiting
+from backend.middleware.limitador import Limitador, limitador
+from backend.middleware.rate_limiting import get_real_ip, guardar_override, limitar
+from backend.services.usuario_cache import UsuarioSesion
+
+SMS = ("sms_enviar", "sms_enviar_por_hora", "sms_enviar_por_dia")
+
+
+def _evaluar(limitador, limit_keys, ahora, rol="operador", identificador="user:ana"):
+    return asyncio.run(limitador.evaluar(identificador, limit_keys, rol=rol, ahora=ahora))
+
+
+def test_rafaga_y_reintento():
+    """
+    Test: 50 SMS seguidos pasan, el 51 espera a que venza el primero (60s)
+    """
+    limitador = Limitador()
+    for i in range(50):
+        resultado = _evaluar(limitador, SMS, ahora=0)
+        assert resultado.permitido and resultado.restantes == 49 - i
+
+    bloqueado = _evaluar(limitador, SMS, ahora=0)
+    assert not bloqueado.permitido
+    assert (bloqueado.limit_key, bloqueado.retry_after) == ("sms_enviar", 60)
+
+    assert not _evaluar(limitador, SMS, ahora=1200).permitido
+    assert not _evaluar(limitador, SMS, ahora=59_999).permitido
+    assert _evaluar(limitador, SMS, ahora=60_000).permitido
+
+
+def test_sin_rafaga_doble_en_el_borde():
+    """
+    Test: en cualquier intervalo de 60s pasan como mucho 50 (la ventana fija dejaba 100)
+    """
+    limitador = Limitador()
+    permitidos = sum(_evaluar(limitador, ("sms_enviar",), ahora=59_000).permitido for _ in range(60))
+    permitidos += sum(_evaluar(limitador, ("sms_enviar",), ahora=61_000).permitido for _ in range(60))
+    assert permitidos == 50
+
+
+@pytest.mark.parametrize("limit_key", ["sms_enviar", "login_intentos"])
+def test_sin_goteo_tras_la_rafaga(limit_key):
+    """
+    Test: ráfaga completa y después un request por intervalo: nunca más de `limit` por período
+    """
+    limitador = Limitador()
+    config = RATE_LIMITS[limit_key]
+    periodo, intervalo = config.period * 1000, config.period * 1000 / config.limit
+
+    permitidos = [0] * sum(_evaluar(limitador, (limit_key,), ahora=0).permitido for _ in range(config.limit))
+    ahora = 0
+    while ahora < 3 * periodo:
+        ahora += intervalo
+        if _evaluar(limitador, (limit_key,), ahora=ahora).permitido:
+            permitidos.append(ahora)
+
+    assert permitidos.count(0) == config.limit
+    for momento in permitidos:
+        en_la_ventana = [otro for otro in permitidos if momento - periodo < otro <= momento]
+        assert len(en_la_ventana) <= config.limit
+    # GCRA dejaba pasar ~2x en el primer período
+    assert len([m for m in permitidos if m < periodo]) == config.limit
+
+
+def test_ventana_mas_restrictiva_manda():
+    """
+    Test: espaciando los envíos el minuto nunca corta, pero la hora sí (90/hora)
+    """
+    limitador = Limitador()
+    ahora = 0
+    while _evaluar(limitador, SMS, ahora=ahora).permitido:
+        ahora += 1250  # 48 por minuto
+
+    # Ninguno de los 90 vence dentro de la hora
+    assert ahora // 1250 == 90
+    bloqueado = _evaluar(limitador, SMS, ahora=ahora)
+    assert (bloqueado.limit_key, bloqueado.limite, bloqueado.periodo) == ("sms_enviar_por_hora", 90, 3600)
+
+    # Los rechazos no consumieron el día
+    assert len(limitador._memoria["ratelimit:sms_enviar_por_dia:user:ana"]) == 90
+
+
+def test_multiplicador_por_rol():
+    """
+    Test: admin tiene 3x el límite; guest 0.3x (nunca menos de 1)
+    """
+    limitador = Limitador()
+    admin = [_evaluar(limitador, ("login_intentos",), 0, rol="admin", identificador="a") for _ in range(16)]
+    guest = [_evaluar(limitador, ("login_intentos",), 0, rol="guest", identificador="g") for _ in range(2)]
+
+    assert [r.permitido for r in admin].count(True) == 15
+    assert [r.permitido for r in guest] == [True, False]
+    assert admin[0].limite == 15 and guest[0].limite == 1
+
+
+def test_uso_desde_el_log():
+    """
+    Test: el uso mostrado en el panel son los requests del último período
+    """
+    limitador = Limitador()
+    for ahora in (0, 0, 0, 30_000, 30_000):
+        _evaluar(limitador, ("sms_enviar",), ahora=ahora)
+
+    log = limitador._memoria["ratelimit:sms_enviar:user:ana"]
+    assert Limitador.uso(log, 60, ahora=30_000) == 5
+    assert Limitador.uso(log, 60, ahora=60_000) == 2
+    assert Limitador.uso(log, 60, ahora=90_000) == 0
+
+
+def test_dependencia_responde_429():
+    """
+    Test: la dependencia agrega headers y corta con el 429 de siempre
+    """
+    limitador.reset_memoria()
+    app = FastAPI()
+
+    @app.post("/login")
+    def login(_limite=Depends(limitar("login_intentos"))):
+        return {"ok": True}
+
+    client = TestClient(app)
+    respuestas = [client.post("/login") for _ in range(6)]
+
+    assert [r.status_code for r in respuestas] == [200] * 5 + [429]
+    assert respuestas[0].headers["X-RateLimit-Remaining"] == "4"
+    assert respuestas[-1].json()["detail"]["retry_after"] == 300
+    assert respuestas[-1].headers["Retry-After"] == "300"
+
+
+def _app_login(usuario=None):
+    limitador.reset_memoria()
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(limitar("login_intentos"))])
+    def login():
+        return {"ok": True}
+
+    app.dependency_overrides[get_current_user_optional] = lambda: usuario
+    return app
+
+
+def test_limite_por_usuario_y_rol():
+    """
+    Test: logueados detrás de la misma IP no comparten cupo y el rol multiplica
+    """
+    ana = TestClient(_app_login(UsuarioSesion(id=1, usuario="ana", rol="admin")))
+    assert [ana.post("/login").status_code for _ in range(16)].count(429) == 1
+
+    beto = TestClient(_app_login(UsuarioSesion(id=2, usuario="beto", rol="operador")))
+    respuesta = beto.post("/login")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["X-RateLimit-Limit"] == "5"
+
+
+def test_whitelist_sin_limite(monkeypatch):
+    """
+    Test: una IP de la whitelist no tiene límite
+    """
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["testclient"])
+    client = TestClient(_app_login())
+    headers = {"X-Forwarded-For": "127.0.0.1"}
+    assert all(client.post("/login", headers=headers).status_code == 200 for _ in range(10))
+
+
+def test_ip_real_solo_desde_proxy_de_confianza(monkeypatch):
+    """
+    Test: X-Forwarded-For se ignora si la conexión no viene de un proxy propio
+    """
+    def request(cliente, forwarded):
+        headers = [(b"x-forwarded-for", forwarded.encode())]
+        return Request({"type": "http", "client": (cliente, 1234), "headers": headers})
+
+    assert get_real_ip(request("8.8.8.8", "127.0.0.1")) == "8.8.8.8"
+    assert get_real_ip(request("127.0.0.1", "127.0.0.1, 1.2.3.4")) == "1.2.3.4"
+
+    # Proxy en otro contenedor: rango CIDR de la red de Docker
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["127.0.0.1", "172.16.0.0/12"])
+    assert get_real_ip(request("172.18.0.5", "1.2.3.4")) == "1.2.3.4"
+    assert get_real_ip(request("172.18.0.5", "1.2.3.4, 172.18.0.9")) == "1.2.3.4"
+    assert get_real_ip(request("10.0.0.5", "1.2.3.4")) == "10.0.0.5"
+
+
+def test_cambio_de_limite_en_caliente(monkeypatch):
+    """
+    Test: un cambio desde el panel rige en el próximo request, y se puede deshacer
+    """
+    monkeypatch.setattr(rate_limiting, "get_redis_async", lambda: None)
+    monkeypatch.setattr(rate_limiting, "_overrides_locales", {})
+    try:
+        assert asyncio.run(guardar_override("limite:login_intentos", "2/60"))
+        assert asyncio.run(guardar_override("rol:guest", "2"))
+        assert (RATE_LIMITS["login_intentos"].limit, ROLE_MULTIPLIERS["guest"]) == (2, 2.0)
+
+        client = TestClient(_app_login())
+        assert [client.post("/login").status_code for _ in range(3)] == [200, 200, 429]
+
+        assert asyncio.run(guardar_override("limite:login_intentos", None))
+        assert RATE_LIMITS["login_intentos"].limit == 5
+    finally:
+        aplicar_overrides({})
+
+    assert ROLE_MULTIPLIERS["guest"] == 0.3
+
+
+def test_script_lua_igual_que_memoria():
+    """
+    Test: el script en Redis decide lo mismo que el algoritmo en memoria
+    """
+    async def comparar():
+        cliente = await redis_config.iniciar_redis_async()
+        try:
+            try:
+                await cliente.ping()
+            except Exception:
+                pytest.skip("Redis no disponible")
+
+            claves = [Limitador.clave(k, "test:lua") for k in SMS]
+            await cliente.delete(*claves)
+            await cliente.set(claves[0], "1000000.0")  # TAT de la versión GCRA
+            redis_lim, memoria = Limitador(), Limitador()
+            redis_lim._memoria = None  # Falla si cae al respaldo en memoria
+
+            for i in range(120):
+                ahora = 1_000_000 + i * 500
+                esperado = memoria.evaluar_memoria(claves, SMS, Limitador.ventanas(SMS), ahora)
+                assert await redis_lim.evaluar("test:lua", SMS, ahora=ahora) == esperado
+
+            assert 0 < await cliente.pttl(claves[2]) <= 86_400_000
+            await cliente.delete(*claves)
+        finally:
+            await redis_config.cerrar_redis_async()
+
+    asyncio.run(comparar())
@@ -0,0 +1,80 @@
+"""
+Tests de los middlewares ASGI
+=============================
+
+Verifica que el logging agrega X-Process-Time con datos estructurados y que
+los estáticos no pasan por el log ni por el filtro de IPs.
+"""
+
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.middleware import LoggingMiddleware
+from backend.middleware.rate_limiting import RestriccionIPMiddleware
+from backend.services.filtro_ip import FiltroIP
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(LoggingMiddleware)
+    app.add_middleware(RestriccionIPMiddleware)
+
+    @app.get("/health")
+    def health():
+        return {"status": "healthy"}
+
+    @app.get("/static/app.css")
+    def estatico():
+        return PlainTextResponse("body {}")
+
+    return app
+
+
+def test_logging_estructurado(caplog):
+    """
+    Test: el log lleva method/path/status/duración y la response X-Process-Time
+    """
+    client = TestClient(_app())
+    with caplog.at_level(logging.INFO, logger="backend.middleware.logging_middleware"):
+        respuesta = client.get("/health")
+        client.get("/static/app.css")
+
+    assert respuesta.status_code == 200
+    assert float(respuesta.headers["X-Process-Time"]) >= 0
+
+    registro = caplog.records[-1]
+    assert (registro.method, registro.path, registro.status) == ("GET", "/health", 200)
+    assert registro.duracion_ms >= 0
+    assert not any("/static" in r.getMessage() for r in caplog.records)
+
+
+def test_tiempo_sin_log_info(caplog):
+    """
+    Test: con INFO deshabilitado no se loguea, pero X-Process-Time sigue en la response
+    """
+    client = TestClient(_app())
+    with caplog.at_level(logging.WARNING, logger="backend.middleware.logging_middleware"):
+        respuesta = client.get("/health")
+
+    assert float(respuesta.headers["X-Process-Time"]) >= 0
+    assert not caplog.records
+
+
+def test_estaticos_sin_filtro_de_ip(monkeypatch):
+    """
+    Test: una IP bloqueada recibe 403 en la API pero los estáticos se sirven igual
+    """
+    filtro = FiltroIP()
+    filtro.compilar([("203.0.113.0/24", "bloquear")])
+    filtro._cargada, filtro._vence = True, float("inf")
+    monkeypatch.setattr("backend.middleware.rate_limiting.filtro_ip", filtro)
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["testclient"])
+
+    client = TestClient(_app())
+    headers = {"X-Forwarded-For": "203.0.113.7"}
+    assert client.get("/health", headers=headers).status_code == 403
+    assert client.get("/static/app.css", headers=headers).status_code == 200
@@ -0,0 +1,71 @@
+"""
+Tests de la caché de nombres de usuario
+=======================================
+
+Verifica que el listado del panel resuelve nombres sin leer toda la tabla
+de usuarios y que la caché se invalida al editar.
+"""
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.models import Usuario
+from backend.services import UserService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+    sesion.execute(insert(Usuario), [
+        {"id": i, "usuario": f"user{i}", "hash_password": "x", "rol": "operador"}
+        for i in range(1, 1501)
+    ])
+    sesion.commit()
+
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+    sesion.consultas = consultas
+
+    UserService.invalidar_nombres()
+    yield sesion
+    UserService.invalidar_nombres()
+    sesion.close()
+
+
+def test_nombres_con_cache(db):
+    """
+    Test: una consulta para los faltantes, ninguna si ya están en caché
+    """
+    nombres = UserService.get_nombres(db, [1, 1400, 1400, 9999])
+    assert nombres == {1: "user1", 1400: "user1400"}
+    assert len(db.consultas) == 1
+
+    assert UserService.get_nombres(db, [1400, 1]) == {1: "user1", 1400: "user1400"}
+    assert len(db.consultas) == 1
+
+    UserService.get_nombres(db, [1, 2])
+    assert len(db.consultas) == 2
+    assert "IN" in db.consultas[-1]
+
+
+def test_invalidar_al_editar(db):
+    """
+    Test: tras invalidar se lee el nombre nuevo
+    """
+    assert UserService.get_nombres(db, [5]) == {5: "user5"}
+
+    db.query(Usuario).filter(Usuario.id == 5).update({"usuario": "renombrado"})
+    db.commit()
+    assert UserService.get_nombres(db, [5]) == {5: "user5"}
+
+    UserService.invalidar_nombres(5)
+    assert UserService.get_nombres(db, [5]) == {5: "renombrado"}
@@ -0,0 +1,116 @@
+"""
+Tests de paginación por cursor del panel de SMS
+===============================================
+
+Verifica que recorrer las páginas con next_cursor / prev_cursor devuelve
+los mismos registros que la paginación por offset, incluso con fechas
+repetidas.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.models import Verificacion
+from backend.services import sms_service
+from backend.services.sms_service import SMSService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+
+    base = datetime(2025, 1, 1, 12, 0)
+    for i in range(23):
+        sesion.add(Verificacion(
+            person_id=str(10000000 + i),
+            phone_number="3815551234",
+            merchant_code="389" if i % 2 else "561",
+            verification_code="1234",
+            # De a tres registros con la misma fecha: el id desempata
+            fecha=base + timedelta(minutes=i // 3),
+            usuario_id=1,
+            estado="enviado"
+        ))
+    sesion.commit()
+
+    yield sesion
+    sesion.close()
+
+
+def _ids(verificaciones):
+    return [v.id for v in verificaciones]
+
+
+def test_cursor_recorre_igual_que_offset(db):
+    """
+    Test: avanzar con next_cursor y volver con prev_cursor reproduce las páginas por offset
+    """
+    paginas_offset = [
+        _ids(SMSService.get_verificaciones(db, skip=skip, limit=5)[0])
+        for skip in range(0, 23, 5)
+    ]
+
+    paginas, cursores = [], []
+    cursor = None
+    while True:
+        filas, siguiente, anterior = SMSService.get_verificaciones_cursor(db, cursor=cursor, limit=5)
+        paginas.append(_ids(filas))
+        cursores.append(anterior)
+        if not siguiente:
+            break
+        cursor = siguiente
+
+    assert paginas == paginas_offset
+    assert cursores[0] is None
+
+    # Volver hacia atrás desde la última página
+    filas, siguiente, anterior = SMSService.get_verificaciones_cursor(db, cursor=cursores[-1], limit=5)
+    assert _ids(filas) == paginas_offset[-2]
+    assert siguiente is not None and anterior is not None
+
+
+def test_cursor_con_filtros(db):
+    """
+    Test: el cursor respeta los filtros del panel
+    """
+    filas, siguiente, _ = SMSService.get_verificaciones_cursor(db, limit=10, sucursal="389")
+    resto, fin, _ = SMSService.get_verificaciones_cursor(db, cursor=siguiente, limit=10, sucursal="389")
+
+    assert all(v.merchant_code == "389" for v in filas + resto)
+    assert len(filas) + len(resto) == 11
+    assert fin is None
+
+
+def test_cursor_invalido(db):
+    """
+    Test: un cursor alterado se rechaza con ValueError
+    """
+    with pytest.raises(ValueError):
+        SMSService.get_verificaciones_cursor(db, cursor="no-es-un-cursor")
+
+
+def test_total_en_cache(db):
+    """
+    Test: el total se reutiliza dentro del TTL
+    """
+    sms_service._conteo_cache.clear()
+    assert SMSService.contar_verificaciones(db, sucursal="561") == 12
+
+    db.add(Verificacion(
+        person_id="99999999", phone_number="3815551234", merchant_code="561",
+        verification_code="1234", fecha=datetime(2025, 2, 1), usuario_id=1, estado="enviado"
+    ))
+    db.commit()
+
+    assert SMSService.contar_verificaciones(db, sucursal="561") == 12
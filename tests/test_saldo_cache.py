@@ -0,0 +1,123 @@
+"""
+Tests de la caché de saldo
+==========================
+
+Verifica TTL, single-flight y decremento local sin llamar al proveedor real.
+"""
+
+import asyncio
+from typing import Optional
+
+from backend.services.saldo_service import SaldoCache
+from backend.services.sms_service import SMSService
+
+
+def _mock_proveedor(monkeypatch, saldo: Optional[int] = 100, demora: float = 0.05):
+    """Reemplaza la consulta real por una que cuenta las llamadas"""
+    llamadas = {"total": 0}
+
+    async def consultar():
+        llamadas["total"] += 1
+        await asyncio.sleep(demora)
+        return saldo
+
+    monkeypatch.setattr(SMSService, "consultar_saldo_async", staticmethod(consultar))
+    return llamadas
+
+
+def test_single_flight_en_cache_miss(monkeypatch):
+    """
+    Test: N requests concurrentes con caché vacía hacen UNA sola llamada upstream
+    """
+    llamadas = _mock_proveedor(monkeypatch)
+    cache = SaldoCache(ttl_seconds=30, refresh_interval=0)
+
+    async def escenario():
+        return await asyncio.gather(*(cache.obtener() for _ in range(50)))
+
+    resultados = asyncio.run(escenario())
+
+    assert resultados == [100] * 50
+    assert llamadas["total"] == 1
+
+
+def test_decremento_local_y_ttl(monkeypatch):
+    """
+    Test: el saldo se descuenta localmente y no se consulta mientras está vigente
+    """
+    llamadas = _mock_proveedor(monkeypatch, saldo=10)
+    cache = SaldoCache(ttl_seconds=30, refresh_interval=0)
+
+    async def escenario():
+        await cache.obtener()
+        cache.decrementar()
+        cache.decrementar(3)
+        return await cache.obtener()
+
+    assert asyncio.run(escenario()) == 6
+    assert llamadas["total"] == 1
+
+
+def test_respuesta_no_numerica_tambien_se_cachea(monkeypatch):
+    """
+    Test: un saldo desconocido (None) no dispara una consulta por request
+    """
+    llamadas = _mock_proveedor(monkeypatch, saldo=None)
+    cache = SaldoCache(ttl_seconds=30, refresh_interval=0)
+
+    async def escenario():
+        return [await cache.obtener() for _ in range(5)]
+
+    assert asyncio.run(escenario()) == [None] * 5
+    assert llamadas["total"] == 1
+    assert cache.estado()["vigente"] is True
+
+    cache.invalidar()
+    asyncio.run(cache.obtener())
+    assert llamadas["total"] == 2
+
+
+def test_valor_en_cache_si_el_proveedor_falla(monkeypatch):
+    """
+    Test: si el refresco falla se sigue sirviendo el último saldo conocido
+    """
+    _mock_proveedor(monkeypatch, saldo=42)
+    cache = SaldoCache(ttl_seconds=30, refresh_interval=0)
+    asyncio.run(cache.obtener())
+
+    async def caido():
+        raise ConnectionError("proveedor caído")
+
+    monkeypatch.setattr(SMSService, "consultar_saldo_async", staticmethod(caido))
+
+    assert asyncio.run(cache.obtener(forzar=True)) == 42
+    assert cache.estado()["ultimo_error"] == "proveedor caído"
+
+
+def test_proveedor_caido_no_se_consulta_en_cada_request(monkeypatch):
+    """
+    Test: vencido el TTL con el proveedor caído, se sirve el valor viejo sin reintentar en cada request
+    """
+    _mock_proveedor(monkeypatch, saldo=42)
+    cache = SaldoCache(ttl_seconds=30, refresh_interval=0)
+    asyncio.run(cache.obtener())
+    cache._actualizado -= 31
+
+    llamadas = {"total": 0}
+
+    async def caido():
+        llamadas["total"] += 1
+        raise ConnectionError("proveedor caído")
+
+    monkeypatch.setattr(SMSService, "consultar_saldo_async", staticmethod(caido))
+
+    async def escenario():
+        return [await cache.obtener() for _ in range(5)]
+
+    assert asyncio.run(escenario()) == [42] * 5
+    assert llamadas["total"] == 1
+
+    # Pasada la espera se vuelve a probar
+    cache._espera_error_hasta -= SaldoCache.ESPERA_ERROR + 1
+    asyncio.run(cache.obtener())
+    assert llamadas["total"] == 2
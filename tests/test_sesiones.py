@@ -0,0 +1,152 @@
+"""
+Tests del almacenamiento de sesiones en Redis
+=============================================
+
+Verifica que las sesiones se guardan como hash y que el TTL solo se
+renueva cuando el último touch es viejo. Requiere Redis (REDIS_URL).
+"""
+
+import asyncio
+import json
+
+import pytest
+import redis
+
+from backend.config import redis_config
+from backend.services.session_service import RedisSessionStore
+
+
+@pytest.fixture
+def store():
+    store = RedisSessionStore()
+    try:
+        store.redis.ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip("Redis no disponible")
+
+    creadas = []
+    store.creadas = creadas
+    yield store
+    for session_id in creadas:
+        store.delete_session(session_id)
+
+
+def _crear(store, **datos):
+    session_id = store.create_session({"usuario": "ana", "rol": "admin", "id": 3, "email": None, **datos})
+    store.creadas.append(session_id)
+    return session_id, f"session:{session_id}"
+
+
+def test_sesion_como_hash(store):
+    """
+    Test: los datos se guardan como hash y conservan sus tipos
+    """
+    session_id, key = _crear(store)
+
+    assert store.redis.type(key) == "hash"
+    datos = store.get_session(session_id)
+    assert (datos["usuario"], datos["id"], datos["email"]) == ("ana", 3, None)
+
+
+def test_touch_solo_si_es_viejo(store):
+    """
+    Test: leer no reescribe la sesión hasta pasar touch_seconds
+    """
+    session_id, key = _crear(store)
+    ultima = store.redis.hget(key, "last_activity")
+
+    store.redis.expire(key, store.expire_seconds - store.touch_seconds + 10)
+    store.get_session(session_id)
+    assert store.redis.hget(key, "last_activity") == ultima
+    assert store.redis.ttl(key) <= store.expire_seconds - store.touch_seconds + 10
+
+    store.redis.expire(key, store.expire_seconds - store.touch_seconds - 1)
+    store.get_session(session_id)
+    assert store.redis.ttl(key) > store.expire_seconds - store.touch_seconds
+
+
+def test_update_no_crea_sesiones(store):
+    """
+    Test: update_session actualiza campos y no resucita sesiones borradas
+    """
+    session_id, key = _crear(store)
+    store.update_session(session_id, {"rol": "operador"})
+    assert store.get_session(session_id)["rol"] == "operador"
+
+    store.delete_session(session_id)
+    store.update_session(session_id, {"rol": "admin"})
+    assert not store.redis.exists(key)
+
+
+def test_migra_sesion_legacy(store):
+    """
+    Test: una sesión guardada como JSON plano se sigue leyendo y pasa a hash
+    """
+    session_id = "legacy-test"
+    key = f"session:{session_id}"
+    store.creadas.append(session_id)
+    store.redis.set(key, json.dumps({"usuario": "ana", "id": 3}), ex=100)
+
+    assert store.get_session(session_id) == {"usuario": "ana", "id": 3}
+    assert store.redis.type(key) == "hash"
+    assert 0 < store.redis.ttl(key) <= 100
+
+
+def test_listar_sesiones_paginado(store):
+    """
+    Test: recorrer las páginas con next_cursor devuelve todas las sesiones
+    """
+    creadas = {_crear(store, id=i)[0] for i in range(30)}
+
+    vistas, cursor = set(), 0
+    while True:
+        sesiones, cursor = store.listar_sesiones(cursor, limite=10)
+        vistas |= {s["session_id"] for s in sesiones}
+        if not cursor:
+            break
+
+    assert creadas <= vistas
+    assert store.contar_sesiones() >= len(creadas)
+
+
+def test_cerrar_sesiones_de_usuario(store):
+    """
+    Test: revoke_user_sessions cierra todas las sesiones del usuario salvo la indicada
+    """
+    propia, _ = _crear(store, id=777)
+    otras = [_crear(store, id=777)[0] for _ in range(3)]
+    ajena, _ = _crear(store, id=778)
+
+    assert set(store.get_user_session_ids(777)) == {propia, *otras}
+
+    assert store.revoke_user_sessions(777, excepto=propia) == 3
+    assert store.get_session(propia) is not None
+    assert all(store.get_session(s) is None for s in otras)
+    assert store.get_session(ajena) is not None
+    assert store.get_user_session_ids(777) == [propia]
+
+    store.delete_session(propia)
+    assert store.get_user_session_ids(777) == []
+
+
+def test_variantes_async_con_pool_compartido(store):
+    """
+    Test: las variantes async (pool redis.asyncio) leen y escriben lo mismo que las síncronas
+    """
+    async def flujo():
+        await redis_config.iniciar_redis_async()
+        try:
+            session_id = await store.acreate_session({"usuario": "ana", "id": 779})
+            store.creadas.append(session_id)
+            assert await store.aget_session(session_id) == store.get_session(session_id)
+            assert store.get_user_session_ids(779) == [session_id]
+
+            await store.adelete_session(session_id)
+            assert store.get_session(session_id) is None
+            assert store.get_user_session_ids(779) == []
+
+            assert (await redis_config.estado_redis())["conectado"]
+        finally:
+            await redis_config.cerrar_redis_async()
+
+    asyncio.run(flujo())
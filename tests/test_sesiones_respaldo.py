@@ -0,0 +1,143 @@
+"""
+Tests del almacenamiento de sesiones con respaldo en memoria
+============================================================
+
+Verifica la caché local del modo de dos niveles y el failover a memoria
+cuando Redis no responde. No requiere Redis.
+"""
+
+import pytest
+import redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from backend.services.session_service import (
+    CircuitBreaker,
+    MemorySessionStore,
+    RedisSessionStore,
+    SessionBackend,
+    TwoTierSessionStore,
+)
+
+
+class RemotoDePrueba(MemorySessionStore):
+    """Nivel remoto que cuenta lecturas y puede simular una caída"""
+
+    def __init__(self):
+        super().__init__()
+        self.lecturas = 0
+        self.caido = False
+
+    def guardar(self, session_id, session_data, ttl=None):
+        if self.caido:
+            raise RedisConnectionError("caído")
+        super().guardar(session_id, session_data, ttl)
+
+    def get_session(self, session_id):
+        if self.caido:
+            raise RedisConnectionError("caído")
+        self.lecturas += 1
+        return super().get_session(session_id)
+
+
+def _dos_niveles(remoto, espera=30):
+    return TwoTierSessionStore(remoto, MemorySessionStore(), CircuitBreaker(3, espera), ttl_local=60)
+
+
+def test_memoria_basico():
+    """
+    Test: crear, actualizar, listar y revocar en memoria
+    """
+    store = MemorySessionStore()
+    a = store.create_session({"usuario": "ana", "id": 1})
+    b = store.create_session({"usuario": "ana", "id": 1})
+    c = store.create_session({"usuario": "beto", "id": 2})
+
+    store.update_session(a, {"rol": "admin"})
+    assert store.get_session(a)["rol"] == "admin"
+    assert len(store.get_all_sessions()) == 3
+
+    pagina, cursor = store.listar_sesiones(0, 2)
+    assert len(pagina) == 2 and cursor == 2
+    assert store.contar_sesiones() == 3
+
+    assert store.revoke_user_sessions(1, excepto=a) == 1
+    assert store.get_session(b) is None
+    assert store.get_session(a) and store.get_session(c)
+
+
+def test_backend_incompleto_falla_al_construir():
+    """
+    Test: un backend al que le falta un método no se puede instanciar
+    """
+    class SinListado(SessionBackend):
+        guardar = MemorySessionStore.guardar
+        get_session = MemorySessionStore.get_session
+
+    with pytest.raises(TypeError, match="abstract"):
+        SinListado()
+
+    for backend in (MemorySessionStore, RedisSessionStore, TwoTierSessionStore):
+        assert not backend.__abstractmethods__
+
+
+def test_lru_acotado():
+    """
+    Test: la memoria no crece por encima de max_entradas
+    """
+    store = MemorySessionStore(max_entradas=2)
+    primera = store.create_session({"id": 1})
+    store.create_session({"id": 2})
+    store.create_session({"id": 3})
+
+    assert store.get_session(primera) is None
+    assert len(store.get_all_sessions()) == 2
+
+
+def test_cache_local_evita_round_trip():
+    """
+    Test: una sesión caliente se sirve desde memoria sin consultar el nivel remoto
+    """
+    remoto = RemotoDePrueba()
+    store = _dos_niveles(remoto)
+
+    session_id = store.create_session({"usuario": "ana", "id": 1})
+    for _ in range(5):
+        assert store.get_session(session_id)["usuario"] == "ana"
+    assert remoto.lecturas == 0
+
+    store.delete_session(session_id)
+    assert store.get_session(session_id) is None
+
+
+def test_failover_y_recuperacion():
+    """
+    Test: con el remoto caído se puede loguear; al volver la sesión pasa al remoto
+    """
+    remoto = RemotoDePrueba()
+    store = _dos_niveles(remoto, espera=0)
+    remoto.caido = True
+
+    session_id = store.create_session({"usuario": "ana", "id": 1})
+    assert store.get_session(session_id)["usuario"] == "ana"
+
+    remoto.caido = False
+    store._sincronizadas.clear()
+    assert store.get_session(session_id)["usuario"] == "ana"
+    assert remoto.get_session(session_id)["usuario"] == "ana"
+
+
+def test_circuito_se_abre_con_redis_caido():
+    """
+    Test: con Redis inalcanzable el circuito se abre y no se reintenta en cada request
+    """
+    redis_store = RedisSessionStore()
+    redis_store.redis = redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.2)
+    store = TwoTierSessionStore(redis_store, MemorySessionStore(), CircuitBreaker(3, 30), ttl_local=60)
+
+    session_id = store.create_session({"usuario": "ana", "id": 1})
+    store._sincronizadas.clear()
+    for _ in range(3):
+        assert store.get_session(session_id)["usuario"] == "ana"
+
+    assert store.estado()["circuito"] == "abierto"
+    assert store.get_session("no-existe") is None
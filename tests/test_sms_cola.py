@@ -0,0 +1,170 @@
+"""
+Tests de la cola persistente de SMS
+===================================
+
+Verifica la toma atómica, el backoff de reintentos y el paso a dead-letter
+sobre una base SQLite en memoria.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config.database import Base
+from backend.config.settings import settings
+from backend.models import Verificacion, SmsCola
+from backend.services.sms_cola_service import LEASE_PERDIDO, SMSColaService, duracion_lease
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    sesion = sessionmaker(bind=engine)()
+    yield sesion
+    sesion.close()
+
+
+def _encolar(db, codigo: str = "1234") -> Verificacion:
+    return SMSColaService.encolar(
+        db=db,
+        person_id="12345678",
+        phone_number="3815551234",
+        merchant_code="389",
+        verification_code=codigo,
+        usuario_id=1,
+        texto=f"389 - Test - Su Codigo es: {codigo}"
+    )
+
+
+def test_encolar_y_reclamar_una_sola_vez(db):
+    """
+    Test: un SMS encolado lo toma un solo worker
+    """
+    verificacion = _encolar(db)
+    assert verificacion.estado == "encolado"
+
+    job = SMSColaService.reclamar(db)
+    assert job["verificacion_id"] == verificacion.id
+    assert job["intentos"] == 1
+
+    # Con el lease vigente nadie más puede tomarlo
+    assert SMSColaService.reclamar(db) is None
+
+    SMSColaService.completar(db, job, "enviado")
+    db.refresh(verificacion)
+    assert verificacion.estado == "enviado"
+    assert db.query(SmsCola).count() == 0
+
+
+def test_fallo_programa_reintento_con_backoff(db):
+    """
+    Test: un fallo deja el SMS en "reintentando" y no disponible hasta el backoff
+    """
+    verificacion = _encolar(db)
+    job = SMSColaService.reclamar(db)
+
+    assert SMSColaService.registrar_fallo(db, job, "timeout") == "reintentando"
+
+    db.refresh(verificacion)
+    entrada = db.query(SmsCola).one()
+    assert verificacion.estado == "reintentando"
+    assert entrada.estado == "pendiente"
+    assert entrada.ultimo_error == "timeout"
+    assert entrada.proximo_intento > entrada.fecha_creacion
+    assert SMSColaService.reclamar(db) is None
+
+
+def test_dead_letter_al_agotar_intentos(db, monkeypatch):
+    """
+    Test: al llegar al máximo de intentos pasa a dead-letter y la verificación a "fallido"
+    """
+    monkeypatch.setattr(settings, "SMS_COLA_MAX_INTENTOS", 2)
+    monkeypatch.setattr(settings, "SMS_COLA_BACKOFF_BASE", 0.0)
+    verificacion = _encolar(db)
+
+    for _ in range(2):
+        job = SMSColaService.reclamar(db)
+        estado = SMSColaService.registrar_fallo(db, job, "proveedor caído")
+
+    assert estado == "fallido"
+    db.refresh(verificacion)
+    assert verificacion.estado == "fallido"
+    assert SMSColaService.resumen(db) == {"dead": 1}
+    assert SMSColaService.reclamar(db) is None
+
+    # Reintento manual desde el panel
+    assert SMSColaService.reintentar(db, job["id"]) is True
+    assert SMSColaService.reclamar(db)["intentos"] == 1
+
+
+def test_backoff_exponencial_acotado(monkeypatch):
+    """
+    Test: la espera crece exponencialmente y respeta el tope
+    """
+    monkeypatch.setattr(settings, "SMS_COLA_BACKOFF_BASE", 2.0)
+    monkeypatch.setattr(settings, "SMS_COLA_BACKOFF_MAX", 10.0)
+
+    assert 1.0 <= SMSColaService.calcular_backoff(1) <= 2.0
+    assert 4.0 <= SMSColaService.calcular_backoff(3) <= 8.0
+    assert 5.0 <= SMSColaService.calcular_backoff(10) <= 10.0
+
+
+def test_lease_perdido_no_completa(db):
+    """
+    Test: si el lease venció y otro worker tomó el SMS, el primero no lo
+    completa ni programa reintentos (el dueño es el segundo)
+    """
+    verificacion = _encolar(db)
+    viejo = SMSColaService.reclamar(db)
+
+    db.query(SmsCola).update({SmsCola.bloqueado_hasta: datetime.now() - timedelta(seconds=1)})
+    db.commit()
+    nuevo = SMSColaService.reclamar(db)
+    assert nuevo["intentos"] == 2
+
+    assert SMSColaService.completar(db, viejo, "enviado") is False
+    assert SMSColaService.registrar_fallo(db, viejo, "timeout") == LEASE_PERDIDO
+    db.refresh(verificacion)
+    assert verificacion.estado == "encolado"
+    assert db.query(SmsCola).one().estado == "procesando"
+
+    assert SMSColaService.completar(db, nuevo, "enviado") is True
+    db.refresh(verificacion)
+    assert verificacion.estado == "enviado"
+
+
+def test_lease_vencido_sin_reclamar_completa(db):
+    """
+    Test: un envío que termina con el lease vencido, antes de que otro
+    worker lo reclame, se completa (si no, la próxima toma lo reenviaría)
+    """
+    verificacion = _encolar(db)
+    job = SMSColaService.reclamar(db)
+
+    db.query(SmsCola).update({SmsCola.bloqueado_hasta: datetime.now() - timedelta(seconds=1)})
+    db.commit()
+
+    assert SMSColaService.completar(db, job, "enviado") is True
+    db.refresh(verificacion)
+    assert verificacion.estado == "enviado"
+    assert db.query(SmsCola).count() == 0
+    assert SMSColaService.reclamar(db) is None
+
+
+def test_lease_mayor_que_el_envio(monkeypatch):
+    """
+    Test: el lease nunca queda por debajo del peor caso de un envío
+    """
+    monkeypatch.setattr(settings, "SMS_COLA_LEASE_SEGUNDOS", 10)
+    monkeypatch.setattr(settings, "SMS_HTTP_TIMEOUT", 10.0)
+    monkeypatch.setattr(settings, "SMS_SALDO_TIMEOUT", 5.0)
+
+    assert duracion_lease() == 45.0
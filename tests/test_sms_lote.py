@@ -0,0 +1,92 @@
+"""
+Tests del envío de SMS por lotes
+================================
+
+Verifica el agrupamiento de destinatarios en el parámetro TOS y el
+registro de verificaciones con un único INSERT.
+"""
+
+import asyncio
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.config.database import Base
+from backend.config.settings import settings
+from backend.models import Verificacion
+from backend.services.sms_service import SMSService
+
+
+def _mock_envio(monkeypatch, fallar: str = None):
+    """Reemplaza el envío real por uno que registra cada llamada"""
+    llamadas = []
+
+    async def enviar(phone_number, mensaje, modo_simulado=None):
+        llamadas.append((phone_number, mensaje))
+        await asyncio.sleep(0)
+        return {"ok": fallar not in phone_number.split(","), "mensaje": "OK"}
+
+    monkeypatch.setattr(SMSService, "enviar_sms_async", staticmethod(enviar))
+    return llamadas
+
+
+def test_campania_agrupa_destinatarios_en_tos(monkeypatch):
+    """
+    Test: 250 destinos con el mismo texto viajan en 3 llamadas (tandas de 100)
+    """
+    monkeypatch.setattr(settings, "SMS_LOTE_TAMANO", 100)
+    llamadas = _mock_envio(monkeypatch)
+    destinos = [(f"38155{i:05d}", "Promo de invierno") for i in range(250)]
+
+    resultados = asyncio.run(SMSService.enviar_lote(destinos))
+
+    assert len(llamadas) == 3
+    assert sorted(len(tos.split(",")) for tos, _ in llamadas) == [50, 100, 100]
+    assert all(r["ok"] for r in resultados)
+
+
+def test_resultados_en_orden_y_por_tanda(monkeypatch):
+    """
+    Test: textos distintos se envían por separado y el resultado respeta el orden
+    """
+    llamadas = _mock_envio(monkeypatch, fallar="3815550002")
+    destinos = [(f"381555000{i}", f"Su Codigo es: {i}") for i in range(4)]
+
+    resultados = asyncio.run(SMSService.enviar_lote(destinos))
+
+    assert len(llamadas) == 4
+    assert [r["ok"] for r in resultados] == [True, True, False, True]
+
+
+def test_registro_lote_en_un_solo_insert():
+    """
+    Test: todas las verificaciones del lote se insertan con una sola sentencia
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO verificaciones "):
+            inserts.append(statement)
+
+    filas = [
+        {
+            "person_id": f"1234567{i}",
+            "phone_number": f"381555000{i}",
+            "merchant_code": "389",
+            "verification_code": str(1000 + i),
+            "usuario_id": 1,
+            "estado": "enviado",
+            "error_mensaje": None
+        }
+        for i in range(5)
+    ]
+
+    assert SMSService.registrar_verificaciones_lote(db, filas) == 5
+    assert len(inserts) == 1
+    assert db.query(Verificacion).filter(Verificacion.merchant_name.isnot(None)).count() == 5
+    db.close()
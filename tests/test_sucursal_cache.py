@@ -0,0 +1,135 @@
+"""
+Tests de la caché de sucursales
+===============================
+
+Verifica que el envío toma el nombre de la tabla sucursales sin consultar
+la base por SMS, que las rutas de admin la invalidan y que /api/sucursales
+responde 304 mientras el ETag no cambie.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.auth_utils import get_current_user
+from backend.config import database
+from backend.config.database import Base, get_db
+from backend.models import Sucursal
+from backend.routes import sucursales
+from backend.services import sms_service
+from backend.services.sms_service import SMSService
+from backend.services.sucursal_cache import SucursalCache
+from backend.services.usuario_cache import UsuarioSesion
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine)
+    db = fabrica()
+    db.add(Sucursal(codigo="389", nombre="Los Quilmes - Casa Central"))
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(database, "SessionLocal", fabrica)
+    return engine
+
+
+@pytest.fixture
+def consultas(engine):
+    ejecutadas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: ejecutadas.append(args[2]))
+    return ejecutadas
+
+
+@pytest.fixture
+def cache(engine, monkeypatch):
+    cache = SucursalCache(ttl_seconds=300)
+    cache.cargar()
+    monkeypatch.setattr(sms_service, "sucursal_cache", cache)
+    monkeypatch.setattr(sucursales, "sucursal_cache", cache)
+    return cache
+
+
+def test_envio_sin_consultas(cache, consultas):
+    """
+    Test: el nombre sale de la tabla (no del dict de settings) y sin ir a la base
+    """
+    for _ in range(100):
+        texto = SMSService.construir_mensaje("389", "12345678", "4321")
+
+    assert texto == "389 - Los Quilmes - Casa Central - DNI: 12345678 - Su Codigo es: 4321"
+    assert consultas == []
+
+
+def test_codigo_desconocido_recarga_limitada(cache, consultas):
+    """
+    Test: un código nuevo relee la tabla como mucho una vez cada recarga_minima
+    """
+    cache.recarga_minima = 0
+    assert SMSService.get_nombre_sucursal("900") == "Sucursal 900"
+    assert len(consultas) == 1
+
+    cache.recarga_minima = 60
+    assert SMSService.get_nombre_sucursal("900") == "Sucursal 900"
+    assert len(consultas) == 1
+
+
+def test_recarga_async_fuera_del_event_loop(engine, cache):
+    """
+    Test: desde código async la recarga de la tabla corre en el threadpool
+    """
+    hilos = []
+    event.listen(engine, "before_cursor_execute", lambda *args: hilos.append(threading.get_ident()))
+    cache.invalidar()
+
+    async def escenario():
+        return await SMSService.aget_nombre_sucursal("389"), threading.get_ident()
+
+    nombre, hilo_loop = asyncio.run(escenario())
+
+    assert nombre == "Los Quilmes - Casa Central"
+    assert hilos and hilo_loop not in hilos
+
+    # Vigente: sin recarga ni salto de hilo
+    assert asyncio.run(escenario())[0] == "Los Quilmes - Casa Central"
+    assert len(hilos) == 1
+
+
+@pytest.fixture
+def client(engine, cache):
+    app = FastAPI()
+    app.include_router(sucursales.router)
+    app.dependency_overrides[get_current_user] = lambda: UsuarioSesion(id=1, usuario="ana", rol="admin")
+    app.dependency_overrides[get_db] = lambda: database.SessionLocal()
+    return TestClient(app)
+
+
+def test_etag_y_invalidacion(client, cache):
+    """
+    Test: 304 con el mismo ETag; crear una sucursal cambia el listado y el nombre del SMS
+    """
+    respuesta = client.get("/api/sucursales")
+    etag = respuesta.headers["ETag"]
+    assert respuesta.json() == [{"codigo": "389", "nombre": "Los Quilmes - Casa Central"}]
+
+    revalidada = client.get("/api/sucursales", headers={"If-None-Match": etag})
+    assert revalidada.status_code == 304 and revalidada.content == b""
+
+    assert client.post("/api/sucursales", json={"codigo": "900", "nombre": "Tafí Viejo"}).json()["ok"]
+    assert SMSService.get_nombre_sucursal("900") == "Tafí Viejo"
+
+    nueva = client.get("/api/sucursales", headers={"If-None-Match": etag})
+    assert nueva.status_code == 200 and nueva.headers["ETag"] != etag
+    assert len(nueva.json()) == 2
@@ -0,0 +1,130 @@
+"""
+Tests de la caché del usuario autenticado
+=========================================
+
+Verifica que get_current_user no consulta la base en régimen normal y que
+editar o eliminar un usuario invalida la entrada.
+"""
+
+import asyncio
+import dataclasses
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.config import database
+from backend.config.database import Base
+from backend.models import Usuario
+from backend.services.usuario_cache import UsuarioCache
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine)
+    db = fabrica()
+    db.add(Usuario(id=1, usuario="ana", hash_password="x", rol="operador", email="ana@x.com"))
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(database, "SessionLocal", fabrica)
+    return engine
+
+
+@pytest.fixture
+def consultas(engine):
+    ejecutadas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: ejecutadas.append(args[2]))
+    return ejecutadas
+
+
+def test_snapshot_cacheado(consultas):
+    """
+    Test: la segunda lectura no va a la base y el snapshot es inmutable
+    """
+    cache = UsuarioCache(ttl_seconds=60)
+
+    user = cache.obtener("ana")
+    assert (user.id, user.usuario, user.rol, user.email) == (1, "ana", "operador", "ana@x.com")
+    assert cache.obtener("ana") is user
+    assert len(consultas) == 1
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        user.rol = "admin"
+
+    # Los inexistentes no se guardan
+    assert cache.obtener("nadie") is None
+    assert cache.obtener("nadie") is None
+    assert len(consultas) == 3
+
+
+def test_cache_miss_async_fuera_del_event_loop(engine):
+    """
+    Test: aobtener() consulta la base en el threadpool y sirve el hit sin saltar de hilo
+    """
+    hilos = []
+    event.listen(engine, "before_cursor_execute", lambda *args: hilos.append(threading.get_ident()))
+    cache = UsuarioCache(ttl_seconds=60)
+
+    async def escenario():
+        return await cache.aobtener("ana"), await cache.aobtener("ana"), threading.get_ident()
+
+    primero, segundo, hilo_loop = asyncio.run(escenario())
+
+    assert primero is segundo and primero.usuario == "ana"
+    assert len(hilos) == 1 and hilo_loop not in hilos
+
+
+def test_invalidar_al_editar(consultas):
+    """
+    Test: tras invalidar se lee el rol nuevo
+    """
+    cache = UsuarioCache(ttl_seconds=60)
+    assert cache.obtener("ana").rol == "operador"
+
+    db = database.SessionLocal()
+    db.query(Usuario).filter(Usuario.id == 1).update({"rol": "admin"})
+    db.commit()
+    db.close()
+
+    assert cache.obtener("ana").rol == "operador"
+    cache.invalidar("ana")
+    assert cache.obtener("ana").rol == "admin"
+
+
+def test_invalidar_durante_la_carga(consultas, monkeypatch):
+    """
+    Test: una carga que empezó antes de invalidar no queda vigente
+    """
+    cache = UsuarioCache(ttl_seconds=60)
+    cargar = cache._cargar
+
+    def cargar_e_invalidar(usuario):
+        snapshot = cargar(usuario)
+        cache.invalidar(usuario)  # edición concurrente
+        return snapshot
+
+    monkeypatch.setattr(cache, "_cargar", cargar_e_invalidar)
+    cache.obtener("ana")
+    monkeypatch.setattr(cache, "_cargar", cargar)
+
+    cache.obtener("ana")
+    assert len(consultas) == 2
+
+
+def test_ttl_cero_deshabilita(consultas):
+    """
+    Test: con TTL 0 siempre consulta la base
+    """
+    cache = UsuarioCache(ttl_seconds=0)
+    cache.obtener("ana")
+    cache.obtener("ana")
+    assert len(consultas) == 2